@@ -1,10 +1,28 @@
 from django.contrib import admin
 
-from bot.models import TgUser
+from bot.models import TgChatState, TgOutboxMessage, TgUpdate, TgUser
 
 
 @admin.register(TgUser)
 class TgUserAdmin(admin.ModelAdmin):
-    list_display = ('user', 'verification_code')
+    list_display = ('user', 'verification_code_issued_at')
     list_filter = ('user',)
     readonly_fields = list_display
+
+
+@admin.register(TgChatState)
+class TgChatStateAdmin(admin.ModelAdmin):
+    list_display = ('chat_id', 'expires_at')
+    search_fields = ('chat_id',)
+
+
+@admin.register(TgUpdate)
+class TgUpdateAdmin(admin.ModelAdmin):
+    list_display = ('update_id', 'chat_id', 'received_at')
+    search_fields = ('chat_id',)
+
+
+@admin.register(TgOutboxMessage)
+class TgOutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('chat_id', 'text', 'created')
+    search_fields = ('chat_id',)
@@ -0,0 +1,295 @@
+import functools
+
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from bot.identity import IdentityCache, identity_cache, resolve_tg_user
+from bot.metrics import track_handler
+from bot.models import TgUser
+from bot.outbox import DbOutbox, Outbox
+from bot.states import StateStore, get_state_store
+from bot.tg.client import TgClient
+from bot.tg.schemas import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message, UpdateObj
+from goals.models import Goal, GoalCategory
+
+COMMANDS: list[str] = ['/goals', '/create', '/cancel']
+# 10 названий по 255 символов с id укладываются в лимит сообщения 4096
+GOALS_PAGE_SIZE = 10
+GOALS_CALLBACK = 'goals'
+CATEGORY_CALLBACK = 'category'
+# Telegram принимает не больше 100 кнопок в клавиатуре; остальные категории можно ввести номером
+MAX_CATEGORY_BUTTONS = 100
+
+
+def get_command(update: UpdateObj) -> str:
+    """
+    Метка обновления для метрик: команда или вид обновления, без произвольного текста пользователя
+    """
+    if update.message is not None:
+        return update.message.text if update.message.text in COMMANDS else 'message'
+    if update.callback_query is not None:
+        return 'callback_query'
+    return 'other'
+
+
+class BotHandler:
+    """
+    Обработка обновлений бота, не зависящая от транспорта (long polling, тестовый клиент).
+    Состояние диалога хранится отдельно для каждого чата (bot/states.py), поэтому обновления разных чатов
+    можно обрабатывать параллельно, в том числе в нескольких процессах с DbStateStore
+    """
+
+    def __init__(
+        self,
+        tg_client: TgClient | Outbox | DbOutbox,
+        states: StateStore | None = None,
+        identities: IdentityCache | None = None,
+    ) -> None:
+        self.tg_client = tg_client
+        self.states = states or get_state_store()
+        self.identities = identities or identity_cache
+
+    @staticmethod
+    def handles(update: UpdateObj) -> bool:
+        """
+        Обрабатываются только новые сообщения и нажатия кнопок; edited_message, my_chat_member
+        и прочие виды пропускаются без обращения к базе
+        """
+        return update.message is not None or update.callback_query is not None
+
+    def handle_update(self, update: UpdateObj) -> None:
+        with track_handler(get_command(update)):
+            if update.message is not None:
+                self.handle_message(update.message)
+            elif update.callback_query is not None:
+                self.handle_callback_query(update.callback_query)
+
+    def handle_callback_query(self, callback_query: CallbackQuery) -> None:
+        """
+        Нажатие inline-кнопки: листание /goals правит уже отправленное сообщение
+        :param callback_query: callback query
+        """
+        self.tg_client.answer_callback_query(callback_query.id)
+        message = callback_query.message
+        if message is None or message.message_id is None or not callback_query.data:
+            return
+        tg_user = resolve_tg_user(message.chat.id, self.identities)
+        if not tg_user.user_id:
+            return
+
+        name, _, value = callback_query.data.partition(':')
+        if name == GOALS_CALLBACK:
+            text, reply_markup = self._get_goals_page(tg_user.user_id, value)
+            self.tg_client.edit_message_text(
+                chat_id=message.chat.id, message_id=message.message_id, text=text, reply_markup=reply_markup
+            )
+        elif name == CATEGORY_CALLBACK:
+            self._choose_category(message, value)
+
+    def _choose_category(self, message: Message, category_id: str) -> None:
+        """
+        Категория выбрана кнопкой: клавиатура заменяется вопросом о названии цели.
+        Допустимые категории уже лежат в состоянии диалога - база не нужна
+        :param message: сообщение бота с клавиатурой категорий
+        :param category_id: id категории из callback_data
+        """
+        chat_id = message.chat.id
+        state: dict = self.states.get(chat_id)
+        if state.get('state') != 'creating' or category_id not in state['categories_id']:
+            text = 'Выбор категории устарел, начните заново: /create'
+        else:
+            self._select_category(state, category_id)
+            self.states.set(chat_id, state)
+            text = 'Название цели'
+        self.tg_client.edit_message_text(chat_id=chat_id, message_id=message.message_id, text=text)
+
+    @staticmethod
+    def _select_category(state: dict, category_id: str) -> None:
+        state['user_category_id'] = int(category_id)
+        state['state'] = 'getting goal title'
+
+    def handle_message(self, message: Message) -> None:
+        """
+        Обрабатывает сообщение от авторизованного или неавторизованного пользователя, вернуть сообщение
+        :param message: user message
+        :return: Answer from bot
+        """
+        # Известный верифицированный чат обходится без запросов: дальше нужен только user_id
+        tg_user = resolve_tg_user(message.chat.id, self.identities)
+
+        if tg_user.user_id:
+            self.handler_authorized_user(tg_user, message)
+        else:
+            self.handler_unauthorized_user(tg_user, message)
+
+    def handler_authorized_user(self, tg_user: TgUser, message: Message) -> None:
+        """
+        Возвращает ответы, которые зависят от команд авторизованного пользователя
+        :param tg_user: telegram user
+        :param message: user message
+        :return: Answer from bot
+        """
+        chat_id = message.chat.id
+        state: dict = self.states.get(chat_id)
+        had_state = bool(state)
+
+        if not state.get('state') and message.text not in COMMANDS:
+            self.tg_client.send_message(chat_id=chat_id, text=f'Неизвестная команда!')
+
+        if message.text == '/cancel':
+            state = {}
+            self.tg_client.send_message(chat_id=chat_id, text='Операция была отменена')
+
+        if not state and message.text in COMMANDS:
+            if message.text == '/goals':
+                self._get_goals(message, tg_user)
+
+            if message.text == '/create':
+                state['state'] = 'creating'
+                self._get_categories(message=message, tg_user=tg_user, state=state)
+
+        if state.get('state') == 'getting goal title' and message.text not in COMMANDS:
+            state['goal_title'] = message.text
+            self._create_goal(
+                chat_id=chat_id,
+                title=state.get('goal_title'),
+                user_id=tg_user.user_id,
+                category_id=state.get('user_category_id'),
+            )
+            state = {}
+
+        if state.get('state') == 'creating' and message.text not in COMMANDS:
+            if message.text in state['categories_id']:
+                self.tg_client.send_message(chat_id=chat_id, text='Название цели')
+                self._select_category(state, message.text)
+            else:
+                self.tg_client.send_message(chat_id=chat_id, text='Неправильная категория!')
+
+        if state:
+            self.states.set(chat_id, state)
+        elif had_state:
+            self.states.delete(chat_id)
+
+    def handler_unauthorized_user(self, tg_user: TgUser, message: Message) -> None:
+        """
+        Верификация пользователя telegram
+        :param tg_user: telegram user
+        :param message: user message
+        :return: verification code
+        """
+        # Код переиспользуется, пока не истёк: поток сообщений от непривязанного чата - только чтения
+        if not tg_user.has_valid_verification_code():
+            tg_user.update_verification_code()
+
+        self.tg_client.send_message(
+            chat_id=message.chat.id,
+            text=f'Ваш проверочный код:\n {tg_user.verification_code}',
+        )
+
+    def _get_goals(self, message: Message, tg_user: TgUser) -> None:
+        """
+        Возвращает первую страницу целей пользователя или "Нет целей", если целей не существует
+        :param message: user message
+        :param tg_user: telegram user
+        :return: Message with user goals
+        """
+        text, reply_markup = self._get_goals_page(tg_user.user_id)
+        self.tg_client.send_message(chat_id=message.chat.id, text=text, reply_markup=reply_markup)
+
+    @staticmethod
+    def _get_goals_page(user_id: int, cursor: str = '') -> tuple[str, InlineKeyboardMarkup | None]:
+        """
+        Страница целей по курсору из callback_data: '' - первая, 'next:<id>' - после id, 'prev:<id>' - до id.
+        Keyset по id (индекс goal_active_user_id_idx), из базы читаются только id и title
+        :return: текст страницы и кнопки навигации
+        """
+        direction, _, key = cursor.partition(':')
+        query_set: QuerySet = (
+            Goal.objects.filter(user_id=user_id, board__is_deleted=False, category__is_deleted=False)
+            .exclude(status=Goal.Status.archived)
+            .values_list('id', 'title')
+        )
+        if direction == 'prev' and key.isdigit():
+            rows = list(query_set.filter(id__lt=key).order_by('-id')[: GOALS_PAGE_SIZE + 1])
+            has_prev, has_next = len(rows) > GOALS_PAGE_SIZE, True
+            rows = rows[:GOALS_PAGE_SIZE][::-1]
+        else:
+            after = direction == 'next' and key.isdigit()
+            if after:
+                query_set = query_set.filter(id__gt=key)
+            rows = list(query_set.order_by('id')[: GOALS_PAGE_SIZE + 1])
+            has_prev, has_next = after, len(rows) > GOALS_PAGE_SIZE
+            rows = rows[:GOALS_PAGE_SIZE]
+
+        if not rows:
+            # Цели соседней страницы удалили, пока сообщение висело в чате
+            return BotHandler._get_goals_page(user_id) if cursor else ('Нет целей', None)
+
+        buttons = []
+        if has_prev:
+            buttons.append(InlineKeyboardButton(text='« Назад', callback_data=f'{GOALS_CALLBACK}:prev:{rows[0][0]}'))
+        if has_next:
+            buttons.append(InlineKeyboardButton(text='Вперёд »', callback_data=f'{GOALS_CALLBACK}:next:{rows[-1][0]}'))
+        text = '\n'.join(f'{goal_id} {title}' for goal_id, title in rows)
+        return text, InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+
+    def _get_categories(self, message: Message, tg_user: TgUser, state: dict) -> None:
+        """
+        Возвращает пользовательские категории с кнопками выбора или "Нет категорий", если категории не существуют
+        :param message: user message
+        :param tg_user: telegram user
+        :param state: состояние диалога чата
+        :return: Message with user categories
+        """
+        categories: list[tuple[int, str]] = list(
+            GoalCategory.objects.filter(board__participants__user_id=tg_user.user_id, board__is_deleted=False)
+            .exclude(is_deleted=True)
+            .values_list('id', 'title')
+        )
+        state['categories_id'] = [str(category_id) for category_id, _ in categories]
+        if not categories:
+            self.tg_client.send_message(chat_id=message.chat.id, text='Нет категорий')
+            return
+
+        text = '\n'.join(f'{category_id} {title}' for category_id, title in categories)
+        reply_markup = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [InlineKeyboardButton(text=title, callback_data=f'{CATEGORY_CALLBACK}:{category_id}')]
+                for category_id, title in categories[:MAX_CATEGORY_BUTTONS]
+            ]
+        )
+        self.tg_client.send_message(chat_id=message.chat.id, text=text, reply_markup=reply_markup)
+
+    def _create_goal(self, chat_id: int, title: str | None, user_id: int, category_id: int | None) -> None:
+        """
+        Создание целей
+        :param chat_id: user chat id
+        :param title: goal title
+        :param user_id: user id
+        :param category_id: chosen category id
+        :return: Message of success creating
+        """
+        Goal.objects.create(user_id=user_id, title=title, category_id=category_id)
+        self.tg_client.send_message(chat_id=chat_id, text=f'Цель {title} создана!')
+
+
+@functools.cache
+def get_bot_handler() -> BotHandler:
+    """
+    Обработчик процесса для webhook: ответы строками TgOutboxMessage в транзакции обработки
+    (отправляет runbot --mode send), состояния в BOT_STATE_STORE
+    """
+    return BotHandler(DbOutbox(), get_state_store())
+
+
+def process_update(handler: BotHandler, update: UpdateObj) -> None:
+    """
+    Обработать обновление вне BotRuntime (webhook в пуле воркеров API).
+    Обновления одного чата могут прийти в разные воркеры одновременно - advisory lock по chat_id
+    сохраняет их последовательную обработку
+    """
+    with transaction.atomic():
+        if update.chat_id is not None:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [update.chat_id])
+        handler.handle_update(update)
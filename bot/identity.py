@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+from bot.models import TgUser
+
+IDENTITY_CACHE_SIZE = 10_000
+IDENTITY_CACHE_TTL = 60 * 5
+
+
+@dataclass(frozen=True)
+class ChatIdentity:
+    tg_user_id: int
+    user_id: int | None
+
+    @property
+    def is_verified(self) -> bool:
+        return self.user_id is not None
+
+
+class IdentityCache:
+    """
+    LRU с TTL: chat_id -> ChatIdentity в памяти процесса.
+    Хранятся только верифицированные чаты: неверифицированному всё равно нужна запись в базу (новый код).
+    Поэтому сбрасывать кеш при привязке аккаунта не нужно - промах всегда идёт в get_or_create и видит привязку.
+    Удаление TgUser (в том числе каскадом от User) сбрасывает запись в своём процессе (bot/signals.py),
+    в остальных она живёт не дольше ttl
+    """
+
+    def __init__(
+        self,
+        maxsize: int = IDENTITY_CACHE_SIZE,
+        ttl: float = IDENTITY_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: OrderedDict[int, tuple[float, ChatIdentity]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chat_id: int) -> ChatIdentity | None:
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None:
+                return None
+            expires_at, identity = entry
+            if expires_at <= self.clock():
+                del self._entries[chat_id]
+                return None
+            self._entries.move_to_end(chat_id)
+            return identity
+
+    def set(self, chat_id: int, identity: ChatIdentity) -> None:
+        with self._lock:
+            self._entries[chat_id] = (self.clock() + self.ttl, identity)
+            self._entries.move_to_end(chat_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, chat_id: int) -> None:
+        with self._lock:
+            self._entries.pop(chat_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+identity_cache = IdentityCache()
+
+
+def resolve_tg_user(chat_id: int, cache: IdentityCache = identity_cache) -> TgUser:
+    """
+    TgUser чата: из кеша без запросов или одним get_or_create.
+    Из кеша возвращается несохранённая копия с id и user_id - связанного пользователя она не загружает
+    """
+    identity = cache.get(chat_id)
+    if identity is not None:
+        return TgUser(id=identity.tg_user_id, chat_id=chat_id, user_id=identity.user_id)
+
+    tg_user, _ = TgUser.objects.get_or_create(chat_id=chat_id)
+    if tg_user.user_id is not None:
+        cache.set(chat_id, ChatIdentity(tg_user_id=tg_user.id, user_id=tg_user.user_id))
+    return tg_user
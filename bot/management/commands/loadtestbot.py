@@ -0,0 +1,184 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from bot.handlers import BotHandler
+from bot.models import TgUser
+from bot.outbox import Outbox
+from bot.runtime import BotRuntime
+from bot.states import get_state_store
+from bot.tg.client import TgClient
+from bot.tg.fake import FakeTelegramServer
+from core.models import User
+from goals.models import Board, BoardParticipant, Goal, GoalCategory
+
+# chat_id нагрузочных пользователей: заведомо не пересекаются с настоящими чатами
+CHAT_ID_BASE = 10**15
+USERNAME_PREFIX = 'loadtest-'
+REPLY_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочный прогон бота без сети: локальный Bot API (bot/tg/fake.py) и N чатов,
+    каждый по кругу проходит /goals и /create (категория, название). Для каждого шага меряется время
+    от появления обновления до ответа бота. По умолчанию бот работает в этом же процессе
+    (BotRuntime + Outbox + настоящий TgClient), с --external ждёт отдельный runbot с TG_API_URL
+    """
+
+    help = 'Benchmark runbot throughput and latency against a local fake Telegram API'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--chats', type=int, default=50, help='Сколько чатов работают одновременно')
+        parser.add_argument('--rounds', type=int, default=5, help='Сколько раз каждый чат проходит сценарий')
+        parser.add_argument('--workers', type=int, default=8, help='Воркеры BotRuntime')
+        parser.add_argument('--port', type=int, default=0, help='Порт локального Bot API, 0 - любой свободный')
+        parser.add_argument('--seed', help='Сначала отдать боту обновления из записи getUpdates (tg_get_respons.json)')
+        parser.add_argument(
+            '--telegram-limits', action='store_true', help='Ограничивать отправку как Telegram (1 сообщение/с в чат)'
+        )
+        parser.add_argument('--external', action='store_true', help='Не запускать бота, ждать внешний runbot')
+        parser.add_argument('--keep-data', action='store_true', help='Не удалять созданных пользователей и цели')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        server = FakeTelegramServer(port=options['port']).start()
+        self.stdout.write(f'Fake Telegram API: TG_API_URL={server.url} BOT_TOKEN={server.token}')
+        chat_ids = self.create_users(options['chats'])
+        bot = None if options['external'] else BotThread(server, options['workers'], options['telegram_limits'])
+        try:
+            if options['seed']:
+                self.stdout.write(f'Seeded {server.seed(options["seed"])} recorded updates')
+            if bot is not None:
+                bot.start()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=len(chat_ids)) as pool:
+                results = list(pool.map(lambda chat_id: run_chat(server, chat_id, options['rounds']), chat_ids))
+            elapsed = time.perf_counter() - started
+        finally:
+            if bot is not None:
+                bot.stop()
+            server.stop()
+            if not options['keep_data']:
+                self.delete_users()
+
+        self.report(results, elapsed)
+
+    @staticmethod
+    @transaction.atomic
+    def create_users(count: int) -> list[int]:
+        """
+        Привязанные к Telegram пользователи с доской и категорией
+        """
+        Command.delete_users()
+        users = User.objects.bulk_create(User(username=f'{USERNAME_PREFIX}{n}') for n in range(count))
+        boards = Board.objects.bulk_create(Board(title=f'{USERNAME_PREFIX}{n}') for n in range(count))
+        BoardParticipant.objects.bulk_create(
+            BoardParticipant(board=board, user=user, role=BoardParticipant.Role.owner)
+            for board, user in zip(boards, users)
+        )
+        GoalCategory.objects.bulk_create(
+            GoalCategory(board=board, user=user, title='Нагрузка') for board, user in zip(boards, users)
+        )
+        tg_users = TgUser.objects.bulk_create(
+            TgUser(chat_id=CHAT_ID_BASE + n, user=user) for n, user in enumerate(users)
+        )
+        return [tg_user.chat_id for tg_user in tg_users]
+
+    @staticmethod
+    @transaction.atomic
+    def delete_users() -> None:
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        Goal.objects.filter(user__in=users).delete()
+        GoalCategory.objects.filter(user__in=users).delete()
+        participants = BoardParticipant.objects.filter(user__in=users)
+        boards = list(participants.values_list('board_id', flat=True))
+        participants.delete()
+        Board.objects.filter(id__in=boards).delete()
+        TgUser.objects.filter(user__in=users).delete()
+        users.delete()
+
+    def report(self, results: list[dict[str, list[float]]], elapsed: float) -> None:
+        steps: dict[str, list[float]] = {}
+        for result in results:
+            for step, latencies in result.items():
+                steps.setdefault(step, []).extend(latencies)
+        total = sum(len(latencies) for latencies in steps.values())
+        if not total:
+            raise CommandError('No replies received')
+
+        self.stdout.write(f'{total} replies in {elapsed:.2f} s: {total / elapsed:.1f} updates/s')
+        self.stdout.write(f'{"step":<12}{"count":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}')
+        for step, latencies in [*steps.items(), ('all', [value for values in steps.values() for value in values])]:
+            self.stdout.write(
+                f'{step:<12}{len(latencies):>8}'
+                + ''.join(f'{percentile(latencies, q) * 1000:>10.1f}' for q in (50, 95, 99))
+                + f'{max(latencies) * 1000:>10.1f}'
+            )
+
+
+def percentile(values: list[float], q: int) -> float:
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+def run_chat(server: FakeTelegramServer, chat_id: int, rounds: int) -> dict[str, list[float]]:
+    """
+    Сценарий одного пользователя: каждый шаг ждёт ответа бота перед следующим
+    :return: задержки ответов по шагам, секунды
+    """
+    client = server.client
+    latencies: dict[str, list[float]] = {}
+
+    def step(name: str, text: str) -> str:
+        expected = client.sent_count(chat_id) + 1
+        started = time.perf_counter()
+        client.push_message(chat_id, text)
+        if not client.wait_for_messages(chat_id, expected, timeout=REPLY_TIMEOUT):
+            raise CommandError(f'Chat {chat_id}: no reply to {text!r} in {REPLY_TIMEOUT} s')
+        latencies.setdefault(name, []).append(time.perf_counter() - started)
+        return client.messages_to(chat_id)[-1]
+
+    for n in range(rounds):
+        step('/goals', '/goals')
+        categories = step('/create', '/create')
+        step('category', categories.split(' ', 1)[0])
+        step('title', f'Цель {n}')
+    return latencies
+
+
+class BotThread:
+    """
+    Бот как в runbot, но в фоновом потоке и поверх локального Bot API
+    """
+
+    def __init__(self, server: FakeTelegramServer, workers: int, telegram_limits: bool) -> None:
+        tg_client = TgClient(token=server.token, base_url=server.url)
+        rates = {} if telegram_limits else {'global_rate': 10**6, 'chat_rate': 10**6}
+        self.outbox = Outbox(tg_client, **rates)
+        handler = BotHandler(self.outbox, get_state_store('memory'))
+        self.runtime = BotRuntime(
+            tg_client, handler.handle_update, workers=workers, poll_timeout=1, accepts=handler.handles
+        )
+        self._loop = asyncio.new_event_loop()
+        self._stop = asyncio.Event()
+        self._thread = threading.Thread(target=self._run, name='loadtest-bot', daemon=True)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self.runtime.run(self._stop))
+
+    def start(self) -> None:
+        self.outbox.start()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join(timeout=10)
+        self.outbox.stop(timeout=10)
@@ -1,21 +1,57 @@
+import asyncio
+import logging
+import threading
 from typing import Any
 
-from django.core.management import BaseCommand
-from django.db.models import QuerySet
+from django.core.management import BaseCommand, CommandError
 
-from bot.models import TgUser
-from bot.tg.client import TgClient
-from bot.tg.schemas import Message, GetUpdatesResponse, SendMessageResponse
-from goals.models import Goal, GoalCategory
+from bot.handlers import BotHandler
+from bot.metrics import Sampled, dump_metrics, dump_metrics_periodically, registry, serve_metrics
+from bot.outbox import DbOutbox, Outbox, OutboxRelay
+from bot.runtime import BotRuntime
+from bot.states import MemoryStateStore, StateStore, get_state_store, purge_expired_periodically
+from bot.tg.client import TgClient, get_tg_client
+from bot.update_queue import CLAIM_BATCH_SIZE, run_ingest, run_worker
+
+logger = logging.getLogger(__name__)
+
+STATS_INTERVAL = 60
 
 
 class Command(BaseCommand):
-    """ """
+    """
+    Long polling бота: обновления разных чатов обрабатываются параллельно (см. bot/runtime.py),
+    ответы пишутся в таблицу TgOutboxMessage в транзакции обработки, и отсюда же уходят через очередь
+    с ограничением скорости (см. bot/outbox.py).
+    Для нескольких процессов: один runbot --mode ingest пишет обновления в таблицу-очередь и отправляет ответы,
+    сколько угодно runbot --mode worker их обрабатывают (см. bot/update_queue.py).
+    С webhook обновления обрабатывает API, а ответы отправляет runbot --mode send.
+    Ответы отправляет только один процесс (poll, ingest или send), поэтому внутри чата они уходят по порядку
+    """
 
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
-        self.tg_client: TgClient = TgClient()
-        self.states: dict = {}
+        self.tg_client: TgClient = get_tg_client()
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--mode',
+            choices=['poll', 'ingest', 'worker', 'send'],
+            default='poll',
+            help=(
+                'poll - получать и обрабатывать в одном процессе, ingest/worker - через очередь в базе, '
+                'send - только отправлять ответы из базы (для webhook)'
+            ),
+        )
+        parser.add_argument('--workers', type=int, default=8, help='Сколько чатов обрабатывается одновременно')
+        parser.add_argument(
+            '--batch-size', type=int, default=CLAIM_BATCH_SIZE, help='Сколько чатов воркер захватывает за раз'
+        )
+        parser.add_argument(
+            '--state-store', choices=['db', 'memory'], help='Хранилище состояний диалогов, по умолчанию BOT_STATE_STORE'
+        )
+        parser.add_argument('--metrics-port', type=int, help='Отдавать метрики Prometheus на 127.0.0.1:<port>')
+        parser.add_argument('--metrics-file', help='Раз в минуту выгружать метрики Prometheus в файл')
 
     def handle(self, *args: Any, **options: Any) -> None:
         """
@@ -24,146 +60,117 @@ class Command(BaseCommand):
         :param options:
         :return: message
         """
-        offset: int = 0
-        while True:
-            res: GetUpdatesResponse = self.tg_client.get_updates(offset=offset)
-            for item in res.result:
-                offset = item.update_id + 1
-                self.handle_message(item.message)
-
-    def handle_message(self, message: Message) -> None:
-        """
-        Обрабатывает сообщение от авторизованного или неавторизованного пользователя, вернуть сообщение
-        :param message: user message
-        :return: Answer from bot
-        """
-        tg_user, created = TgUser.objects.get_or_create(chat_id=message.chat.id)
-
-        if tg_user.user:
-            self.handler_authorized_user(tg_user, message)
-        else:
-            self.handler_unauthorized_user(tg_user, message)
-
-    def handler_authorized_user(self, tg_user: TgUser, message: Message) -> None:
-        """
-        Возвращает ответы, которые зависят от команд авторизованного пользователя
-        :param tg_user: telegram user
-        :param message: user message
-        :return: Answer from bot
-        """
-        commands: list[str] = ['/goals', '/create', '/cancel']
-
-        if not self.states.get('state') and message.text not in commands:
-            self.tg_client.send_message(
-                chat_id=message.chat.id, text=f'Неизвестная команда!'
-            )
-
-        if message.text == '/cancel':
-            self.states = {}
-            self.tg_client.send_message(
-                chat_id=message.chat.id, text='Операция была отменена'
-            )
-
-        if not self.states and message.text in commands:
-            if message.text == '/goals':
-                self._get_goals(message, tg_user)
-
-            if message.text == '/create':
-                self.states['state'] = 'creating'
-                self._get_categories(message=message, tg_user=tg_user)
-
-        if (
-            self.states.get('state') == 'getting goal title'
-            and message.text not in commands
-        ):
-            self.states['goal_title'] = message.text
-            self._create_goal(
-                chat_id=message.chat.id,
-                title=self.states.get('goal_title'),
-                user_id=tg_user.user.id,
-                category_id=self.states.get('user_category_id'),
-            )
-            self.states = {}
-
-        if self.states.get('state') == 'creating' and message.text not in commands:
-            if message.text in self.states['categories_id']:
-                self.tg_client.send_message(
-                    chat_id=message.chat.id, text='Название цели'
-                )
-                self.states['user_category_id'] = int(message.text)
-                self.states['state'] = 'getting goal title'
+        server = serve_metrics(options['metrics_port']) if options['metrics_port'] else None
+        try:
+            if options['mode'] == 'ingest':
+                self.ingest()
+            elif options['mode'] == 'send':
+                self.send()
+            elif options['mode'] == 'worker':
+                self.work(options['state_store'], options['workers'], options['batch_size'], options['metrics_file'])
             else:
-                self.tg_client.send_message(
-                    chat_id=message.chat.id, text='Неправильная категория!'
-                )
-
-    def handler_unauthorized_user(self, tg_user: TgUser, message: Message) -> None:
-        """
-        Верификация пользователя telegram
-        :param tg_user: telegram user
-        :param message: user message
-        :return: verification code
-        """
-        verification_code: str = tg_user.generate_verification_code()
-        tg_user.verification_code = verification_code
-        tg_user.save()
-
-        self.tg_client.send_message(
-            chat_id=message.chat.id,
-            text=f'Ваш проверочный код:\n {tg_user.verification_code}',
+                self.poll(options['state_store'], options['workers'], options['metrics_file'])
+        finally:
+            if server is not None:
+                server.shutdown()
+
+    def poll(self, state_store: str | None, workers: int, metrics_file: str | None) -> None:
+        states = get_state_store(state_store)
+        relay = OutboxRelay(self.tg_client)
+        handler = BotHandler(DbOutbox(notify=relay.wake), states)
+        runtime = BotRuntime(
+            self.tg_client, handler.handle_update, workers=workers, accepts=handler.handles, durable=True
         )
-
-    def _get_goals(self, message: Message, tg_user: TgUser) -> SendMessageResponse:
-        """
-        Возвращает цели пользователя или "Нет целей", если целей не существует
-        :param message: user message
-        :param tg_user: telegram user
-        :return: Message with user goals
-        """
-        query_set: QuerySet = (
-            Goal.objects.select_related('user')
-            .filter(user_id=tg_user.user.id, category__is_deleted=False)
-            .exclude(status=Goal.Status.archived)
-        )
-        goals = [f'{goal.id} {goal.title}' for goal in query_set]
-        if not goals:
-            text = 'Нет целей'
-        else:
-            text = '\n'.join(goals)
-        return self.tg_client.send_message(chat_id=message.chat.id, text=text)
-
-    def _get_categories(self, message: Message, tg_user: TgUser) -> SendMessageResponse:
-        """
-        Возвращает пользовательские категории или "Нет категорий", если категории не существуют
-        :param message: user message
-        :param tg_user: telegram user
-        :return: Message with user categories
-        """
-        query_set: QuerySet = GoalCategory.objects.filter(
-            board__participants__user=tg_user.user
-        ).exclude(is_deleted=True)
-        categories: list[str] = [
-            f'{category.id} {category.title}' for category in query_set
+        register_metrics(relay.outbox, runtime)
+        relay.start()
+        try:
+            asyncio.run(self.run(runtime, states, relay.outbox, metrics_file))
+        finally:
+            relay.stop(timeout=10)
+
+    def send(self) -> None:
+        relay = OutboxRelay(self.tg_client)
+        register_metrics(relay.outbox)
+        relay.start()
+        try:
+            relay.join()
+        except KeyboardInterrupt:
+            relay.stop(timeout=10)
+
+    def ingest(self) -> None:
+        relay = OutboxRelay(self.tg_client)
+        register_metrics(relay.outbox)
+        relay.start()
+        try:
+            run_ingest(self.tg_client, accepts=BotHandler.handles)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            relay.stop(timeout=10)
+
+    def work(self, state_store: str | None, workers: int, batch_size: int, metrics_file: str | None) -> None:
+        states = get_state_store(state_store)
+        if isinstance(states, MemoryStateStore):
+            raise CommandError('Workers share dialog states: use --state-store=db')
+        # Ответы пишутся в транзакции захвата, отправляет их процесс ingest
+        handler = BotHandler(DbOutbox(), states)
+        stop = threading.Event()
+        threads = [
+            threading.Thread(
+                target=run_worker, args=(handler.handle_update, batch_size), kwargs={'stop': stop}, daemon=True
+            )
+            for _ in range(workers)
         ]
-        self.states['categories_id'] = [str(cat.id) for cat in query_set]
-        if not categories:
-            text: str = 'Нет категорий'
-        else:
-            text = '\n'.join(categories)
-        return self.tg_client.send_message(chat_id=message.chat.id, text=text)
-
-    def _create_goal(
-        self, chat_id: int, title: str | None, user_id: int, category_id: int | None
-    ) -> SendMessageResponse:
-        """
-        Создание целей
-        :param chat_id: user chat id
-        :param title: goal title
-        :param user_id: user id
-        :param category_id: chosen category id
-        :return: Message of success creating
-        """
-        Goal.objects.create(user_id=user_id, title=title, category_id=category_id)
-        return self.tg_client.send_message(
-            chat_id=chat_id, text=f'Цель {title} создана!'
+        for thread in threads:
+            thread.start()
+        try:
+            # Потоки воркеров работают сами; основной поток только обслуживает процесс
+            while any(thread.is_alive() for thread in threads):
+                states.purge_expired()
+                if metrics_file:
+                    dump_metrics(metrics_file)
+                stop.wait(STATS_INTERVAL)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    @staticmethod
+    async def run(runtime: BotRuntime, states: StateStore, outbox: Outbox, metrics_file: str | None = None) -> None:
+        background = [
+            asyncio.create_task(purge_expired_periodically(states, interval=states.ttl)),
+            asyncio.create_task(log_outbox_stats(outbox)),
+        ]
+        if metrics_file:
+            background.append(asyncio.create_task(dump_metrics_periodically(metrics_file, STATS_INTERVAL)))
+        try:
+            await runtime.run()
+        finally:
+            for task in background:
+                task.cancel()
+
+
+def register_metrics(outbox: Outbox, runtime: BotRuntime | None = None) -> None:
+    """
+    Метрики, которые runtime и очередь уже считают сами, - снимаются только при выгрузке
+    """
+    if runtime is not None:
+        registry.register(
+            Sampled('bot_runtime_pending', 'Updates received but not handled yet', lambda: runtime.pending)
         )
+        registry.register(Sampled('bot_runtime_offset', 'Next getUpdates offset', lambda: runtime.offset))
+    stats = outbox.stats
+    for metric in (
+        Sampled('bot_outbox_depth', 'Messages waiting in the outbox', lambda: sum(stats.depth.values())),
+        Sampled('bot_outbox_sent_total', 'Messages sent by the outbox', lambda: stats.sent, 'counter'),
+        Sampled('bot_outbox_coalesced_total', 'Messages merged into a queued one', lambda: stats.coalesced, 'counter'),
+        Sampled('bot_outbox_throttled_total', 'Flood limit pauses', lambda: stats.throttled, 'counter'),
+        Sampled('bot_outbox_failed_total', 'Messages dropped after an error', lambda: stats.failed, 'counter'),
+    ):
+        registry.register(metric)
+
+
+async def log_outbox_stats(outbox: Outbox) -> None:
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        logger.info('Outbox: %s', outbox.stats.as_dict())
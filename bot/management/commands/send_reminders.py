@@ -0,0 +1,32 @@
+from typing import Any
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from bot.outbox import DbOutbox, Priority
+from bot.reminders import collect_reminders, render_reminders
+
+
+class Command(BaseCommand):
+    """
+    Напоминания о сроках целей пользователям с привязанным Telegram. Запускается по расписанию
+    (cron, раз в час или чаще): каждый запуск берёт только новое с прошлого раза, см. bot/reminders.py.
+    Сообщения пишутся в TgOutboxMessage в одной транзакции с водяными знаками: пока рассылка не сохранена,
+    водяные знаки не сдвигаются. Отправляет их процесс runbot с низшим приоритетом и в лимитах Telegram
+    """
+
+    help = 'Queue due-soon and overdue goal reminders for linked Telegram chats'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--days', type=int, default=1, help='За сколько дней до срока напоминать')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        with transaction.atomic():
+            reminders = collect_reminders(timezone.localdate(), options['days'])
+            messages = render_reminders(reminders)
+            DbOutbox().send_messages(
+                [(chat_id, text) for chat_id, texts in messages.items() for text in texts], priority=Priority.bulk
+            )
+
+        self.stdout.write(f'{len(reminders)} reminders queued for {len(messages)} chats')
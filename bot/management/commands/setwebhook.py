@@ -0,0 +1,35 @@
+from typing import Any
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from bot.tg.client import TgClientError, get_tg_client
+
+
+class Command(BaseCommand):
+    """
+    Включить webhook бота (обновления приходят в bot/webhook) или вернуться к long polling (runbot)
+    """
+
+    help = 'Register bot webhook URL in Telegram or delete it to use runbot polling'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('url', nargs='?', help='Публичный https-адрес bot/webhook')
+        parser.add_argument('--delete', action='store_true', help='Удалить webhook')
+        parser.add_argument('--max-connections', type=int, default=40, help='Одновременных запросов от Telegram')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        client = get_tg_client()
+        try:
+            if options['delete']:
+                client.delete_webhook()
+                self.stdout.write(self.style.SUCCESS('Webhook deleted, use runbot'))
+                return
+            if not options['url']:
+                raise CommandError('url is required')
+            if not settings.BOT_WEBHOOK_SECRET:
+                raise CommandError('BOT_WEBHOOK_SECRET is not set')
+            client.set_webhook(options['url'], settings.BOT_WEBHOOK_SECRET, options['max_connections'])
+        except TgClientError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f'Webhook set to {options["url"]}'))
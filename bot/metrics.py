@@ -0,0 +1,238 @@
+import asyncio
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator
+
+from django.db import connection
+
+from core.mixins import QueryCounter
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Метки -> [число значений по корзинам (последняя - +Inf), сумма]
+        self._values: dict[tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0]
+            state[0][index] += 1
+            state[1] += value
+
+    def count(self, **labels: str) -> int:
+        state = self._values.get(tuple(str(labels[name]) for name in self.labelnames))
+        return sum(state[0]) if state else 0
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, math.inf), counts):
+                    cumulative += count
+                    bucket_labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                    lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+                lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Sampled:
+    """
+    Значение снимается функцией в момент выгрузки: глубина очередей и уже посчитанные счётчики
+    (OutboxStats) не требуют отдельного учёта на горячем пути
+    """
+
+    def __init__(
+        self, name: str, documentation: str, function: Callable[[], float], metric_type: str = 'gauge'
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.metric_type = metric_type
+
+    def render(self) -> list[str]:
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+            f'{self.name} {_format_value(self.function())}',
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram | Sampled] = {}
+
+    def register(self, metric: Counter | Histogram | Sampled) -> Counter | Histogram | Sampled:
+        # Повторная регистрация (новый runtime в том же процессе) заменяет старую
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                logger.exception('Failed to collect metric %s', metric.name)
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+UPDATE_WAIT = registry.register(
+    Histogram('bot_update_wait_seconds', 'Time from getUpdates response to the start of update handling')
+)
+UPDATE_LATENCY = registry.register(
+    Histogram('bot_update_seconds', 'Time from getUpdates response to the end of update handling')
+)
+UPDATES_SKIPPED = registry.register(
+    Counter('bot_updates_skipped_total', 'Updates of kinds the bot does not handle, by kind', ('kind',))
+)
+HANDLER_LATENCY = registry.register(
+    Histogram('bot_handler_seconds', 'Update handler duration by command', ('command',))
+)
+HANDLER_QUERIES = registry.register(
+    Histogram('bot_handler_queries', 'SQL queries per handled update by command', ('command',), QUERY_BUCKETS)
+)
+HANDLER_ERRORS = registry.register(
+    Counter('bot_handler_errors_total', 'Updates failed with an exception', ('command',))
+)
+OUTBOX_WAIT = registry.register(
+    Histogram('bot_outbox_wait_seconds', 'Time a message spent in the outbox before it was sent')
+)
+TG_API_LATENCY = registry.register(
+    Histogram('bot_tg_api_seconds', 'Telegram Bot API request duration, each retry separately', ('method',))
+)
+TG_API_REQUESTS = registry.register(
+    Counter('bot_tg_api_requests_total', 'Telegram Bot API requests by HTTP status', ('method', 'status'))
+)
+
+
+@contextmanager
+def track_handler(command: str) -> Iterator[None]:
+    """
+    Время, число SQL-запросов и ошибки обработки одного обновления
+    """
+    counter = QueryCounter()
+    started = time.perf_counter()
+    try:
+        with connection.execute_wrapper(counter):
+            yield
+    except Exception:
+        HANDLER_ERRORS.inc(command=command)
+        raise
+    finally:
+        HANDLER_LATENCY.observe(time.perf_counter() - started, command=command)
+        HANDLER_QUERIES.observe(counter.count, command=command)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def serve_metrics(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """
+    Отдавать метрики в формате Prometheus на host:port в фоновом потоке
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, name='bot-metrics', daemon=True).start()
+    return server
+
+
+def dump_metrics(path: str) -> None:
+    # Через временный файл: читатель (node_exporter textfile) не увидит половину выгрузки
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as file:
+        file.write(registry.render())
+    os.replace(tmp_path, path)
+
+
+async def dump_metrics_periodically(path: str, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            dump_metrics(path)
+        except OSError:
+            logger.exception('Failed to dump metrics to %s', path)
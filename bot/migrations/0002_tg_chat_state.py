@@ -0,0 +1,30 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TgChatState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.BigIntegerField(unique=True)),
+                ('state', models.JSONField(default=dict)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Состояние чата',
+                'verbose_name_plural': 'Состояния чатов',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='tguser',
+            options={'verbose_name': 'Телеграмм-пользователь', 'verbose_name_plural': 'Телеграмм-пользователи'},
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0002_tg_chat_state'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='tguser',
+            name='verification_code',
+        ),
+        migrations.AddField(
+            model_name='tguser',
+            name='verification_code_hash',
+            field=models.CharField(blank=True, default=None, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='tguser',
+            name='verification_code_issued_at',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0003_hashed_verification_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('due_soon', 'Скоро срок'), ('overdue', 'Просрочено')], max_length=20, unique=True)),
+                ('due_date', models.DateField()),
+                ('run_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Водяной знак напоминаний',
+                'verbose_name_plural': 'Водяные знаки напоминаний',
+            },
+        ),
+    ]
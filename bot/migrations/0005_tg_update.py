@@ -0,0 +1,28 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:34
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0004_reminder_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TgUpdate',
+            fields=[
+                ('update_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('chat_id', models.BigIntegerField(null=True)),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Обновление Telegram',
+                'verbose_name_plural': 'Обновления Telegram',
+                'indexes': [models.Index(fields=['chat_id', 'update_id'], name='tg_update_chat_idx')],
+            },
+        ),
+    ]
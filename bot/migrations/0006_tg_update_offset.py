@@ -0,0 +1,24 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0005_tg_update'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TgUpdateOffset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('offset', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Offset getUpdates',
+                'verbose_name_plural': 'Offset getUpdates',
+            },
+        ),
+    ]
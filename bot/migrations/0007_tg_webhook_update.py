@@ -0,0 +1,25 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:07
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0006_tg_update_offset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TgWebhookUpdate',
+            fields=[
+                ('update_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('received_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Обновление Telegram из webhook',
+                'verbose_name_plural': 'Обновления Telegram из webhook',
+            },
+        ),
+    ]
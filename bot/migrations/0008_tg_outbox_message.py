@@ -0,0 +1,31 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:21
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0007_tg_webhook_update'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TgOutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.BigIntegerField(null=True)),
+                ('text', models.TextField(blank=True)),
+                ('reply_markup', models.JSONField(null=True)),
+                ('message_id', models.BigIntegerField(null=True)),
+                ('callback_query_id', models.CharField(max_length=64, null=True)),
+                ('priority', models.PositiveSmallIntegerField(default=0)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Исходящее сообщение Telegram',
+                'verbose_name_plural': 'Исходящие сообщения Telegram',
+            },
+        ),
+    ]
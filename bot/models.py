@@ -1,5 +1,10 @@
+import hashlib
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.db import models
-from django.utils.crypto import get_random_string
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
 
 from core.models import User
 
@@ -13,25 +18,50 @@ class TgUser(models.Model):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, null=True, blank=True, default=None
     )
-    verification_code = models.CharField(
-        max_length=50, null=True, blank=True, default=None
-    )
+    # Сам код не хранится: он выводится из chat_id и времени выдачи (HMAC на SECRET_KEY),
+    # в базе только sha256 кода для поиска по индексу
+    verification_code_hash = models.CharField(max_length=64, null=True, blank=True, default=None, unique=True)
+    verification_code_issued_at = models.DateTimeField(null=True, blank=True, default=None)
 
     @property
     def is_verified(self) -> bool:
-        return bool(self.user)
+        return self.user_id is not None
+
+    @property
+    def verification_code(self) -> str | None:
+        if self.verification_code_issued_at is None:
+            return None
+        return self.generate_verification_code(self.chat_id, self.verification_code_issued_at)
 
     @staticmethod
-    def generate_verification_code() -> str:
+    def generate_verification_code(chat_id: int, issued_at: datetime) -> str:
         """
         Сгенерировать проверочный код
         :return: verification code
         """
-        return get_random_string(length=50)
+        value = f'{chat_id}:{int(issued_at.timestamp())}'
+        return salted_hmac('bot.TgUser.verification_code', value, algorithm='sha256').hexdigest()[:20]
+
+    @staticmethod
+    def hash_verification_code(code: str) -> str:
+        return hashlib.sha256(code.encode()).hexdigest()
+
+    @staticmethod
+    def verification_code_valid_since() -> datetime:
+        return timezone.now() - timedelta(seconds=settings.BOT_VERIFICATION_CODE_TTL)
+
+    def has_valid_verification_code(self) -> bool:
+        issued_at = self.verification_code_issued_at
+        return self.verification_code_hash is not None and issued_at > self.verification_code_valid_since()
 
     def update_verification_code(self) -> None:
-        self.verification_code = self.generate_verification_code()
-        self.save(update_fields=['verification_code'])
+        """
+        Выдать новый код; действует BOT_VERIFICATION_CODE_TTL секунд
+        """
+        # Секунды: из базы время должно прочитаться тем же, из которого выведен код
+        self.verification_code_issued_at = timezone.now().replace(microsecond=0)
+        self.verification_code_hash = self.hash_verification_code(self.verification_code)
+        self.save(update_fields=['verification_code_hash', 'verification_code_issued_at'])
 
     class Meta:
         verbose_name = 'Телеграмм-пользователь'
@@ -39,3 +69,133 @@ class TgUser(models.Model):
 
     def __str__(self):
         return self.chat_id
+
+
+class TgChatState(models.Model):
+    """
+    Состояние диалога чата (например, шаги /create) для DbStateStore, см. bot/states.py
+    """
+
+    chat_id = models.BigIntegerField(unique=True)
+    state = models.JSONField(default=dict)
+    # Брошенные диалоги истекают: просроченная строка не читается и удаляется purge_expired
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Состояние чата'
+        verbose_name_plural = 'Состояния чатов'
+
+    def __str__(self):
+        return str(self.chat_id)
+
+
+class ReminderWatermark(models.Model):
+    """
+    Докуда разосланы напоминания о сроках целей, см. bot/reminders.py.
+    Каждый запуск send_reminders берёт только сроки после due_date и цели, изменённые после run_at
+    """
+
+    class Kind(models.TextChoices):
+        due_soon = 'due_soon', 'Скоро срок'
+        overdue = 'overdue', 'Просрочено'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices, unique=True)
+    due_date = models.DateField()
+    run_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Водяной знак напоминаний'
+        verbose_name_plural = 'Водяные знаки напоминаний'
+
+    def __str__(self):
+        return f'{self.kind}: {self.due_date}'
+
+
+class TgUpdate(models.Model):
+    """
+    Полученные и ещё не обработанные обновления Telegram: очередь между runbot --mode ingest и воркерами
+    (см. bot/update_queue.py) и журнал runbot --mode poll (см. BotRuntime). Обработанное обновление удаляется,
+    так что таблица держит только необработанный хвост
+    """
+
+    update_id = models.BigIntegerField(primary_key=True)
+    chat_id = models.BigIntegerField(null=True)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Обновление Telegram'
+        verbose_name_plural = 'Обновления Telegram'
+        indexes = [
+            # Проверка «нет более раннего обновления этого чата» при захвате
+            models.Index(fields=['chat_id', 'update_id'], name='tg_update_chat_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.update_id)
+
+
+class TgUpdateOffset(models.Model):
+    """
+    Следующий offset getUpdates (одна строка): после рестарта runbot продолжает с него,
+    а не перечитывает всё, что Telegram ещё хранит
+    """
+
+    offset = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Offset getUpdates'
+        verbose_name_plural = 'Offset getUpdates'
+
+    def __str__(self):
+        return str(self.offset)
+
+    @classmethod
+    def load(cls) -> int:
+        return cls.objects.filter(pk=1).values_list('offset', flat=True).first() or 0
+
+    @classmethod
+    def store(cls, offset: int) -> None:
+        cls.objects.update_or_create(pk=1, defaults={'offset': offset})
+
+
+class TgWebhookUpdate(models.Model):
+    """
+    Обновления, принятые webhook: отметка вставляется в транзакции обработки, поэтому повторная доставка
+    в любой процесс API пропускается, а откаченная обработка будет повторена. Старые отметки удаляет сам webhook
+    """
+
+    update_id = models.BigIntegerField(primary_key=True)
+    received_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = 'Обновление Telegram из webhook'
+        verbose_name_plural = 'Обновления Telegram из webhook'
+
+    def __str__(self):
+        return str(self.update_id)
+
+
+class TgOutboxMessage(models.Model):
+    """
+    Исходящее сообщение бота: пишется в транзакции того, кто отвечает (обработчик, view, рассылка),
+    поэтому откаченная обработка ничего не отправляет. Доставляет OutboxRelay процесса runbot
+    (см. bot/outbox.py) по порядку id; доставленное удаляется
+    """
+
+    chat_id = models.BigIntegerField(null=True)
+    text = models.TextField(blank=True)
+    reply_markup = models.JSONField(null=True)
+    # Задан - это editMessageText этого сообщения
+    message_id = models.BigIntegerField(null=True)
+    # Задан - это answerCallbackQuery, остальные поля пустые
+    callback_query_id = models.CharField(max_length=64, null=True)
+    priority = models.PositiveSmallIntegerField(default=0)
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Исходящее сообщение Telegram'
+        verbose_name_plural = 'Исходящие сообщения Telegram'
+
+    def __str__(self):
+        return f'{self.chat_id}: {self.text[:50]}'
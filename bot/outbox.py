@@ -0,0 +1,539 @@
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable
+
+from django.db import close_old_connections, connection, transaction
+
+from bot.metrics import OUTBOX_WAIT
+from bot.models import TgOutboxMessage
+from bot.tg.client import TgClient, TgClientError
+from bot.tg.schemas import InlineKeyboardMarkup
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Bot API: около 30 сообщений в секунду всего и не чаще одного в секунду в один чат
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+MAX_MESSAGE_LENGTH = 4096
+COALESCE_SEPARATOR = '\n\n'
+# Отправляющих потоков: один поток упирается в 1/RTT запросов в секунду, это намного меньше GLOBAL_RATE
+SENDERS = 8
+RELAY_BATCH_SIZE = 100
+RELAY_IDLE_DELAY = 0.2
+# Больше сообщений в памяти Outbox relay не берёт - остальные ждут в таблице
+RELAY_MAX_QUEUED = 1000
+
+
+class Priority(IntEnum):
+    reply = 0  # ответ на команду пользователя
+    notify = 1  # уведомление, которого пользователь не ждёт прямо сейчас
+    bulk = 2  # рассылки
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """
+        Сколько секунд ждать до следующего токена, 0 - можно сейчас
+        """
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+@dataclass
+class OutboundMessage:
+    chat_id: int
+    text: str
+    priority: Priority
+    enqueued_at: float
+    reply_markup: InlineKeyboardMarkup | None = None
+    # Задан - это editMessageText этого сообщения, а не новое сообщение
+    message_id: int | None = None
+    # Строки TgOutboxMessage, из которых собрано сообщение (см. OutboxRelay)
+    row_ids: list[int] = field(default_factory=list)
+
+
+@dataclass
+class OutboxStats:
+    sent: int = 0
+    coalesced: int = 0
+    throttled: int = 0
+    failed: int = 0
+    wait_total: float = 0
+    wait_max: float = 0
+    depth: dict[Priority, int] = field(default_factory=lambda: {priority: 0 for priority in Priority})
+
+    def as_dict(self) -> dict:
+        return {
+            'depth': sum(self.depth.values()),
+            'depth_by_priority': {priority.name: depth for priority, depth in self.depth.items()},
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'throttled': self.throttled,
+            'failed': self.failed,
+            'wait_avg': self.wait_total / self.sent if self.sent else 0,
+            'wait_max': self.wait_max,
+        }
+
+
+class Outbox:
+    """
+    Очередь исходящих сообщений с пулом из senders отправляющих потоков.
+    send_message и edit_message_text только ставят сообщение в очередь и сразу возвращаются.
+    Отправка ограничена общим token bucket и bucket'ом каждого чата; среди готовых чатов первым идёт
+    более высокий приоритет, при равном - тот, кто дольше ждёт. Сообщения одного чата уходят по порядку:
+    пока сообщение чата отправляется, следующее сообщение этого чата не берёт ни один поток.
+    Подряд идущие неотправленные сообщения в чат склеиваются в одно, повторные правки одного сообщения -
+    в последнюю. Ответы на нажатия кнопок не ограничиваются и уходят раньше очереди.
+    429 после всех повторов клиента не теряет сообщение: отправка приостанавливается на retry_after
+    """
+
+    def __init__(
+        self,
+        tg_client: TgClient,
+        global_rate: float = GLOBAL_RATE,
+        chat_rate: float = CHAT_RATE,
+        chat_burst: float = 1,
+        clock: Callable[[], float] = time.monotonic,
+        senders: int = SENDERS,
+        on_delivered: Callable[[list[int]], None] | None = None,
+    ) -> None:
+        self.tg_client = tg_client
+        self.senders = senders
+        # Вызывается с row_ids сообщения, когда с ним покончено: отправлено или отброшено после ошибки
+        self.on_delivered = on_delivered
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.clock = clock
+        self.stats = OutboxStats()
+        self._condition = threading.Condition()
+        self._chats: dict[int, deque[OutboundMessage]] = {}
+        # Голова очереди каждого чата: (priority, seq, chat_id)
+        self._heap: list[tuple[int, int, int]] = []
+        self._seq = itertools.count()
+        self._global = TokenBucket(global_rate, global_rate, clock())
+        self._buckets: dict[int, TokenBucket] = {}
+        self._answers: deque[tuple[str, int | None]] = deque()
+        # Чаты, сообщение которых сейчас отправляется: их нет в _heap
+        self._busy: set[int] = set()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._stopping = False
+        self._threads: list[threading.Thread] = []
+
+    def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        priority: Priority = Priority.reply,
+        reply_markup: InlineKeyboardMarkup | None = None,
+        row_id: int | None = None,
+    ) -> None:
+        row_ids = [] if row_id is None else [row_id]
+        with self._condition:
+            queue = self._chats.get(chat_id)
+            if queue and reply_markup is None:
+                last = queue[-1]
+                length = len(last.text) + len(COALESCE_SEPARATOR) + len(text)
+                plain = last.reply_markup is None and last.message_id is None
+                if plain and last.priority == priority and length <= MAX_MESSAGE_LENGTH:
+                    last.text += COALESCE_SEPARATOR + text
+                    last.row_ids += row_ids
+                    self.stats.coalesced += 1
+                    return
+            self._enqueue(OutboundMessage(chat_id, text, priority, self.clock(), reply_markup, row_ids=row_ids))
+
+    def edit_message_text(
+        self,
+        chat_id: int,
+        message_id: int,
+        text: str,
+        reply_markup: InlineKeyboardMarkup | None = None,
+        row_id: int | None = None,
+    ) -> None:
+        row_ids = [] if row_id is None else [row_id]
+        with self._condition:
+            queue = self._chats.get(chat_id)
+            if queue and queue[-1].message_id == message_id:
+                # Пользователь листает быстрее, чем уходят правки - промежуточные не нужны
+                queue[-1].text = text
+                queue[-1].reply_markup = reply_markup
+                queue[-1].row_ids += row_ids
+                self.stats.coalesced += 1
+                return
+            self._enqueue(
+                OutboundMessage(chat_id, text, Priority.reply, self.clock(), reply_markup, message_id, row_ids)
+            )
+
+    def answer_callback_query(self, callback_query_id: str, row_id: int | None = None) -> None:
+        with self._condition:
+            self._answers.append((callback_query_id, row_id))
+            self._condition.notify_all()
+
+    def _enqueue(self, message: OutboundMessage) -> None:
+        """
+        Под блокировкой: поставить сообщение в конец очереди его чата
+        """
+        chat_id, priority = message.chat_id, message.priority
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            queue = self._chats[chat_id] = deque()
+            # Занятый чат вернётся в кучу, когда отправка его сообщения закончится (_release)
+            if chat_id not in self._busy:
+                heapq.heappush(self._heap, (priority, next(self._seq), chat_id))
+        queue.append(message)
+        self.stats.depth[priority] += 1
+        self._condition.notify_all()
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+        return bucket
+
+    def _take_next(self) -> tuple[OutboundMessage | None, float | None]:
+        """
+        Под блокировкой: следующее сообщение, которое можно отправить прямо сейчас,
+        иначе сколько секунд ждать (None - очередь пуста)
+        """
+        if not self._heap:
+            return None, None
+        now = self.clock()
+        wait = max(self._paused_until - now, self._global.delay(now))
+        if wait > 0:
+            return None, wait
+
+        deferred = []
+        chosen = None
+        wait = math.inf
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            delay = self._chat_bucket(entry[2], now).delay(now)
+            if delay == 0:
+                chosen = entry
+                break
+            deferred.append(entry)
+            wait = min(wait, delay)
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+        if chosen is None:
+            return None, wait
+
+        chat_id = chosen[2]
+        queue = self._chats[chat_id]
+        message = queue.popleft()
+        if not queue:
+            del self._chats[chat_id]
+        self._busy.add(chat_id)
+        self.stats.depth[message.priority] -= 1
+        self._global.take(now)
+        self._chat_bucket(chat_id, now).take(now)
+        return message, 0
+
+    def _release(self, chat_id: int) -> None:
+        """
+        Под блокировкой: отправка сообщения чата закончилась, следующее сообщение чата снова можно брать
+        """
+        self._busy.discard(chat_id)
+        queue = self._chats.get(chat_id)
+        if queue:
+            heapq.heappush(self._heap, (queue[0].priority, next(self._seq), chat_id))
+
+    def _requeue(self, message: OutboundMessage, retry_after: float) -> None:
+        with self._condition:
+            self._paused_until = self.clock() + retry_after
+            # Чат ещё занят, в кучу его вернёт _release
+            queue = self._chats.get(message.chat_id)
+            if queue is None:
+                queue = self._chats[message.chat_id] = deque()
+            queue.appendleft(message)
+            self.stats.depth[message.priority] += 1
+            self.stats.throttled += 1
+
+    def _done(self, row_ids: list[int]) -> None:
+        if row_ids and self.on_delivered is not None:
+            try:
+                self.on_delivered(row_ids)
+            except Exception:
+                logger.exception('on_delivered failed')
+
+    def _deliver(self, message: OutboundMessage) -> None:
+        try:
+            if message.message_id is not None:
+                self.tg_client.edit_message_text(
+                    chat_id=message.chat_id,
+                    message_id=message.message_id,
+                    text=message.text,
+                    reply_markup=message.reply_markup,
+                )
+            elif message.reply_markup is not None:
+                self.tg_client.send_message(
+                    chat_id=message.chat_id, text=message.text, reply_markup=message.reply_markup
+                )
+            else:
+                self.tg_client.send_message(chat_id=message.chat_id, text=message.text)
+        except TgClientError as error:
+            if error.retry_after:
+                logger.warning('Flood limit, pause sending for %s s', error.retry_after)
+                self._requeue(message, error.retry_after)
+                return
+            with self._condition:
+                self.stats.failed += 1
+            logger.warning('Failed to send message to chat %s: %s', message.chat_id, error)
+        except Exception:
+            with self._condition:
+                self.stats.failed += 1
+            logger.exception('Failed to send message to chat %s', message.chat_id)
+        else:
+            wait = self.clock() - message.enqueued_at
+            with self._condition:
+                self.stats.sent += 1
+                self.stats.wait_total += wait
+                self.stats.wait_max = max(self.stats.wait_max, wait)
+            OUTBOX_WAIT.observe(wait)
+        self._done(message.row_ids)
+
+    def _answer(self, callback_query_id: str, row_id: int | None) -> None:
+        try:
+            self.tg_client.answer_callback_query(callback_query_id)
+        except Exception:
+            # Без ответа кнопка просто перестанет крутиться по таймауту
+            logger.warning('Failed to answer callback query %s', callback_query_id, exc_info=True)
+        self._done([] if row_id is None else [row_id])
+
+    def _prune_buckets(self) -> None:
+        # Полный bucket без очереди ничем не отличается от нового - забываем его
+        now = self.clock()
+        for chat_id in [chat_id for chat_id, bucket in self._buckets.items() if bucket.is_full(now)]:
+            if chat_id not in self._chats:
+                del self._buckets[chat_id]
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                answer = self._answers.popleft() if self._answers else None
+                message, wait = (None, 0) if answer else self._take_next()
+                if answer is None and message is None:
+                    if self._stopping and not self._chats and not self._in_flight:
+                        return
+                    if wait is None and len(self._buckets) > 1000:
+                        self._prune_buckets()
+                    self._condition.wait(timeout=wait)
+                    continue
+                self._in_flight += 1
+            if answer is not None:
+                self._answer(*answer)
+            else:
+                self._deliver(message)
+            with self._condition:
+                self._in_flight -= 1
+                if message is not None:
+                    self._release(message.chat_id)
+                self._condition.notify_all()
+
+    def start(self) -> 'Outbox':
+        self._threads = [
+            threading.Thread(target=self._run, name=f'bot-outbox-{n}', daemon=True) for n in range(self.senders)
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Дождаться отправки всего, что уже в очереди
+        :return: True, если очередь опустела за timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._chats and not self._answers and not self._in_flight, timeout=timeout
+            )
+
+    def stop(self, timeout: float | None = None) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+class DbOutbox:
+    """
+    Ответы бота строками TgOutboxMessage - тот же интерфейс, что у Outbox.
+    Строка пишется в текущей транзакции: откат обработки отменяет и её ответы.
+    Отправляет OutboxRelay; notify будит relay этого же процесса после коммита
+    """
+
+    def __init__(self, notify: Callable[[], None] | None = None) -> None:
+        self.notify = notify
+
+    def _add(self, **fields: Any) -> None:
+        TgOutboxMessage.objects.create(**fields)
+        if self.notify is not None:
+            transaction.on_commit(self.notify)
+
+    def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        priority: Priority = Priority.reply,
+        reply_markup: InlineKeyboardMarkup | None = None,
+    ) -> None:
+        self._add(chat_id=chat_id, text=text, priority=priority, reply_markup=reply_markup and reply_markup.dict())
+
+    def send_messages(self, messages: list[tuple[int, str]], priority: Priority = Priority.reply) -> None:
+        """
+        Много сообщений одной вставкой - для рассылок
+        :param messages: [(chat_id, text)]
+        """
+        TgOutboxMessage.objects.bulk_create(
+            [TgOutboxMessage(chat_id=chat_id, text=text, priority=priority) for chat_id, text in messages]
+        )
+        if messages and self.notify is not None:
+            transaction.on_commit(self.notify)
+
+    def edit_message_text(
+        self, chat_id: int, message_id: int, text: str, reply_markup: InlineKeyboardMarkup | None = None
+    ) -> None:
+        self._add(chat_id=chat_id, message_id=message_id, text=text, reply_markup=reply_markup and reply_markup.dict())
+
+    def answer_callback_query(self, callback_query_id: str) -> None:
+        self._add(callback_query_id=callback_query_id)
+
+
+class OutboxRelay:
+    """
+    Доставка TgOutboxMessage через Outbox: строки передаются по порядку id, доставленные удаляются.
+    Строки одного чата пишут транзакции, которые идут строго одна за другой (очередь чата BotRuntime,
+    advisory lock webhook, захват чата воркером), поэтому порядок id внутри чата - порядок ответов.
+    Падение между отправкой и удалением строки отправит сообщение повторно, но не потеряет его.
+    Relay должен быть один на базу: два relay отправят одни и те же строки
+    """
+
+    def __init__(
+        self,
+        tg_client: TgClient,
+        batch_size: int = RELAY_BATCH_SIZE,
+        max_queued: int = RELAY_MAX_QUEUED,
+        idle_delay: float = RELAY_IDLE_DELAY,
+        **outbox_options: Any,
+    ) -> None:
+        self.outbox = Outbox(tg_client, on_delivered=self._delivered, **outbox_options)
+        self.batch_size = batch_size
+        self.max_queued = max_queued
+        self.idle_delay = idle_delay
+        # Строки, переданные в outbox; удаляются из таблицы и отсюда после доставки
+        self._queued: set[int] = set()
+        self._lock = threading.Lock()
+        self._delivered_ids: list[int] = []
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._stop_timeout: float | None = None
+        self._thread: threading.Thread | None = None
+
+    def _delivered(self, row_ids: list[int]) -> None:
+        # Поток отправки outbox: удаление - дело потока relay, чтобы не держать соединения в пуле отправки
+        with self._lock:
+            self._delivered_ids += row_ids
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def remove_delivered(self) -> None:
+        with self._lock:
+            row_ids, self._delivered_ids = self._delivered_ids, []
+        if not row_ids:
+            return
+        try:
+            TgOutboxMessage.objects.filter(id__in=row_ids).delete()
+        except Exception:
+            # Строки остаются в _queued и повторно не отправляются - удалить их нужно на следующем шаге
+            with self._lock:
+                self._delivered_ids = row_ids + self._delivered_ids
+            raise
+        self._queued.difference_update(row_ids)
+
+    def relay_once(self) -> int:
+        """
+        Удалить доставленное и передать в outbox следующие строки
+        :return: сколько строк передано
+        """
+        self.remove_delivered()
+        room = min(self.batch_size, self.max_queued - len(self._queued))
+        if room <= 0:
+            return 0
+        rows = list(TgOutboxMessage.objects.exclude(id__in=self._queued).order_by('id')[:room])
+        for row in rows:
+            self._queued.add(row.id)
+            reply_markup = row.reply_markup and InlineKeyboardMarkup.parse_obj(row.reply_markup)
+            if row.callback_query_id is not None:
+                self.outbox.answer_callback_query(row.callback_query_id, row_id=row.id)
+            elif row.message_id is not None:
+                self.outbox.edit_message_text(row.chat_id, row.message_id, row.text, reply_markup, row_id=row.id)
+            else:
+                self.outbox.send_message(
+                    row.chat_id, row.text, Priority(row.priority), reply_markup=reply_markup, row_id=row.id
+                )
+        return len(rows)
+
+    def run(self) -> None:
+        self.outbox.start()
+        try:
+            while not self._stopping.is_set():
+                close_old_connections()
+                try:
+                    relayed = self.relay_once()
+                except Exception:
+                    logger.exception('Outbox relay failed')
+                    relayed = 0
+                if not relayed:
+                    self._wake.wait(self.idle_delay)
+                    self._wake.clear()
+        finally:
+            self.outbox.stop(timeout=self._stop_timeout)
+            self.remove_delivered()
+            # Поток завершается - его соединение больше никому не нужно
+            connection.close()
+
+    def start(self) -> 'OutboxRelay':
+        self._thread = threading.Thread(target=self.run, name='bot-outbox-relay', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Досылает уже переданное в outbox; остальные строки дождутся следующего запуска
+        """
+        self._stop_timeout = timeout
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def join(self) -> None:
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from bot.models import ReminderWatermark
+from bot.outbox import MAX_MESSAGE_LENGTH
+from goals.models import Goal
+
+OPEN_STATUSES = (Goal.Status.to_do, Goal.Status.in_progress)
+HEADERS = {
+    ReminderWatermark.Kind.due_soon: 'Скоро срок:',
+    ReminderWatermark.Kind.overdue: 'Просрочено:',
+}
+
+
+@dataclass(frozen=True)
+class Reminder:
+    chat_id: int
+    kind: str
+    title: str
+    due_date: date
+
+
+def get_horizon(kind: str, today: date, days: int) -> date:
+    """
+    Последний срок, о котором пора напомнить: due_soon - за days дней, overdue - на следующий день после срока
+    """
+    if kind == ReminderWatermark.Kind.due_soon:
+        return today + timedelta(days=days)
+    return today - timedelta(days=1)
+
+
+def collect_reminders(today: date, days: int, now: datetime | None = None) -> list[Reminder]:
+    """
+    Новые напоминания с прошлого запуска; водяные знаки сдвигаются в той же транзакции.
+    Читается только окно сроков (водяной знак, горизонт] по индексу goal_open_due_date_idx и цели,
+    изменённые после прошлого запуска (goal_open_due_updated_idx), - работа не растёт с числом целей.
+    Изменённая цель со сроком в уже пройденном окне напоминается ещё раз: так не теряются новые цели
+    и перенесённые сроки. Блокировка водяных знаков не даёт двум запускам разослать одно и то же.
+    Сообщения нужно сохранить в той же внешней транзакции (см. send_reminders): иначе водяные знаки
+    сдвинутся, а напоминания потеряются, если до отправки дело не дойдёт
+    """
+    now = now or timezone.now()
+    reminders = []
+    with transaction.atomic():
+        for kind in ReminderWatermark.Kind:
+            horizon = get_horizon(kind, today, days)
+            ReminderWatermark.objects.get_or_create(
+                kind=kind, defaults={'due_date': min(today, horizon) - timedelta(days=1), 'run_at': now}
+            )
+            watermark = ReminderWatermark.objects.select_for_update().get(kind=kind)
+
+            due = Q(due_date__gt=watermark.due_date, due_date__lte=horizon)
+            if kind == ReminderWatermark.Kind.due_soon:
+                due |= Q(updated__gt=watermark.run_at, due_date__gte=today, due_date__lte=horizon)
+            rows = (
+                Goal.objects.filter(
+                    due,
+                    status__in=OPEN_STATUSES,
+                    board__is_deleted=False,
+                    category__is_deleted=False,
+                    user__tguser__isnull=False,
+                )
+                .order_by('due_date', 'id')
+                .values_list('user__tguser__chat_id', 'title', 'due_date')
+            )
+            reminders.extend(Reminder(chat_id, kind, title, due_date) for chat_id, title, due_date in rows)
+
+            watermark.due_date = max(watermark.due_date, horizon)
+            watermark.run_at = now
+            watermark.save(update_fields=['due_date', 'run_at'])
+    return reminders
+
+
+def render_reminders(reminders: list[Reminder]) -> dict[int, list[str]]:
+    """
+    Одно сообщение на чат (несколько, если не влезает в лимит Telegram)
+    :return: chat_id -> тексты сообщений
+    """
+    lines_by_chat: dict[int, dict[str, list[str]]] = {}
+    for reminder in reminders:
+        sections = lines_by_chat.setdefault(reminder.chat_id, {kind: [] for kind in HEADERS})
+        sections[reminder.kind].append(f'{reminder.title} - до {reminder.due_date:%d.%m.%Y}')
+
+    messages: dict[int, list[str]] = {}
+    for chat_id, sections in lines_by_chat.items():
+        texts = messages[chat_id] = []
+        current = ''
+        for kind, lines in sections.items():
+            if not lines:
+                continue
+            for line in (f'\n{HEADERS[kind]}', *lines):
+                if current and len(current) + len(line) + 1 > MAX_MESSAGE_LENGTH:
+                    texts.append(current.strip())
+                    current = ''
+                current += f'{line}\n'
+        texts.append(current.strip())
+    return messages
@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable
+
+from django.db import close_old_connections, transaction
+
+from bot.metrics import UPDATE_LATENCY, UPDATE_WAIT, UPDATES_SKIPPED
+from bot.models import TgUpdate, TgUpdateOffset
+from bot.tg.client import TgClient
+from bot.tg.schemas import UpdateObj
+
+logger = logging.getLogger(__name__)
+
+POLL_ERROR_DELAY = 1
+# Накопившееся за время простоя выбирается пачками без ожидания, потом - обычный long polling
+CATCH_UP_LIMIT = 100
+
+
+def get_chat_id(update: UpdateObj) -> int | None:
+    # Обновления без чата обрабатываются одной общей очередью
+    return update.chat_id
+
+
+def get_update_kind(update: UpdateObj) -> str:
+    for kind, value in update:
+        if kind != 'update_id' and value is not None:
+            return kind
+    return 'unknown'
+
+
+def store_received(
+    updates: list[UpdateObj], offset: int, accepts: Callable[[UpdateObj], bool] | None = None
+) -> list[UpdateObj]:
+    """
+    Записать полученные обновления в TgUpdate вместе со следующим offset одной транзакцией -
+    до того, как следующий getUpdates подтвердит их Telegram. Повторно полученные отбрасываются по update_id
+    :return: принятые обновления (остальные только сдвигают offset)
+    """
+    accepted = []
+    for update in updates:
+        if accepts is None or accepts(update):
+            accepted.append(update)
+        else:
+            UPDATES_SKIPPED.inc(kind=get_update_kind(update))
+    if updates:
+        rows = [
+            TgUpdate(update_id=update.update_id, chat_id=update.chat_id, payload=update.dict(exclude_none=True))
+            for update in accepted
+        ]
+        with transaction.atomic():
+            TgUpdate.objects.bulk_create(rows, ignore_conflicts=True)
+            TgUpdateOffset.store(offset)
+    return accepted
+
+
+class BotRuntime:
+    """
+    Асинхронный цикл бота.
+    Обновления разных чатов обрабатываются параллельно, не больше workers одновременно,
+    обновления одного чата - строго по очереди. Обработчик синхронный (ORM, HTTP-клиент),
+    поэтому выполняется в пуле потоков; long polling идёт в своём потоке и не ждёт свободного воркера.
+    С durable=True полученные обновления сначала пишутся в TgUpdate вместе с offset и только потом
+    подтверждаются Telegram следующим getUpdates. Обработанное удаляется из TgUpdate в транзакции обработчика,
+    так что после рестарта оставшиеся записи обрабатываются заново, а обработанное не повторяется
+    """
+
+    def __init__(
+        self,
+        tg_client: TgClient,
+        handler: Callable[[UpdateObj], None],
+        workers: int = 8,
+        poll_timeout: int = 60,
+        max_pending: int = 1000,
+        accepts: Callable[[UpdateObj], bool] | None = None,
+        durable: bool = False,
+    ) -> None:
+        self.tg_client = tg_client
+        self.handler = handler
+        # Обновления, которые обработчик не принимает, только сдвигают offset - без очереди и потока
+        self.accepts = accepts
+        self.workers = workers
+        self.poll_timeout = poll_timeout
+        # Больше max_pending необработанных обновлений - новые не запрашиваются
+        self.max_pending = max_pending
+        self.durable = durable
+        self.offset = 0
+        self.pending = 0
+        self.catching_up = True
+        # Обновление и время его получения (perf_counter) - для метрик задержки
+        self._queues: dict[int | None, deque[tuple[UpdateObj, float]]] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bot-worker')
+        self._poller = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bot-poller')
+        self._progress: asyncio.Condition | None = None
+
+    def _ensure_primitives(self) -> None:
+        # Создаются лениво, уже внутри работающего цикла событий
+        if self._progress is None:
+            self._progress = asyncio.Condition()
+
+    def dispatch(self, update: UpdateObj) -> None:
+        """
+        Поставить обновление в очередь его чата; первая запись в очереди запускает обработчика чата
+        """
+        self._ensure_primitives()
+        chat_id = get_chat_id(update)
+        self.pending += 1
+        item = (update, time.perf_counter())
+        queue = self._queues.get(chat_id)
+        if queue is not None:
+            queue.append(item)
+            return
+
+        self._queues[chat_id] = deque([item])
+        task = asyncio.create_task(self._drain_chat(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drain_chat(self, chat_id: int | None) -> None:
+        queue = self._queues[chat_id]
+        loop = asyncio.get_running_loop()
+        try:
+            while queue:
+                update, received_at = queue.popleft()
+                try:
+                    # Пул на workers потоков и ограничивает число одновременно обрабатываемых чатов
+                    await loop.run_in_executor(self._executor, self._handle, update, received_at)
+                except Exception:
+                    logger.exception('Failed to handle update %s', update.update_id)
+                finally:
+                    # Иначе wait_pending не дождётся, а poll_once перестанет запрашивать обновления
+                    self.pending -= 1
+                    async with self._progress:
+                        self._progress.notify_all()
+        finally:
+            # Между проверкой пустой очереди и удалением нет await, dispatch не вклинится
+            del self._queues[chat_id]
+
+    def _handle(self, update: UpdateObj, received_at: float) -> None:
+        UPDATE_WAIT.observe(time.perf_counter() - received_at)
+        # Как вокруг HTTP-запроса: соединение потока закрывается по CONN_MAX_AGE или при ошибке
+        close_old_connections()
+        try:
+            if self.durable:
+                with transaction.atomic():
+                    self.handler(update)
+                    TgUpdate.objects.filter(update_id=update.update_id).delete()
+            else:
+                self.handler(update)
+        except Exception:
+            logger.exception('Failed to handle update %s', update.update_id)
+            if self.durable:
+                # Повтор после рестарта упадёт так же - обновление считается обработанным.
+                # Если упала сама база, запись останется и обновление обработается после рестарта
+                try:
+                    TgUpdate.objects.filter(update_id=update.update_id).delete()
+                except Exception:
+                    logger.exception('Failed to remove handled update %s', update.update_id)
+        finally:
+            close_old_connections()
+            UPDATE_LATENCY.observe(time.perf_counter() - received_at)
+
+    async def wait_pending(self, limit: int = 0) -> None:
+        """
+        Дождаться, пока в обработке останется не больше limit обновлений
+        """
+        self._ensure_primitives()
+        async with self._progress:
+            await self._progress.wait_for(lambda: self.pending <= limit)
+
+    def restore(self) -> list[UpdateObj]:
+        """
+        Продолжить с сохранённого offset
+        :return: полученные, но не обработанные до рестарта обновления - по порядку update_id
+        """
+        self.offset = TgUpdateOffset.load()
+        payloads = TgUpdate.objects.order_by('update_id').values_list('payload', flat=True)
+        updates = [UpdateObj.parse_obj(payload) for payload in payloads]
+        close_old_connections()
+        return updates
+
+    async def poll_once(self) -> int:
+        """
+        Один запрос getUpdates и раздача полученных обновлений по чатам.
+        Пока идёт догон, обновления берутся пачками по CATCH_UP_LIMIT без ожидания;
+        неполная пачка значит, что очередь Telegram выбрана и дальше идёт long polling.
+        Запрос подтверждает Telegram всё полученное раньше, поэтому медленный чат не задерживает остальные;
+        с durable=True полученное к этому моменту уже записано в TgUpdate
+        :return: number of received updates
+        """
+        loop = asyncio.get_running_loop()
+        await self.wait_pending(self.max_pending - 1)
+        if self.catching_up:
+            get_updates = partial(self.tg_client.get_updates, offset=self.offset, timeout=0, limit=CATCH_UP_LIMIT)
+        else:
+            get_updates = partial(self.tg_client.get_updates, offset=self.offset, timeout=self.poll_timeout)
+        try:
+            response = await loop.run_in_executor(self._poller, get_updates)
+        except Exception:
+            logger.exception('getUpdates failed')
+            await asyncio.sleep(POLL_ERROR_DELAY)
+            return 0
+
+        if self.catching_up and len(response.result) < CATCH_UP_LIMIT:
+            self.catching_up = False
+        if not response.result:
+            return 0
+        offset = response.result[-1].update_id + 1
+        if self.durable:
+            try:
+                updates = await loop.run_in_executor(
+                    self._poller, store_received, response.result, offset, self.accepts
+                )
+            except Exception:
+                # offset не сдвигается: незаписанное не будет подтверждено и придёт снова
+                logger.exception('Failed to store received updates')
+                await asyncio.sleep(POLL_ERROR_DELAY)
+                return 0
+        else:
+            updates = []
+            for item in response.result:
+                if self.accepts is None or self.accepts(item):
+                    updates.append(item)
+                else:
+                    UPDATES_SKIPPED.inc(kind=get_update_kind(item))
+        self.offset = offset
+        for item in updates:
+            self.dispatch(item)
+        return len(response.result)
+
+    async def run(self, stop: asyncio.Event | None = None) -> None:
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            if self.durable:
+                for update in await loop.run_in_executor(self._poller, self.restore):
+                    self.dispatch(update)
+            while not stop.is_set():
+                await self.poll_once()
+            await self.wait_pending()
+        finally:
+            self._executor.shutdown(wait=False)
+            self._poller.shutdown(wait=False)
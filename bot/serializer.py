@@ -15,16 +15,18 @@ class TgUserSerializer(serializers.ModelSerializer):
     verification_code = serializers.CharField(write_only=True)
 
     def validate_verification_code(self, code: str) -> str:
-        try:
-            tg_user = TgUser.objects.get(verification_code=code)
-        except TgUser.DoesNotExist:
+        # Один запрос по уникальному индексу хеша; истёкший код не подходит
+        tg_user = TgUser.objects.filter(
+            verification_code_hash=TgUser.hash_verification_code(code),
+            verification_code_issued_at__gt=TgUser.verification_code_valid_since(),
+        ).first()
+        if tg_user is None:
             raise ValidationError('Invalid verification code.')
-        else:
-            if tg_user.is_verified:
-                raise ValidationError('User has already verified.')
+        if tg_user.is_verified:
+            raise ValidationError('User has already verified.')
 
-            self.instance = tg_user
-            return code
+        self.instance = tg_user
+        return code
 
     class Meta:
         model = TgUser
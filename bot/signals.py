@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from bot.identity import identity_cache
+from bot.models import TgUser
+
+
+@receiver(post_delete, sender=TgUser)
+def forget_chat_identity(sender, instance: TgUser, **kwargs) -> None:
+    # Иначе кеш до истечения ttl отдаёт id удалённого пользователя, и запись целей от его имени падает.
+    # Второй сброс после коммита - параллельное сообщение могло закешировать ещё не удалённую строку
+    identity_cache.invalidate(instance.chat_id)
+    transaction.on_commit(lambda: identity_cache.invalidate(instance.chat_id))
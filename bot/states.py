@@ -0,0 +1,119 @@
+import abc
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from bot.models import TgChatState
+
+
+class StateStore(abc.ABC):
+    """
+    Состояние диалога по chat_id. Пустое состояние - диалога нет.
+    Состояние истекает через ttl секунд после последней записи
+    """
+
+    def __init__(self, ttl: int | None = None) -> None:
+        self.ttl = settings.BOT_STATE_TTL if ttl is None else ttl
+
+    @abc.abstractmethod
+    def get(self, chat_id: int) -> dict:
+        ...
+
+    @abc.abstractmethod
+    def set(self, chat_id: int, state: dict) -> None:
+        ...
+
+    @abc.abstractmethod
+    def delete(self, chat_id: int) -> None:
+        ...
+
+    @abc.abstractmethod
+    def purge_expired(self) -> int:
+        """
+        Удалить брошенные диалоги
+        :return: number of removed states
+        """
+        ...
+
+
+class MemoryStateStore(StateStore):
+    """
+    Состояния в памяти процесса: для тестов и единственного воркера
+    """
+
+    def __init__(self, ttl: int | None = None) -> None:
+        super().__init__(ttl)
+        self._states: dict[int, tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, chat_id: int) -> dict:
+        with self._lock:
+            expires_at, state = self._states.get(chat_id, (0, {}))
+        return dict(state) if expires_at > time.monotonic() else {}
+
+    def set(self, chat_id: int, state: dict) -> None:
+        with self._lock:
+            self._states[chat_id] = (time.monotonic() + self.ttl, dict(state))
+
+    def delete(self, chat_id: int) -> None:
+        with self._lock:
+            self._states.pop(chat_id, None)
+
+    def purge_expired(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [chat_id for chat_id, (expires_at, _) in self._states.items() if expires_at <= now]
+            for chat_id in expired:
+                del self._states[chat_id]
+        return len(expired)
+
+
+class DbStateStore(StateStore):
+    """
+    Состояния в таблице TgChatState: переживают рестарт, общие для нескольких воркеров бота.
+    Каждая операция - один запрос, запись - upsert по chat_id
+    """
+
+    def get(self, chat_id: int) -> dict:
+        state = (
+            TgChatState.objects.filter(chat_id=chat_id, expires_at__gt=timezone.now())
+            .values_list('state', flat=True)
+            .first()
+        )
+        return state or {}
+
+    def set(self, chat_id: int, state: dict) -> None:
+        TgChatState.objects.bulk_create(
+            [TgChatState(chat_id=chat_id, state=state, expires_at=timezone.now() + timedelta(seconds=self.ttl))],
+            update_conflicts=True,
+            unique_fields=['chat_id'],
+            update_fields=['state', 'expires_at'],
+        )
+
+    def delete(self, chat_id: int) -> None:
+        TgChatState.objects.filter(chat_id=chat_id).delete()
+
+    def purge_expired(self) -> int:
+        deleted, _ = TgChatState.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+STATE_STORES: dict[str, type[StateStore]] = {
+    'memory': MemoryStateStore,
+    'db': DbStateStore,
+}
+
+
+def get_state_store(name: str | None = None) -> StateStore:
+    return STATE_STORES[name or settings.BOT_STATE_STORE]()
+
+
+async def purge_expired_periodically(store: StateStore, interval: float) -> None:
+    while True:
+        await sync_to_async(store.purge_expired, thread_sensitive=False)()
+        await asyncio.sleep(interval)
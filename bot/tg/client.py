@@ -1,17 +1,71 @@
+import functools
+import logging
+import time
+from typing import Any, Callable
+
 import requests
 from django.conf import settings
-from requests import Response
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from bot.metrics import TG_API_LATENCY, TG_API_REQUESTS
+from bot.tg.schemas import GetUpdatesResponse, InlineKeyboardMarkup, SendMessageResponse
+
+logger = logging.getLogger(__name__)
+
+# Повтор этих методов после неизвестного исхода запроса ничего не задваивает
+IDEMPOTENT_METHODS = frozenset({'getUpdates', 'setWebhook', 'deleteWebhook'})
+
+
+def is_not_sent(error: requests.RequestException) -> bool:
+    """
+    Запрос точно не ушёл: соединение не установлено (таймаут подключения, отказ в соединении, ошибка DNS).
+    requests оборачивает NewConnectionError в ConnectionError через MaxRetryError - причина в его reason
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
 
-from bot.tg.schemas import GetUpdatesResponse, SendMessageResponse
+
+class TgClientError(Exception):
+    """
+    Telegram вернул ошибку или не ответил после всех повторов
+    """
+
+    def __init__(self, description: str, error_code: int | None = None, retry_after: float | None = None) -> None:
+        super().__init__(description)
+        self.error_code = error_code
+        self.retry_after = retry_after
 
 
 class TgClient:
     """
-    Класс взаимодействия с telegram-ботом
+    Класс взаимодействия с telegram-ботом.
+    Один keep-alive пул соединений на клиента, POST с JSON, явные таймауты,
+    повторы с экспоненциальной задержкой на 429/5xx (retry_after из ответа учитывается) и сетевые ошибки:
+    неидемпотентные методы повторяются только по ConnectTimeout, когда запрос точно не ушёл
     """
 
-    def __init__(self, token: str = settings.BOT_TOKEN) -> None:
+    connect_timeout: float = 5
+    read_timeout: float = 15
+    max_retries: int = 3
+    backoff: float = 0.5
+    pool_size: int = 16
+
+    def __init__(
+        self,
+        token: str = settings.BOT_TOKEN,
+        base_url: str | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
         self.token = token
+        self.base_url = (base_url or settings.TG_API_URL).rstrip('/')
+        self.sleep = sleep
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
     def get_url(self, method: str) -> str:
         """
@@ -19,30 +73,110 @@ class TgClient:
         :param method: telegram method
         :return: url for request
         """
-        return f'https://api.telegram.org/bot{self.token}/{method}'
+        return f'{self.base_url}/bot{self.token}/{method}'
+
+    def _retry_delay(self, attempt: int, retry_after: float | None = None) -> float:
+        return retry_after if retry_after is not None else self.backoff * 2**attempt
+
+    def _request(self, method: str, payload: dict, read_timeout: float | None = None) -> dict[str, Any]:
+        """
+        POST метода Bot API с повторами
+        :return: разобранный JSON ответа с ok=True
+        """
+        timeout = (self.connect_timeout, read_timeout or self.read_timeout)
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                with TG_API_LATENCY.time(method=method):
+                    response = self.session.post(self.get_url(method), json=payload, timeout=timeout)
+            except requests.RequestException as error:
+                TG_API_REQUESTS.inc(method=method, status='error')
+                # Повторять неидемпотентный метод можно, только если соединение не установилось. После таймаута
+                # чтения или обрыва установленного соединения Telegram мог выполнить запрос - повтор задвоит его
+                retryable = is_not_sent(error) or method in IDEMPOTENT_METHODS
+                if last_attempt or not retryable:
+                    raise TgClientError(f'{method}: {error}') from error
+                self.sleep(self._retry_delay(attempt))
+                continue
+
+            TG_API_REQUESTS.inc(method=method, status=response.status_code)
+            try:
+                data = response.json()
+            except ValueError:
+                data = {'ok': False, 'description': response.text}
+
+            if response.status_code == 429 or response.status_code >= 500:
+                retry_after = data.get('parameters', {}).get('retry_after') or response.headers.get('Retry-After')
+                retry_after = float(retry_after) if retry_after is not None else None
+                if last_attempt:
+                    raise TgClientError(data.get('description', method), response.status_code, retry_after)
+                logger.warning('%s: %s, retry %s', method, response.status_code, attempt + 1)
+                self.sleep(self._retry_delay(attempt, retry_after))
+                continue
+
+            if not data.get('ok'):
+                raise TgClientError(data.get('description', method), data.get('error_code', response.status_code))
+            return data
+        raise TgClientError(method)
 
-    def get_updates(self, offset: int = 0, timeout: int = 60) -> GetUpdatesResponse:
+    def get_updates(self, offset: int = 0, timeout: int = 60, limit: int | None = None) -> GetUpdatesResponse:
         """
         Получайте обновления от telegram-бота
         :param offset: offset
         :param timeout: timeout
+        :param limit: не больше limit обновлений (1-100, по умолчанию Telegram отдаёт 100)
         :return: response
         """
-        response: Response = requests.get(
-            self.get_url('getUpdates'), params={'offset': offset, 'timeout': timeout}
-        )
-        data = response.json()
+        payload = {'offset': offset, 'timeout': timeout}
+        if limit is not None:
+            payload['limit'] = limit
+        # Long polling: сервер держит запрос до timeout секунд, read timeout должен быть больше
+        data = self._request('getUpdates', payload, read_timeout=timeout + self.read_timeout)
         return GetUpdatesResponse(**data)
 
-    def send_message(self, chat_id: int, text: str) -> SendMessageResponse:
+    def send_message(
+        self, chat_id: int, text: str, reply_markup: InlineKeyboardMarkup | None = None
+    ) -> SendMessageResponse:
         """
         Отправить сообщение telegram-боту
         :param chat_id: chat id
         :param text: text message
+        :param reply_markup: inline-клавиатура под сообщением
         :return: response
         """
-        response: Response = requests.get(
-            self.get_url('sendMessage'), params={'chat_id': chat_id, 'text': text}
-        )
-        data = response.json()
+        payload: dict[str, Any] = {'chat_id': chat_id, 'text': text}
+        if reply_markup is not None:
+            payload['reply_markup'] = reply_markup.dict()
+        data = self._request('sendMessage', payload)
         return SendMessageResponse(**data)
+
+    def edit_message_text(
+        self, chat_id: int, message_id: int, text: str, reply_markup: InlineKeyboardMarkup | None = None
+    ) -> None:
+        """
+        Заменить текст и клавиатуру уже отправленного сообщения
+        """
+        payload: dict[str, Any] = {'chat_id': chat_id, 'message_id': message_id, 'text': text}
+        if reply_markup is not None:
+            payload['reply_markup'] = reply_markup.dict()
+        self._request('editMessageText', payload)
+
+    def answer_callback_query(self, callback_query_id: str) -> None:
+        """
+        Подтвердить нажатие inline-кнопки, иначе клиент показывает загрузку до таймаута
+        """
+        self._request('answerCallbackQuery', {'callback_query_id': callback_query_id})
+
+    def set_webhook(self, url: str, secret_token: str, max_connections: int = 40) -> None:
+        self._request('setWebhook', {'url': url, 'secret_token': secret_token, 'max_connections': max_connections})
+
+    def delete_webhook(self) -> None:
+        self._request('deleteWebhook', {})
+
+
+@functools.cache
+def get_tg_client() -> TgClient:
+    """
+    Общий клиент процесса: view и команды переиспользуют один пул соединений
+    """
+    return TgClient()
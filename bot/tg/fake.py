@@ -0,0 +1,214 @@
+import itertools
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bot.tg.schemas import (
+    CallbackQuery,
+    Chat,
+    GetUpdatesResponse,
+    InlineKeyboardMarkup,
+    Message,
+    SendMessageResponse,
+    UpdateObj,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class FakeTgClient:
+    """
+    Транспорт Telegram в памяти с интерфейсом TgClient: для тестов и локального прогона бота без сети.
+    get_updates, как и настоящий API, отдаёт обновления начиная с offset и забывает подтверждённые
+    """
+
+    max_updates = 100
+
+    def __init__(self) -> None:
+        self.sent: list[tuple[int, str]] = []
+        self.edited: list[tuple[int, int, str]] = []
+        self.answered: list[str] = []
+        # (chat_id, message_id) -> текущая клавиатура сообщения
+        self.keyboards: dict[tuple[int, int], InlineKeyboardMarkup | None] = {}
+        self._sent_count: dict[int, int] = {}
+        self._updates: list[UpdateObj] = []
+        self._next_update_id = 1
+        self._message_ids = itertools.count(1)
+        self._condition = threading.Condition()
+
+    def _push(self, **kwargs) -> UpdateObj:
+        with self._condition:
+            update = UpdateObj(update_id=self._next_update_id, **kwargs)
+            self._next_update_id += 1
+            self._updates.append(update)
+            self._condition.notify_all()
+        return update
+
+    def push_update(self, update: UpdateObj) -> UpdateObj:
+        """
+        Поставить готовое обновление (например, из записи getUpdates) со следующим update_id
+        """
+        return self._push(**update.dict(exclude={'update_id'}))
+
+    def push_message(self, chat_id: int, text: str) -> UpdateObj:
+        return self._push(message=Message(chat=Chat(id=chat_id), text=text))
+
+    def push_callback(self, chat_id: int, message_id: int, data: str) -> UpdateObj:
+        message = Message(message_id=message_id, chat=Chat(id=chat_id))
+        return self._push(callback_query=CallbackQuery(id=str(self._next_update_id), message=message, data=data))
+
+    def get_updates(self, offset: int = 0, timeout: int = 60, limit: int | None = None) -> GetUpdatesResponse:
+        with self._condition:
+            self._updates = [update for update in self._updates if update.update_id >= offset]
+            self._condition.wait_for(lambda: bool(self._updates), timeout=timeout)
+            return GetUpdatesResponse(ok=True, result=self._updates[: min(limit or self.max_updates, self.max_updates)])
+
+    def send_message(
+        self, chat_id: int, text: str, reply_markup: InlineKeyboardMarkup | None = None
+    ) -> SendMessageResponse:
+        with self._condition:
+            message_id = next(self._message_ids)
+            self.sent.append((chat_id, text))
+            self.keyboards[chat_id, message_id] = reply_markup
+            self._sent_count[chat_id] = self._sent_count.get(chat_id, 0) + 1
+            self._condition.notify_all()
+        return SendMessageResponse(ok=True, result=Message(message_id=message_id, chat=Chat(id=chat_id), text=text))
+
+    def edit_message_text(
+        self, chat_id: int, message_id: int, text: str, reply_markup: InlineKeyboardMarkup | None = None
+    ) -> None:
+        with self._condition:
+            self.edited.append((chat_id, message_id, text))
+            self.keyboards[chat_id, message_id] = reply_markup
+
+    def answer_callback_query(self, callback_query_id: str) -> None:
+        with self._condition:
+            self.answered.append(callback_query_id)
+
+    def messages_to(self, chat_id: int) -> list[str]:
+        with self._condition:
+            return [text for sent_chat_id, text in self.sent if sent_chat_id == chat_id]
+
+    def sent_count(self, chat_id: int) -> int:
+        with self._condition:
+            return self._sent_count.get(chat_id, 0)
+
+    def wait_for_messages(self, chat_id: int, count: int, timeout: float | None = None) -> bool:
+        """
+        Дождаться, пока в чат уйдёт count сообщений
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._sent_count.get(chat_id, 0) >= count, timeout=timeout)
+
+    def last_message_id(self, chat_id: int) -> int:
+        with self._condition:
+            return max(message_id for key_chat_id, message_id in self.keyboards if key_chat_id == chat_id)
+
+
+def load_recorded_updates(path: str) -> list[UpdateObj]:
+    """
+    Обновления из сохранённого ответа getUpdates (например, tg_get_respons.json); лишние поля отбрасываются
+    """
+    with open(path, encoding='utf-8') as file:
+        return GetUpdatesResponse(**json.load(file)).result
+
+
+class _FakeTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Заголовки и тело уходят разными write: с Nagle каждый keep-alive ответ ждёт delayed ACK (~40 мс)
+    disable_nagle_algorithm = True
+    server: 'FakeTelegramServer'
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        token, _, method = self.path.lstrip('/').partition('/')
+        if token != f'bot{self.server.token}':
+            self._reply(401, {'ok': False, 'error_code': 401, 'description': 'Unauthorized'})
+            return
+        try:
+            result = self.server.call(method, payload)
+        except KeyError:
+            self._reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+        except Exception as error:
+            logger.exception('Fake Telegram %s failed', method)
+            self._reply(400, {'ok': False, 'error_code': 400, 'description': f'Bad Request: {error}'})
+        else:
+            self._reply(200, {'ok': True, 'result': result})
+
+    def _reply(self, status: int, data: dict) -> None:
+        content = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    """
+    Локальный Bot API поверх FakeTgClient: getUpdates (long polling), sendMessage, editMessageText,
+    answerCallbackQuery, setWebhook/deleteWebhook. Настоящий TgClient с TG_API_URL=server.url работает
+    с ним как с Telegram - так runbot гоняется в тестах и нагрузочных прогонах без сети
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, token: str = 'token') -> None:
+        super().__init__((host, port), _FakeTelegramHandler)
+        self.token = token
+        self.client = FakeTgClient()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def call(self, method: str, payload: dict) -> dict | list | bool:
+        client = self.client
+        reply_markup = payload.get('reply_markup')
+        if isinstance(reply_markup, str):
+            reply_markup = json.loads(reply_markup)
+        reply_markup = InlineKeyboardMarkup(**reply_markup) if reply_markup else None
+
+        if method == 'getUpdates':
+            response = client.get_updates(
+                offset=payload.get('offset', 0), timeout=payload.get('timeout', 0), limit=payload.get('limit')
+            )
+            return [update.dict(exclude_none=True) for update in response.result]
+        if method == 'sendMessage':
+            response = client.send_message(payload['chat_id'], payload['text'], reply_markup=reply_markup)
+            return response.result.dict(exclude_none=True)
+        if method == 'editMessageText':
+            client.edit_message_text(payload['chat_id'], payload['message_id'], payload['text'], reply_markup)
+            return True
+        if method == 'answerCallbackQuery':
+            client.answer_callback_query(payload['callback_query_id'])
+            return True
+        if method in ('setWebhook', 'deleteWebhook'):
+            return True
+        raise KeyError(method)
+
+    def seed(self, path: str) -> int:
+        """
+        Поставить в очередь обновления из записи getUpdates
+        :return: number of updates
+        """
+        updates = load_recorded_updates(path)
+        for update in updates:
+            self.client.push_update(update)
+        return len(updates)
+
+    def start(self) -> 'FakeTelegramServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-telegram', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
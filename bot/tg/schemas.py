@@ -1,4 +1,8 @@
-from pydantic import BaseModel
+import logging
+
+from pydantic import BaseModel, ValidationError, validator
+
+logger = logging.getLogger(__name__)
 
 
 class Chat(BaseModel):
@@ -6,19 +10,77 @@ class Chat(BaseModel):
 
 
 class Message(BaseModel):
+    message_id: int | None = None
     chat: Chat
     text: str | None = None
 
 
+class InlineKeyboardButton(BaseModel):
+    text: str
+    callback_data: str
+
+
+class InlineKeyboardMarkup(BaseModel):
+    inline_keyboard: list[list[InlineKeyboardButton]]
+
+
+class CallbackQuery(BaseModel):
+    id: str
+    # Нажатие кнопки под сообщением бота; у старых сообщений Telegram его может не прислать
+    message: Message | None = None
+    data: str | None = None
+
+
+class ChatMemberUpdated(BaseModel):
+    chat: Chat
+
+
 class UpdateObj(BaseModel):
+    """
+    Обновление любого вида: все поля, кроме update_id, необязательны, неизвестные виды
+    (channel_post, poll, ...) просто остаются без разобранных полей
+    """
+
     update_id: int
-    message: Message
+    message: Message | None = None
+    edited_message: Message | None = None
+    callback_query: CallbackQuery | None = None
+    my_chat_member: ChatMemberUpdated | None = None
+
+    @property
+    def chat_id(self) -> int | None:
+        for message in (self.message, self.edited_message):
+            if message is not None:
+                return message.chat.id
+        if self.callback_query is not None and self.callback_query.message is not None:
+            return self.callback_query.message.chat.id
+        if self.my_chat_member is not None:
+            return self.my_chat_member.chat.id
+        return None
 
 
 class GetUpdatesResponse(BaseModel):
     ok: bool
     result: list[UpdateObj]
 
+    @validator('result', pre=True)
+    def skip_invalid_updates(cls, value: list) -> list:
+        # Одно неразборчивое обновление не должно ронять всю пачку (и повторяться после рестарта):
+        # от него остаётся только update_id, чтобы offset ушёл дальше
+        updates = []
+        for item in value:
+            if isinstance(item, UpdateObj):
+                updates.append(item)
+                continue
+            try:
+                updates.append(UpdateObj.parse_obj(item))
+            except ValidationError:
+                if not isinstance(item, dict) or 'update_id' not in item:
+                    raise
+                logger.warning('Skip malformed update %s', item['update_id'])
+                updates.append(UpdateObj(update_id=item['update_id']))
+        return updates
+
 
 class SendMessageResponse(BaseModel):
     ok: bool
@@ -0,0 +1,126 @@
+"""
+Очередь обновлений в базе: один ingest пишет, воркеры (потоки и процессы) обрабатывают.
+
+Ответы воркеров - строки TgOutboxMessage (DbOutbox) в транзакции захвата: откаченный захват
+не оставляет ответов, а повторная обработка не отправит их дважды. Следующее обновление чата
+захватывается только после коммита предыдущего, поэтому id ответов чата растут в порядке обработки,
+и OutboxRelay процесса ingest отправляет их в том же порядке (см. bot/outbox.py)
+"""
+import logging
+import threading
+from typing import Callable
+
+from django.db import close_old_connections, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from bot.metrics import UPDATE_LATENCY, UPDATE_WAIT
+from bot.models import TgUpdate, TgUpdateOffset
+from bot.runtime import CATCH_UP_LIMIT, POLL_ERROR_DELAY, store_received
+from bot.tg.client import TgClient
+from bot.tg.schemas import UpdateObj
+
+logger = logging.getLogger(__name__)
+
+CLAIM_BATCH_SIZE = 10
+IDLE_DELAY = 0.2
+
+
+def ingest_updates(
+    tg_client: TgClient,
+    offset: int,
+    timeout: int = 60,
+    accepts: Callable[[UpdateObj], bool] | None = None,
+    limit: int | None = None,
+) -> tuple[int, int]:
+    """
+    Один запрос getUpdates: принятые обновления записываются в очередь одной вставкой
+    вместе с новым offset, так что после рестарта ничего не теряется и не принимается повторно.
+    Повторно полученные (например, при двух ingest) отбрасываются по update_id
+    :return: следующий offset и число полученных обновлений
+    """
+    response = tg_client.get_updates(offset=offset, timeout=timeout, limit=limit)
+    if response.result:
+        offset = response.result[-1].update_id + 1
+    store_received(response.result, offset, accepts)
+    return offset, len(response.result)
+
+
+def run_ingest(
+    tg_client: TgClient,
+    timeout: int = 60,
+    accepts: Callable[[UpdateObj], bool] | None = None,
+    stop: threading.Event | None = None,
+) -> None:
+    """
+    Единственный процесс, который зовёт getUpdates: только пишет в очередь и ничего не обрабатывает.
+    Стартует с сохранённого offset и сначала без ожидания выбирает накопившееся
+    """
+    stop = stop or threading.Event()
+    offset = TgUpdateOffset.load()
+    catching_up = True
+    while not stop.is_set():
+        try:
+            if catching_up:
+                offset, received = ingest_updates(tg_client, offset, 0, accepts, limit=CATCH_UP_LIMIT)
+                catching_up = received == CATCH_UP_LIMIT
+            else:
+                offset, _ = ingest_updates(tg_client, offset, timeout, accepts)
+        except Exception:
+            logger.exception('getUpdates failed')
+            stop.wait(POLL_ERROR_DELAY)
+
+
+def claimable_updates():
+    """
+    Голова очереди каждого чата: обновления, раньше которых в очереди нет ничего из того же чата.
+    Пока воркер держит голову чата, следующее обновление чата никому не видно,
+    поэтому чаты делятся между воркерами сами, а порядок внутри чата сохраняется.
+    Обновления без чата друг друга не ждут
+    """
+    earlier = TgUpdate.objects.filter(chat_id=OuterRef('chat_id'), update_id__lt=OuterRef('update_id'))
+    return TgUpdate.objects.filter(~Exists(earlier)).order_by('update_id')
+
+
+def process_batch(handler: Callable[[UpdateObj], None], batch_size: int = CLAIM_BATCH_SIZE) -> int:
+    """
+    Захватить до batch_size чатов (FOR UPDATE SKIP LOCKED - занятые другими воркерами пропускаются),
+    обработать их головы и удалить их из очереди в той же транзакции. Если воркер упал,
+    транзакция откатывается вместе с ответами (DbOutbox) и обновления достаются другому воркеру
+    :return: number of processed updates
+    """
+    with transaction.atomic():
+        claimed = list(claimable_updates().select_for_update(skip_locked=True)[:batch_size])
+        for item in claimed:
+            UPDATE_WAIT.observe((timezone.now() - item.received_at).total_seconds())
+            try:
+                # Ошибка одного обновления откатывает только его изменения
+                with transaction.atomic():
+                    handler(UpdateObj.parse_obj(item.payload))
+            except Exception:
+                logger.exception('Failed to handle update %s', item.update_id)
+            UPDATE_LATENCY.observe((timezone.now() - item.received_at).total_seconds())
+        if claimed:
+            TgUpdate.objects.filter(update_id__in=[item.update_id for item in claimed]).delete()
+    return len(claimed)
+
+
+def run_worker(
+    handler: Callable[[UpdateObj], None],
+    batch_size: int = CLAIM_BATCH_SIZE,
+    idle_delay: float = IDLE_DELAY,
+    stop: threading.Event | None = None,
+) -> None:
+    """
+    Цикл воркера очереди; воркеров (потоков и процессов) может быть сколько угодно
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            processed = process_batch(handler, batch_size)
+        except Exception:
+            logger.exception('Failed to claim updates')
+            processed = 0
+        if not processed:
+            stop.wait(idle_delay)
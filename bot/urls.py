@@ -1,7 +1,8 @@
 from django.urls import path
 
-from bot.views import VerifyUserView
+from bot.views import TelegramWebhookView, VerifyUserView
 
 urlpatterns = [
     path('verify', VerifyUserView.as_view(), name='verify_bot'),
+    path('webhook', TelegramWebhookView.as_view(), name='webhook'),
 ]
@@ -1,13 +1,29 @@
+import logging
+from datetime import timedelta
+from secrets import compare_digest
 from typing import Any
 
-from rest_framework import generics, permissions
-from rest_framework.exceptions import AuthenticationFailed
+import pydantic
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.request import Request
 from rest_framework.response import Response
 
-from bot.models import TgUser
+from bot.handlers import get_bot_handler, process_update
+from bot.models import TgUser, TgWebhookUpdate
+from bot.outbox import DbOutbox, Priority
 from bot.serializer import TgUserSerializer
-from bot.tg.client import TgClient
+from bot.tg.schemas import UpdateObj
+
+logger = logging.getLogger(__name__)
+
+# Telegram повторяет доставку, пока не получит 2xx; столько помним уже принятые update_id
+WEBHOOK_DEDUP_TIMEOUT = 60 * 60 * 24
+# Старые отметки удаляются при каждом WEBHOOK_PRUNE_EVERY-м обновлении
+WEBHOOK_PRUNE_EVERY = 100
 
 
 # Create your views here.
@@ -30,16 +46,57 @@ class VerifyUserView(generics.GenericAPIView):
         serializer: TgUserSerializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        try:
-            tg_user: TgUser = TgUser.objects.get(
-                verification_code=serializer.validated_data.get('verification_code')
-            )
-        except TgUser.DoesNotExist:
-            raise AuthenticationFailed
-
+        tg_user: TgUser = serializer.instance
+        with transaction.atomic():
+            # Условный UPDATE: из двух одновременных запросов с одним кодом привязку получит только один.
+            # Код одноразовый
+            linked = TgUser.objects.filter(
+                pk=tg_user.pk, verification_code_hash=tg_user.verification_code_hash, user__isnull=True
+            ).update(user=request.user, verification_code_hash=None)
+            if not linked:
+                raise ValidationError({'verification_code': ['Invalid verification code.']})
+            # Уведомление сохраняется вместе с привязкой, отправляет его процесс бота с общими лимитами
+            DbOutbox().send_message(chat_id=tg_user.chat_id, text='Bot verificated', priority=Priority.notify)
         tg_user.user = request.user
-        tg_user.save()
-
-        TgClient().send_message(chat_id=tg_user.chat_id, text='Bot verificated')
+        tg_user.verification_code_hash = None
 
         return Response(TgUserSerializer(tg_user).data)
+
+
+class TelegramWebhookView(generics.GenericAPIView):
+    """
+    Приём обновлений Telegram в режиме webhook (см. команду setwebhook).
+    Обработка та же, что в runbot, но прямо в воркере API
+    """
+
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        if not settings.BOT_WEBHOOK_SECRET:
+            raise NotFound
+        secret = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not compare_digest(secret.encode(), settings.BOT_WEBHOOK_SECRET.encode()):
+            raise PermissionDenied
+
+        try:
+            update = UpdateObj(**request.data)
+        except (pydantic.ValidationError, TypeError):
+            # Повтор не поможет, а не-2xx ответ заставит Telegram повторять - пропускаем
+            logger.warning('Skip unsupported update: %s', request.data)
+            return Response(status=status.HTTP_200_OK)
+
+        handler = get_bot_handler()
+        if not handler.handles(update):
+            return Response(status=status.HTTP_200_OK)
+
+        # Отметка в базе видна всем процессам API. Повтор, пришедший во время обработки, ждёт на первичном ключе.
+        # При ошибке отметка откатывается вместе с обработкой: ответ 500 - Telegram доставит обновление ещё раз
+        with transaction.atomic():
+            _, created = TgWebhookUpdate.objects.get_or_create(update_id=update.update_id)
+            if created:
+                process_update(handler, update)
+        if update.update_id % WEBHOOK_PRUNE_EVERY == 0:
+            expired = timezone.now() - timedelta(seconds=WEBHOOK_DEDUP_TIMEOUT)
+            TgWebhookUpdate.objects.filter(received_at__lt=expired).delete()
+        return Response(status=status.HTTP_200_OK)
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.http import HttpRequest
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """
+    Обёртка над выполнением SQL, которая только считает запросы
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMixin:
+    """
+    Ограничивает число SQL-запросов на один вызов view.
+    query_budget - словарь {HTTP-метод: максимум запросов}, включая аутентификацию.
+    В production превышение пишется в лог, при QUERY_BUDGET_RAISE=True (тесты) - исключение
+    """
+
+    query_budget: dict[str, int] = {}
+
+    def dispatch(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        budget = self.query_budget.get(request.method)
+        if budget is None:
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self.adispatch_with_budget(budget, request, *args, **kwargs)
+
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = super().dispatch(request, *args, **kwargs)
+
+        self.check_budget(counter, budget, request)
+        return response
+
+    async def adispatch_with_budget(self, budget: int, request: HttpRequest, *args: Any, **kwargs: Any) -> Response:
+        # Async ORM выполняет запросы в потоке sync_to_async, а не в цикле событий:
+        # счётчик ставится на соединение того потока
+        counter = QueryCounter()
+        await sync_to_async(lambda: connection.execute_wrappers.append(counter))()
+        try:
+            response = await super().dispatch(request, *args, **kwargs)
+        finally:
+            await sync_to_async(lambda: connection.execute_wrappers.remove(counter))()
+
+        self.check_budget(counter, budget, request)
+        return response
+
+    def check_budget(self, counter: QueryCounter, budget: int, request: HttpRequest) -> None:
+        if counter.count > budget:
+            message = (
+                f'{self.__class__.__name__} {request.method} {request.path}: '
+                f'{counter.count} queries, budget is {budget}'
+            )
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+
+class AsyncAPIViewMixin:
+    """
+    Асинхронный dispatch для APIView (в DRF 3.14 его нет): под ASGI view не занимает поток на время запроса.
+    Обработчики методов - корутины, данные читаются через async ORM.
+    Аутентификация и проверки прав синхронные (в Django 4.2 нет async-аутентификации),
+    поэтому выполняются одним вызовом через sync_to_async
+    """
+
+    async def dispatch(self, request: HttpRequest, *args: Any, **kwargs: Any) -> Response:
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            # OPTIONS и ответ на неизвестный метод остаются синхронными
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncListModelMixin(AsyncAPIViewMixin):
+    """
+    Асинхронный ListModelMixin. Фильтры выполняются синхронно (FilterSet проверяет значения запросами в базу),
+    страница и счётчик читаются через async ORM; пагинатору нужен apaginate_queryset
+    """
+
+    async def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return await self.alist(request, *args, **kwargs)
+
+    async def alist(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        queryset = await sync_to_async(self.filter_queryset)(self.get_queryset())
+
+        if self.paginator is not None:
+            page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer([obj async for obj in queryset], many=True)
+        return Response(serializer.data)
@@ -1,5 +1,6 @@
 from typing import Any
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import authenticate, login, logout
 from rest_framework import generics, permissions, status
 from rest_framework.exceptions import AuthenticationFailed
@@ -7,6 +8,7 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 
+from core.mixins import AsyncAPIViewMixin
 from core.models import User
 from core.serializers import ChangingPasswordSerializer, ProfileSerializer, UserCreateSerializer, UserLoginSerializer
 
@@ -53,7 +55,7 @@ class UserLoginView(generics.GenericAPIView):
         return Response(ProfileSerializer(user).data, status=status.HTTP_200_OK)
 
 
-class ProfileView(generics.RetrieveUpdateDestroyAPIView):
+class ProfileView(AsyncAPIViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Получение, обновление, выход
     """
@@ -66,6 +68,19 @@ class ProfileView(generics.RetrieveUpdateDestroyAPIView):
     def get_object(self) -> User:
         return self.request.user
 
+    async def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        # Пользователь уже загружен аутентификацией - чтение профиля не ходит в базу
+        return self.retrieve(request, *args, **kwargs)
+
+    async def put(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return await sync_to_async(self.update)(request, *args, **kwargs)
+
+    async def patch(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return await sync_to_async(self.partial_update)(request, *args, **kwargs)
+
+    async def delete(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return await sync_to_async(self.destroy)(request, *args, **kwargs)
+
     def perform_destroy(self, instance: User) -> None:
         logout(self.request)
 
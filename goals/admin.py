@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from goals.models import GoalCategory, Goal, GoalComment, Board, BoardParticipant
+from goals.models import ArchiveJob, GoalCategory, Goal, GoalComment, Board, BoardParticipant
 
 
 class GoalCategoryAdmin(admin.ModelAdmin):
@@ -22,9 +22,14 @@ class BoardAdmin(admin.ModelAdmin):
 class BoardParticipantAdmin(admin.ModelAdmin):
     list_display = ('board', 'user', 'role', 'created', 'updated')
 
+class ArchiveJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'board', 'category', 'status', 'archived_goals', 'total_goals', 'updated')
+    list_filter = ('status',)
+
 admin.site.register(GoalCategory, GoalCategoryAdmin)
 admin.site.register(Goal, GoalAdmin)
 admin.site.register(GoalComment, GoalCommentAdmin)
 admin.site.register(Board, BoardAdmin)
 admin.site.register(BoardParticipant, BoardParticipantAdmin)
+admin.site.register(ArchiveJob, ArchiveJobAdmin)
 
@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.utils import timezone
+
+from goals.models import ArchiveJob, Board, Goal, GoalCategory
+from goals.versions import bump_board_versions
+
+CHUNK_SIZE = 1000
+
+
+def archive_board(board: Board) -> ArchiveJob:
+    """
+    Пометить доску удалённой и поставить архивацию её категорий и целей в очередь.
+    Читающие запросы фильтруют по board.is_deleted, поэтому доска пропадает сразу
+    """
+    with transaction.atomic():
+        Board.objects.filter(id=board.id).update(is_deleted=True)
+        bump_board_versions([board.id])
+        return ArchiveJob.objects.create(board=board)
+
+
+def archive_category(category: GoalCategory) -> ArchiveJob:
+    with transaction.atomic():
+        category.is_deleted = True
+        category.save(update_fields=('is_deleted',))
+        return ArchiveJob.objects.create(board_id=category.board_id, category=category)
+
+
+def _goals(job: ArchiveJob):
+    if job.category_id:
+        return Goal.objects.filter(category_id=job.category_id)
+    return Goal.objects.filter(board_id=job.board_id)
+
+
+def process_chunk(job_id: int, chunk_size: int = CHUNK_SIZE) -> ArchiveJob | None:
+    """
+    Обработать одну порцию задачи в отдельной короткой транзакции.
+    Строка задачи блокируется с SKIP LOCKED, так что несколько воркеров не берут одну задачу
+    :return: задача после шага или None, если её держит другой воркер
+    """
+    with transaction.atomic():
+        job = ArchiveJob.objects.select_for_update(skip_locked=True).filter(id=job_id).first()
+        if job is None or job.status == ArchiveJob.Status.done:
+            return job
+
+        if job.total_goals is None:
+            job.total_goals = _goals(job).exclude(status=Goal.Status.archived).count()
+        job.status = ArchiveJob.Status.running
+
+        goal_ids = list(
+            _goals(job)
+            .filter(id__gt=job.last_goal_id)
+            .exclude(status=Goal.Status.archived)
+            .order_by('id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if goal_ids:
+            job.archived_goals += Goal.objects.filter(id__in=goal_ids).update(
+                status=Goal.Status.archived, updated=timezone.now()
+            )
+            job.last_goal_id = goal_ids[-1]
+        elif not job.category_id:
+            category_ids = list(
+                GoalCategory.objects.filter(board_id=job.board_id, id__gt=job.last_category_id, is_deleted=False)
+                .order_by('id')
+                .values_list('id', flat=True)[:chunk_size]
+            )
+            if category_ids:
+                GoalCategory.objects.filter(id__in=category_ids).update(is_deleted=True, updated=timezone.now())
+                job.last_category_id = category_ids[-1]
+            else:
+                job.status = ArchiveJob.Status.done
+        else:
+            job.status = ArchiveJob.Status.done
+
+        # Порции меняют только скрытые удалением строки, поэтому версия растёт при постановке задачи и в конце,
+        # а не на каждой порции: иначе большая доска сбрасывала бы ETag и кеш ответов тысячи раз
+        if job.status == ArchiveJob.Status.done:
+            bump_board_versions([job.board_id])
+        job.save()
+        return job
+
+
+def run_job(job_id: int, chunk_size: int = CHUNK_SIZE) -> ArchiveJob | None:
+    job = process_chunk(job_id, chunk_size)
+    while job is not None and job.status != ArchiveJob.Status.done:
+        job = process_chunk(job_id, chunk_size)
+    return job
+
+
+def run_pending_jobs(chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Довести до конца все незавершённые задачи, включая брошенные упавшим воркером
+    :return: number of finished jobs
+    """
+    finished = 0
+    for job_id in ArchiveJob.objects.exclude(status=ArchiveJob.Status.done).order_by('id').values_list('id', flat=True):
+        job = run_job(job_id, chunk_size)
+        if job is not None and job.status == ArchiveJob.Status.done:
+            finished += 1
+    return finished
@@ -0,0 +1,143 @@
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.request import Request
+
+from goals.membership import WRITE_ROLES, has_board_role, prefetch_board_roles
+from goals.models import Goal, GoalCategory, GoalComment
+from goals.serializers import GoalBulkItemSerializer
+from goals.versions import bump_board_versions
+
+
+def _category_ids(operations: list[dict]) -> set[int]:
+    ids = set()
+    for operation in operations:
+        try:
+            ids.add(int(operation.get('data', {})['category']))
+        except (KeyError, TypeError, ValueError):
+            pass
+    return ids
+
+
+def _error(index: int, operation: dict, code: int, errors) -> dict:
+    return {'index': index, 'op': operation['op'], 'status': code, 'errors': errors}
+
+
+def apply_goal_operations(request: Request, operations: list[dict]) -> list[dict]:
+    """
+    Выполнить пакет операций над целями.
+    Цели и категории загружаются двумя запросами на весь пакет, роли - одним запросом на все доски,
+    запись - один bulk_create и один bulk_update, всё в одной транзакции.
+    Ошибка одной операции не отменяет остальные
+    :param operations: [{'op': 'create' | 'update' | 'archive', 'id': ..., 'data': {...}}]
+    :return: результат по каждой операции в исходном порядке
+    """
+    with transaction.atomic():
+        goal_ids = {operation['id'] for operation in operations if operation['op'] != 'create'}
+        # Цели читаются под блокировкой до конца транзакции, иначе параллельный запрос может изменить
+        # их между чтением и bulk_update. of=('self',) - не блокировать доски и участников из фильтра
+        goals = (
+            {
+                goal.id: goal
+                for goal in Goal.objects.filter(
+                    id__in=goal_ids,
+                    board__participants__user_id=request.user.id,
+                    board__is_deleted=False,
+                    category__is_deleted=False,
+                )
+                .exclude(status=Goal.Status.archived)
+                .select_for_update(of=('self',))
+                .order_by('id')
+            }
+            if goal_ids
+            else {}
+        )
+        category_ids = _category_ids(operations)
+        categories = GoalCategory.objects.select_related('board').in_bulk(category_ids) if category_ids else {}
+        prefetch_board_roles(
+            request,
+            {goal.board_id for goal in goals.values()} | {category.board_id for category in categories.values()},
+        )
+
+        context = {'request': request, 'categories': categories}
+        results: list[dict | None] = [None] * len(operations)
+        to_create: list[tuple[int, Goal]] = []
+        to_update: dict[int, tuple[int, Goal]] = {}
+        changed_fields: set[str] = set()
+        moved_goal_ids = []
+
+        for index, operation in enumerate(operations):
+            if operation['op'] == 'create':
+                serializer = GoalBulkItemSerializer(data=operation['data'], context=context)
+                try:
+                    if not serializer.is_valid():
+                        results[index] = _error(index, operation, status.HTTP_400_BAD_REQUEST, serializer.errors)
+                        continue
+                except PermissionDenied as error:
+                    results[index] = _error(index, operation, status.HTTP_403_FORBIDDEN, error.detail)
+                    continue
+                goal = Goal(**serializer.validated_data)
+                goal.board_id = goal.category.board_id
+                to_create.append((index, goal))
+                continue
+
+            goal = goals.get(operation['id'])
+            if goal is None:
+                results[index] = _error(index, operation, status.HTTP_404_NOT_FOUND, 'Not found.')
+                continue
+            if goal.id in to_update:
+                results[index] = _error(index, operation, status.HTTP_400_BAD_REQUEST, 'Goal is already in this batch')
+                continue
+            if not has_board_role(request, goal.board_id, WRITE_ROLES):
+                detail = str(PermissionDenied.default_detail)
+                results[index] = _error(index, operation, status.HTTP_403_FORBIDDEN, detail)
+                continue
+
+            if operation['op'] == 'archive':
+                goal.status = Goal.Status.archived
+                changed_fields.add('status')
+            else:
+                serializer = GoalBulkItemSerializer(goal, data=operation['data'], partial=True, context=context)
+                try:
+                    if not serializer.is_valid():
+                        results[index] = _error(index, operation, status.HTTP_400_BAD_REQUEST, serializer.errors)
+                        continue
+                except PermissionDenied as error:
+                    results[index] = _error(index, operation, status.HTTP_403_FORBIDDEN, error.detail)
+                    continue
+                for field, value in serializer.validated_data.items():
+                    setattr(goal, field, value)
+                    changed_fields.add(field)
+                if 'category' in serializer.validated_data and goal.category.board_id != goal.board_id:
+                    goal.board_id = goal.category.board_id
+                    changed_fields.add('board')
+                    moved_goal_ids.append(goal.id)
+            to_update[goal.id] = (index, goal)
+
+        created = Goal.objects.bulk_create([goal for _, goal in to_create])
+        # Один bulk_update по объединению изменённых полей. Поля, которые операция не меняла, пишутся
+        # значениями, прочитанными под блокировкой, - параллельный запрос изменить их не мог
+        now = timezone.now()
+        for _, goal in to_update.values():
+            goal.updated = now
+        if to_update:
+            Goal.objects.bulk_update(
+                [goal for _, goal in to_update.values()], fields=[*sorted(changed_fields), 'updated']
+            )
+        if moved_goal_ids:
+            GoalComment.objects.filter(goal_id__in=moved_goal_ids).update(
+                board_id=Subquery(Goal.objects.filter(id=OuterRef('goal_id')).values('board_id')[:1])
+            )
+        # bulk_create/bulk_update не шлют сигналы - версии досок поднимаем сами
+        bump_board_versions(
+            [goal.board_id for _, goal in to_create]
+            + [board_id for _, goal in to_update.values() for board_id in (goal.board_id, goal._loaded_board_id)]
+        )
+
+    for (index, _), goal in zip(to_create, created):
+        results[index] = {'index': index, 'op': 'create', 'status': status.HTTP_201_CREATED, 'id': goal.id}
+    for index, goal in to_update.values():
+        results[index] = {'index': index, 'op': operations[index]['op'], 'status': status.HTTP_200_OK, 'id': goal.id}
+    return results
@@ -0,0 +1,225 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Callable
+
+from django.core.cache import caches
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from goals.membership import remember_board_roles
+from goals.models import BoardParticipant
+
+
+class ConditionalGetMixin:
+    """
+    Условный GET для чтений, содержимое которых определяется досками пользователя.
+    ETag и Last-Modified считаются одним запросом по версиям досок (см. Board.version);
+    при совпадении If-None-Match / If-Modified-Since ответ 304 отдаётся без запроса данных и сериализации.
+    Last-Modified - самая поздняя из дат версий досок пользователя, включая удалённые, и даты,
+    когда его последний раз убрали с доски (MembershipChange)
+    """
+
+    # Заполняется вместе с состояниями досок
+    last_modified: datetime | None = None
+
+    def get_board_states(self) -> list[tuple] | None:
+        """
+        (board_id, version, role) досок, от которых зависит ответ.
+        None - валидаторы не считаются, запрос обрабатывается как обычно
+        """
+        return self.split_board_rows(list(self.get_board_states_queryset()))
+
+    async def aget_board_states(self) -> list[tuple] | None:
+        return self.split_board_rows([row async for row in self.get_board_states_queryset()])
+
+    def get_board_states_queryset(self) -> QuerySet:
+        # Удалённые доски в состояния не входят, но их дату версии учитывает Last-Modified:
+        # удаление доски меняет ответ, а оставшиеся доски при этом не меняются
+        return (
+            BoardParticipant.objects.filter(user_id=self.request.user.id)
+            .order_by('board_id')
+            .values_list(
+                'board_id',
+                'board__version',
+                'role',
+                'board__is_deleted',
+                'board__version_updated',
+                'user__membership_change__changed',
+            )
+        )
+
+    def split_board_rows(self, rows: list[tuple]) -> list[tuple]:
+        """
+        Строки get_board_states_queryset -> состояния неудалённых досок; дата изменения - в self.last_modified
+        """
+        dates = [date for row in rows for date in row[4:] if date is not None]
+        self.last_modified = max(dates, default=None)
+        return [(board_id, version, role) for board_id, version, role, is_deleted, *_ in rows if not is_deleted]
+
+    def get_etag(self, request: Request, states: list[tuple]) -> str:
+        payload = repr(
+            (
+                self.__class__.__name__,
+                request.user.id,
+                request.get_full_path(),
+                request.accepted_renderer.format,
+                states,
+            )
+        )
+        return quote_etag(hashlib.sha1(payload.encode('utf-8')).hexdigest())
+
+    @staticmethod
+    def is_not_modified(request: Request, etag: str, last_modified: int | None) -> bool:
+        # If-Modified-Since учитывается только без If-None-Match (RFC 9110, 13.2.2)
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            etags = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]
+            return '*' in etags or etag in etags
+
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        if if_modified_since is None or last_modified is None:
+            return False
+        return last_modified <= if_modified_since
+
+    def get_last_modified(self) -> int | None:
+        """
+        Last-Modified в секундах. Пока не прошла секунда последнего изменения, его нет: запись в ту же секунду
+        не изменила бы дату, и копия с ней прошла бы If-Modified-Since. Такие ответы проверяются только по ETag
+        """
+        if self.last_modified is None:
+            return None
+        last_modified = int(self.last_modified.timestamp())
+        return last_modified if last_modified < int(timezone.now().timestamp()) else None
+
+    def get_modified_response(
+        self, handler: Callable, request: Request, states: list[tuple], *args: Any, **kwargs: Any
+    ) -> Response:
+        """
+        Полный ответ, когда у клиента нет актуальной копии
+        """
+        return handler(request, *args, **kwargs)
+
+    async def aget_modified_response(
+        self, handler: Callable, request: Request, states: list[tuple], *args: Any, **kwargs: Any
+    ) -> Response:
+        return await handler(request, *args, **kwargs)
+
+    def conditional_response(self, handler: Callable, request: Request, *args: Any, **kwargs: Any) -> Response:
+        states = self.get_board_states()
+        if states is None:
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = self.check_states(request, states)
+        if self.is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = self.get_modified_response(handler, request, states, *args, **kwargs)
+        return self.add_validators(response, etag, last_modified)
+
+    async def aconditional_response(self, handler: Callable, request: Request, *args: Any, **kwargs: Any) -> Response:
+        states = await self.aget_board_states()
+        if states is None:
+            return await handler(request, *args, **kwargs)
+
+        etag, last_modified = self.check_states(request, states)
+        if self.is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = await self.aget_modified_response(handler, request, states, *args, **kwargs)
+        return self.add_validators(response, etag, last_modified)
+
+    def check_states(self, request: Request, states: list[tuple]) -> tuple[str, int | None]:
+        # Роли прочитаны тем же запросом - проверки прав дальше в этом запросе не пойдут в кеш и базу
+        remember_board_roles(request, {board_id: role for board_id, _, role in states})
+        return self.get_etag(request, states), self.get_last_modified()
+
+    @staticmethod
+    def add_validators(response: Response, etag: str, last_modified: int | None) -> Response:
+        if response.status_code not in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Браузер не должен эвристически кешировать ответ по Last-Modified - только перепроверять
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return await self.aconditional_response(super().alist, request, *args, **kwargs)
+
+
+class VersionedResponseCacheMixin(ConditionalGetMixin):
+    """
+    Кеш готовых данных ответа поверх ConditionalGetMixin.
+    Ключ - view, URL, формат и кортежи (доска, версия, роль) досок, которые читает ответ, поэтому запись в доску
+    инвалидирует её ответы за O(1) сменой версии: старые ключи не ищутся и просто истекают по TTL.
+    Пользователь в ключ не входит: с ?board= запись делят все участники доски с одной ролью,
+    без него - пользователи с одинаковым набором досок и ролей
+    """
+
+    response_cache_alias = 'responses'
+    # Параметр фильтра, ограничивающий ответ одной доской
+    board_filter_param = 'board'
+
+    def get_response_board_id(self, request: Request) -> int | None:
+        """
+        Доска из ?board=; None - ответ читает все доски пользователя
+        """
+        try:
+            return int(request.query_params[self.board_filter_param])
+        except (KeyError, ValueError):
+            return None
+
+    def get_response_cache_key(self, request: Request, states: list[tuple]) -> str:
+        # Версии чужих для ответа досок в ключ не входят: их смена не должна сбрасывать запись
+        board_id = self.get_response_board_id(request)
+        if board_id is not None:
+            states = [state for state in states if state[0] == board_id]
+        payload = repr(
+            (
+                self.__class__.__name__,
+                request.build_absolute_uri(),
+                request.accepted_renderer.format,
+                states,
+            )
+        )
+        return f'goals:response:{hashlib.sha1(payload.encode("utf-8")).hexdigest()}'
+
+    def get_modified_response(
+        self, handler: Callable, request: Request, states: list[tuple], *args: Any, **kwargs: Any
+    ) -> Response:
+        cache = caches[self.response_cache_alias]
+        key = self.get_response_cache_key(request, states)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data)
+        return response
+
+    async def aget_modified_response(
+        self, handler: Callable, request: Request, states: list[tuple], *args: Any, **kwargs: Any
+    ) -> Response:
+        cache = caches[self.response_cache_alias]
+        key = self.get_response_cache_key(request, states)
+        data = await cache.aget(key)
+        if data is not None:
+            return Response(data)
+
+        response = await handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            await cache.aset(key, response.data)
+        return response
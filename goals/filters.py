@@ -1,6 +1,14 @@
+import re
+
 import django_filters
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
 from django.db import models
+from django.db.models import F, Q, QuerySet
 from django_filters import rest_framework
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
 
 from goals.models import Goal
 
@@ -18,3 +26,35 @@ class GoalDateFilter(rest_framework.FilterSet):
     filter_overrides = {
         models.DateTimeField: {"filter_class": django_filters.IsoDateTimeFilter},
     }
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Поиск по параметру search через индексированный tsvector (поле search_vector модели).
+    Каждое слово ищется как префикс, опечатки и части слов ловит триграммный индекс
+    по первому полю из search_fields. Без явного ordering результаты сортируются по релевантности
+    """
+
+    search_vector_field = 'search_vector'
+
+    def filter_queryset(self, request: Request, queryset: QuerySet, view) -> QuerySet:
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if not search_fields or not search_terms:
+            return queryset
+
+        words = [word for word in (re.sub(r'\W+', '', term) for term in search_terms) if word]
+        if not words:
+            return queryset.none()
+
+        text = ' '.join(search_terms)
+        trigram_field = search_fields[0].lstrip('^=@$')
+        query = SearchQuery(' & '.join(f'{word}:*' for word in words), search_type='raw', config=settings.SEARCH_CONFIG)
+
+        queryset = queryset.annotate(
+            search_rank=SearchRank(F(self.search_vector_field), query) + TrigramWordSimilarity(text, trigram_field)
+        ).filter(Q(**{self.search_vector_field: query}) | Q(**{f'{trigram_field}__trigram_word_similar': text}))
+
+        if api_settings.ORDERING_PARAM not in request.query_params:
+            queryset = queryset.order_by('-search_rank', '-id')
+        return queryset
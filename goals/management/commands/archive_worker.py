@@ -0,0 +1,29 @@
+import time
+from typing import Any
+
+from django.core.management import BaseCommand
+
+from goals.archive import CHUNK_SIZE, run_pending_jobs
+
+
+class Command(BaseCommand):
+    """
+    Воркер фоновой архивации удалённых досок и категорий
+    """
+
+    help = 'Process pending board/category archive jobs in bounded chunks'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--sleep', type=float, default=2.0, help='Пауза, когда очередь пуста')
+        parser.add_argument('--once', action='store_true', help='Обработать очередь и выйти')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        while True:
+            finished = run_pending_jobs(chunk_size=options['chunk_size'])
+            if finished:
+                self.stdout.write(f'Finished {finished} archive job(s)')
+            if options['once']:
+                return
+            if not finished:
+                time.sleep(options['sleep'])
@@ -0,0 +1,115 @@
+import re
+from typing import Any
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, QuerySet
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import User
+from goals.views import BoardListView, GoalCategoryListView, GoalCommentListView, GoalListView
+
+LIST_VIEWS = {
+    'board-list': BoardListView,
+    'category-list': GoalCategoryListView,
+    'goal-list': GoalListView,
+    'comment-list': GoalCommentListView,
+}
+
+SEQ_SCAN_RE = re.compile(r'Seq Scan on (?P<table>\w+)')
+FILTER_RE = re.compile(r'^\s*Filter: (?P<filter>.+)$')
+
+
+class Command(BaseCommand):
+    """
+    Строит queryset каждого списка из goals/views.py для пользователя,
+    выполняет EXPLAIN (ANALYZE, BUFFERS) и отмечает последовательные сканы больших таблиц
+    """
+
+    help = 'EXPLAIN (ANALYZE, BUFFERS) querysets of goals list views and flag sequential scans'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('username', nargs='?', help='По умолчанию - пользователь с наибольшим числом досок')
+        parser.add_argument('--view', choices=sorted(LIST_VIEWS), action='append', help='Только указанные списки')
+        parser.add_argument('--search', help='Добавить параметр search к запросу')
+        parser.add_argument('--limit', type=int, default=100, help='Размер страницы')
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=1000,
+            help='Последовательный скан таблицы меньшего размера не считается проблемой',
+        )
+        parser.add_argument('--fail-on-seq-scan', action='store_true', help='Код выхода 1, если найдены проблемы')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        user = self.get_user(options['username'])
+        params = {'search': options['search']} if options['search'] else {}
+        problems = 0
+
+        for name in options['view'] or LIST_VIEWS:
+            queryset = self.build_queryset(LIST_VIEWS[name], user, params)[: options['limit']]
+            plan = queryset.explain(analyze=True, buffers=True)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {name} ({user.username})'))
+            self.stdout.write(plan)
+            for warning in self.find_problems(plan, options['min_rows']):
+                problems += 1
+                self.stdout.write(self.style.WARNING(f'!! {warning}'))
+
+        if problems and options['fail_on_seq_scan']:
+            raise CommandError(f'{problems} sequential scan(s) on large tables')
+
+    @staticmethod
+    def get_user(username: str | None) -> User:
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User {username} not found')
+        user = User.objects.annotate(boards=Count('participants')).order_by('-boards').first()
+        if user is None:
+            raise CommandError('No users to explain querysets for')
+        return user
+
+    @staticmethod
+    def build_queryset(view_class: type, user: User, params: dict) -> QuerySet:
+        """
+        Тот же queryset, что view отдаёт пагинатору: get_queryset + filter backends
+        """
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = user
+        view = view_class(request=request, args=(), kwargs={}, format_kwarg=None)
+        return view.filter_queryset(view.get_queryset())
+
+    @staticmethod
+    def find_problems(plan: str, min_rows: int) -> list[str]:
+        lines = plan.splitlines()
+        problems = []
+        for index, line in enumerate(lines):
+            match = SEQ_SCAN_RE.search(line)
+            if not match:
+                continue
+            table = match.group('table')
+            rows = table_rows(table)
+            if rows < min_rows:
+                continue
+            message = f'Seq Scan on {table} (~{rows} rows)'
+            filter_match = next(
+                (
+                    FILTER_RE.match(next_line)
+                    for next_line in lines[index + 1 : index + 4]
+                    if FILTER_RE.match(next_line)
+                ),
+                None,
+            )
+            if filter_match:
+                message += f', no index for filter {filter_match.group("filter")}'
+            problems.append(message)
+        return problems
+
+
+def table_rows(table: str) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+        row = cursor.fetchone()
+    return max(row[0], 0) if row else 0
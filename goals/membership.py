@@ -0,0 +1,116 @@
+from typing import Iterable
+
+from django.core.cache import cache
+
+from goals.models import BoardParticipant
+
+# Маркер "пользователь не участник доски": кешируется так же, как и роль,
+# чтобы повторные проверки чужих досок тоже не ходили в базу
+NO_ROLE = 0
+ROLE_CACHE_TIMEOUT = 60 * 5
+
+READ_ROLES = tuple(BoardParticipant.Role.values)
+WRITE_ROLES = (BoardParticipant.Role.owner, BoardParticipant.Role.writer)
+OWNER_ROLES = (BoardParticipant.Role.owner,)
+
+
+def _cache_key(user_id: int, board_id: int) -> str:
+    return f'goals:board_role:{user_id}:{board_id}'
+
+
+def _request_memo(request) -> dict | None:
+    """
+    Словарь ролей {(user_id, board_id): role}, живущий ровно один запрос.
+    DRF Request и Django HttpRequest делят один memo через исходный HttpRequest.
+    В ключе есть пользователь: проверка роли другого участника не должна подменять роль автора запроса
+    """
+    if request is None:
+        return None
+    http_request = getattr(request, '_request', request)
+    memo = getattr(http_request, '_board_roles', None)
+    if memo is None:
+        memo = {}
+        setattr(http_request, '_board_roles', memo)
+    return memo
+
+
+def get_board_role(request, board_id: int, user_id: int | None = None) -> int | None:
+    """
+    Роль пользователя на доске или None, если он не участник.
+    Порядок поиска: memo запроса -> общий кеш (CACHES['default']) -> база данных
+    :param request: текущий запрос (может быть None вне HTTP, например в боте)
+    :param board_id: id доски
+    :param user_id: id пользователя, по умолчанию request.user.id
+    :return: role
+    """
+    if user_id is None:
+        user_id = request.user.id
+    if user_id is None or board_id is None:
+        return None
+
+    memo = _request_memo(request)
+    if memo is not None and (user_id, board_id) in memo:
+        return memo[user_id, board_id] or None
+
+    key = _cache_key(user_id, board_id)
+    role = cache.get(key)
+    if role is None:
+        role = (
+            BoardParticipant.objects.filter(user_id=user_id, board_id=board_id).values_list('role', flat=True).first()
+        ) or NO_ROLE
+        cache.set(key, role, ROLE_CACHE_TIMEOUT)
+
+    if memo is not None:
+        memo[user_id, board_id] = role
+    return role or None
+
+
+def prefetch_board_roles(request, board_ids: Iterable[int]) -> None:
+    """
+    Разрешить роли сразу для нескольких досок: один get_many в кеш и не больше одного запроса в базу.
+    Дальнейшие get_board_role/has_board_role в этом запросе берут роль из memo
+    """
+    user_id = request.user.id
+    memo = _request_memo(request)
+    keys = {_cache_key(user_id, board_id): board_id for board_id in set(board_ids) if (user_id, board_id) not in memo}
+    if not keys:
+        return
+
+    cached = cache.get_many(keys)
+    for key, role in cached.items():
+        memo[user_id, keys[key]] = role
+
+    missing = [board_id for key, board_id in keys.items() if key not in cached]
+    if missing:
+        roles = dict(
+            BoardParticipant.objects.filter(user_id=user_id, board_id__in=missing).values_list('board_id', 'role')
+        )
+        fresh = {}
+        for board_id in missing:
+            memo[user_id, board_id] = roles.get(board_id, NO_ROLE)
+            fresh[_cache_key(user_id, board_id)] = memo[user_id, board_id]
+        cache.set_many(fresh, ROLE_CACHE_TIMEOUT)
+
+
+def remember_board_roles(request, roles: dict[int, int]) -> None:
+    """
+    Положить в memo запроса роли автора запроса, уже прочитанные другим запросом (например, вместе с версиями досок)
+    """
+    user_id = request.user.id
+    _request_memo(request).update({(user_id, board_id): role for board_id, role in roles.items()})
+
+
+def has_board_role(request, board_id: int, roles: Iterable[int] = READ_ROLES, user_id: int | None = None) -> bool:
+    """
+    Проверить, что у пользователя на доске одна из ролей roles
+    """
+    role = get_board_role(request, board_id, user_id=user_id)
+    return role is not None and role in roles
+
+
+def invalidate_board_role(user_id: int, board_id: int) -> None:
+    cache.delete(_cache_key(user_id, board_id))
+
+
+def invalidate_board_roles(board_id: int, user_ids: Iterable[int]) -> None:
+    cache.delete_many([_cache_key(user_id, board_id) for user_id in set(user_ids)])
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0008_alter_goalcomment_options_alter_goal_title_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['title', 'id'], name='goal_title_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['created', 'id'], name='goal_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goalcomment',
+            index=models.Index(fields=['created', 'id'], name='goalcomment_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goalcomment',
+            index=models.Index(fields=['updated', 'id'], name='goalcomment_updated_id_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.2 on 2026-10-18 08:36
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Значение settings.SEARCH_CONFIG на момент миграции. Зафиксировано здесь: миграция не должна зависеть
+# от настроек, смена конфигурации - новая миграция, пересоздающая триггеры
+SEARCH_CONFIG = 'pg_catalog.russian'
+
+# search_vector поддерживает сама база: триггер срабатывает и на bulk_create/update()
+SEARCH_TRIGGERS = (
+    ('goals_goal', 'title, description'),
+    ('goals_goalcategory', 'title'),
+)
+
+
+def create_triggers_sql() -> str:
+    sql = []
+    for table, columns in SEARCH_TRIGGERS:
+        sql.append(
+            f'CREATE TRIGGER {table}_search_vector_update BEFORE INSERT OR UPDATE OF {columns} ON {table} '
+            f"FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(search_vector, '{SEARCH_CONFIG}', {columns});"
+        )
+        document = " || ' ' || ".join(f"coalesce({column.strip()}, '')" for column in columns.split(','))
+        sql.append(f"UPDATE {table} SET search_vector = to_tsvector('{SEARCH_CONFIG}', {document});")
+    return '\n'.join(sql)
+
+
+def drop_triggers_sql() -> str:
+    return '\n'.join(
+        f'DROP TRIGGER IF EXISTS {table}_search_vector_update ON {table};' for table, _ in SEARCH_TRIGGERS
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0009_keyset_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='goal',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='goalcategory',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='goal_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='goal_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='goalcategory',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='goalcategory_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goalcategory',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='goalcategory_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunSQL(create_triggers_sql(), drop_triggers_sql()),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:10
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Q, Subquery
+
+BATCH_SIZE = 10_000
+
+
+def backfill_in_batches(model, subquery) -> None:
+    # Обновляем диапазонами id, каждая пачка - отдельная короткая транзакция,
+    # чтобы не держать блокировки на всей таблице
+    last_id = model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    for start in range(0, last_id + 1, BATCH_SIZE):
+        with transaction.atomic():
+            model.objects.filter(id__gte=start, id__lt=start + BATCH_SIZE, board__isnull=True).update(
+                board_id=Subquery(subquery)
+            )
+
+
+def fill_board(apps, schema_editor):
+    GoalCategory = apps.get_model('goals', 'GoalCategory')
+    Goal = apps.get_model('goals', 'Goal')
+    GoalComment = apps.get_model('goals', 'GoalComment')
+
+    backfill_in_batches(Goal, GoalCategory.objects.filter(id=OuterRef('category_id')).values('board_id')[:1])
+    backfill_in_batches(GoalComment, Goal.objects.filter(id=OuterRef('goal_id')).values('board_id')[:1])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('goals', '0011_hot_queryset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goal',
+            name='board',
+            field=models.ForeignKey(null=True, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='goals', to='goals.board', verbose_name='Доска'),
+        ),
+        migrations.AddField(
+            model_name='goalcomment',
+            name='board',
+            field=models.ForeignKey(null=True, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='comments', to='goals.board', verbose_name='Доска'),
+        ),
+        # NOT NULL ставит 0018: пока идёт выкатка, старый код ещё создаёт цели и комментарии без доски
+        migrations.RunPython(fill_board, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='goal',
+            name='goal_active_cat_title_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='goal',
+            name='goal_active_cat_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(condition=~Q(status=4), fields=['board', 'title'], name='goal_active_board_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(condition=~Q(status=4), fields=['board', 'created'], name='goal_active_board_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goalcomment',
+            index=models.Index(fields=['board', 'created'], name='goalcomment_board_created_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.2 on 2026-10-18 08:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0012_denormalized_board'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата последнего обновления')),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'Ожидает'), (2, 'Выполняется'), (3, 'Завершена')], default=1, verbose_name='Статус')),
+                ('total_goals', models.PositiveIntegerField(blank=True, default=None, null=True, verbose_name='Всего целей')),
+                ('archived_goals', models.PositiveIntegerField(default=0, verbose_name='Заархивировано целей')),
+                ('last_goal_id', models.BigIntegerField(default=0)),
+                ('last_category_id', models.BigIntegerField(default=0)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archive_jobs', to='goals.board', verbose_name='Доска')),
+                ('category', models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.PROTECT, to='goals.goalcategory', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Архивация',
+                'verbose_name_plural': 'Архивации',
+                'indexes': [models.Index(condition=models.Q(('status', 3), _negated=True), fields=['id'], name='archivejob_unfinished_idx')],
+            },
+        ),
+    ]
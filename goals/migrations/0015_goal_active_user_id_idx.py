@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0014_board_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(condition=models.Q(('status', 4), _negated=True), fields=['user', 'id'], name='goal_active_user_id_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0015_goal_active_user_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(condition=models.Q(('status__in', (1, 2))), fields=['due_date'], name='goal_open_due_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(condition=models.Q(('due_date__isnull', False), ('status__in', (1, 2))), fields=['updated'], name='goal_open_due_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('goals', '0016_goal_due_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MembershipChange',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='membership_change', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('changed', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата')),
+            ],
+            options={
+                'verbose_name': 'Выход из доски',
+                'verbose_name_plural': 'Выходы из досок',
+            },
+        ),
+    ]
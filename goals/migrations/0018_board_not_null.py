@@ -0,0 +1,72 @@
+# Generated by Django 4.2.2 on 2026-10-18 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+TABLES = ('goals_goal', 'goals_goalcomment')
+
+
+def fill_remaining_board(apps, schema_editor):
+    # Строки, созданные старым кодом после пакетного заполнения в 0012. CHECK уже отклоняет новые строки
+    # без доски, поэтому после этого шага их не появится
+    GoalCategory = apps.get_model('goals', 'GoalCategory')
+    Goal = apps.get_model('goals', 'Goal')
+    GoalComment = apps.get_model('goals', 'GoalComment')
+
+    Goal.objects.filter(board__isnull=True).update(
+        board_id=Subquery(GoalCategory.objects.filter(id=OuterRef('category_id')).values('board_id')[:1])
+    )
+    GoalComment.objects.filter(board__isnull=True).update(
+        board_id=Subquery(Goal.objects.filter(id=OuterRef('goal_id')).values('board_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+    # Каждый шаг - отдельная транзакция: короткие ACCESS EXCLUSIVE не держатся, пока идёт проверка таблиц
+    atomic = False
+
+    dependencies = [
+        ('goals', '0017_membership_change'),
+    ]
+
+    operations = [
+        # ACCESS EXCLUSIVE на мгновение, без сканирования таблиц: NOT VALID проверяет только новые записи
+        *(
+            migrations.RunSQL(
+                f'ALTER TABLE {table} ADD CONSTRAINT {table}_board_not_null CHECK (board_id IS NOT NULL) NOT VALID',
+                f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_board_not_null',
+            )
+            for table in TABLES
+        ),
+        migrations.RunPython(fill_remaining_board, migrations.RunPython.noop),
+        # Сканирование под SHARE UPDATE EXCLUSIVE: чтение и запись в таблицы продолжаются
+        *(
+            migrations.RunSQL(f'ALTER TABLE {table} VALIDATE CONSTRAINT {table}_board_not_null', migrations.RunSQL.noop)
+            for table in TABLES
+        ),
+        # SET NOT NULL снова берёт ACCESS EXCLUSIVE, но не сканирует таблицу - её покрывает проверенный CHECK.
+        # Внешний ключ не пересоздаётся: AlterField меняет только состояние миграций
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    f'ALTER TABLE {table} ALTER COLUMN board_id SET NOT NULL; '
+                    f'ALTER TABLE {table} DROP CONSTRAINT {table}_board_not_null',
+                    f'ALTER TABLE {table} ALTER COLUMN board_id DROP NOT NULL',
+                )
+                for table in TABLES
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='goal',
+                    name='board',
+                    field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='goals', to='goals.board', verbose_name='Доска'),
+                ),
+                migrations.AlterField(
+                    model_name='goalcomment',
+                    name='board',
+                    field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='comments', to='goals.board', verbose_name='Доска'),
+                ),
+            ],
+        ),
+    ]
@@ -1,4 +1,8 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
 
 from core.models import User
 
@@ -19,6 +23,10 @@ class Board(BaseModel):
 
     title = models.CharField(verbose_name='Название', max_length=255)
     is_deleted = models.BooleanField(verbose_name='Удалена', default=False)
+    # Растёт при любой записи в доску, её участников, категории, цели и комментарии (см. goals/versions.py).
+    # В отличие от updated, отражает изменение содержимого доски, а не только её собственных полей
+    version = models.PositiveIntegerField(verbose_name='Версия', default=1, editable=False)
+    version_updated = models.DateTimeField(verbose_name='Дата изменения версии', default=timezone.now, editable=False)
 
     def __str__(self):
         return self.title
@@ -29,6 +37,10 @@ class BoardParticipant(BaseModel):
         unique_together = ('board', 'user')
         verbose_name = 'Участник'
         verbose_name_plural = 'Участники'
+        indexes = [
+            # Фильтр видимости "доски пользователя" и проверка роли читаются только из индекса
+            models.Index(fields=['user', 'board'], include=['role'], name='participant_user_board_idx'),
+        ]
 
     class Role(models.IntegerChoices):
         owner = 1, 'Владелец'
@@ -45,29 +57,70 @@ class BoardParticipant(BaseModel):
         return self.board.title
 
 
+class MembershipChange(models.Model):
+    """
+    Когда пользователя последний раз убрали с доски. Доска пропадает из его списков, а дата версии
+    ни одной из оставшихся досок при этом не меняется - Last-Modified учитывает и эту дату
+    """
+
+    class Meta:
+        verbose_name = 'Выход из доски'
+        verbose_name_plural = 'Выходы из досок'
+
+    user = models.OneToOneField(
+        User, primary_key=True, on_delete=models.CASCADE, related_name='membership_change', verbose_name='Пользователь'
+    )
+    changed = models.DateTimeField(verbose_name='Дата', default=timezone.now)
+
 
 class GoalCategory(BaseModel):
     class Meta:
         verbose_name = 'Категория'
         verbose_name_plural = 'Категории'
-
+        indexes = [
+            models.Index(fields=['board', 'title'], condition=Q(is_deleted=False), name='goalcategory_board_title_idx'),
+            GinIndex(fields=['search_vector'], name='goalcategory_search_idx'),
+            GinIndex(fields=['title'], name='goalcategory_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
 
     board = models.ForeignKey(Board, verbose_name='Доска', on_delete=models.PROTECT, related_name='categories')
 
     title = models.CharField(verbose_name='Название', max_length=255)
     user = models.ForeignKey(User, verbose_name='Автор', on_delete=models.PROTECT)
     is_deleted = models.BooleanField(verbose_name='Удалена', default=False)
+    # Заполняется триггером в базе (см. миграцию 0010), из Python не пишется
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_board_id = instance.__dict__.get('board_id')
+        return instance
+
+    def save(self, *args, **kwargs) -> None:
+        loaded_board_id = getattr(self, '_loaded_board_id', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if loaded_board_id is not None and loaded_board_id != self.board_id:
+                # Категория переехала на другую доску - цели и комментарии едут вместе с ней
+                Goal.objects.filter(category=self).update(board_id=self.board_id)
+                GoalComment.objects.filter(goal__category=self).update(board_id=self.board_id)
+        self._loaded_board_id = self.board_id
 
     def __str__(self):
         return self.title
 
 
+class GoalStatus(models.IntegerChoices):
+    to_do = 1, 'К выполнению'
+    in_progress = 2, 'В процессе'
+    done = 3, 'Выполнено'
+    archived = 4, 'Архив'
+
+
 class Goal(BaseModel):
-    class Status(models.IntegerChoices):
-        to_do = 1, 'К выполнению'
-        in_progress = 2, 'В процессе'
-        done = 3, 'Выполнено'
-        archived = 4, 'Архив'
+    # Объявлен на уровне модуля, чтобы на него могли ссылаться условия индексов в Meta
+    Status = GoalStatus
 
     class Priority(models.IntegerChoices):
         low = 1, 'Низкий'
@@ -84,10 +137,68 @@ class Goal(BaseModel):
         verbose_name='Приоритет', choices=Priority.choices, default=Priority.medium
     )
     category = models.ForeignKey(GoalCategory, verbose_name='Категория', on_delete=models.PROTECT, related_name='goals')
+    # Копия category.board_id: фильтр видимости и права проверяются без join'а через категорию
+    board = models.ForeignKey(
+        Board, verbose_name='Доска', on_delete=models.PROTECT, related_name='goals', editable=False
+    )
+    # Заполняется триггером в базе (см. миграцию 0010), из Python не пишется
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name = 'Цель'
         verbose_name_plural = 'Цели'
+        indexes = [
+            # Курсорная пагинация: сортировка списка + id как разрешение равенства
+            models.Index(fields=['title', 'id'], name='goal_title_id_idx'),
+            models.Index(fields=['created', 'id'], name='goal_created_id_idx'),
+            # Списки целей не показывают архив: частичные индексы не содержат архивных строк
+            models.Index(
+                fields=['board', 'title'], condition=~Q(status=GoalStatus.archived), name='goal_active_board_title_idx'
+            ),
+            models.Index(
+                fields=['board', 'created'],
+                condition=~Q(status=GoalStatus.archived),
+                name='goal_active_board_created_idx',
+            ),
+            # Страницы /goals в боте: keyset по id среди целей пользователя
+            models.Index(
+                fields=['user', 'id'], condition=~Q(status=GoalStatus.archived), name='goal_active_user_id_idx'
+            ),
+            # Напоминания о сроках (bot/reminders.py): окно дат и цели, изменённые с прошлого запуска.
+            # Выполненные и архивные цели в индексы не попадают
+            models.Index(
+                fields=['due_date'],
+                condition=Q(status__in=(GoalStatus.to_do, GoalStatus.in_progress)),
+                name='goal_open_due_date_idx',
+            ),
+            models.Index(
+                fields=['updated'],
+                condition=Q(status__in=(GoalStatus.to_do, GoalStatus.in_progress), due_date__isnull=False),
+                name='goal_open_due_updated_idx',
+            ),
+            GinIndex(fields=['search_vector'], name='goal_search_idx'),
+            GinIndex(fields=['title'], name='goal_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_board_id = instance.__dict__.get('board_id')
+        return instance
+
+    def save(self, *args, **kwargs) -> None:
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'category', 'category_id'} & set(update_fields):
+            self.board_id = self.category.board_id
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'board'}
+
+        loaded_board_id = getattr(self, '_loaded_board_id', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if loaded_board_id is not None and loaded_board_id != self.board_id:
+                GoalComment.objects.filter(goal=self).update(board_id=self.board_id)
+        self._loaded_board_id = self.board_id
 
     def __str__(self):
         return self.title
@@ -97,7 +208,59 @@ class GoalComment(BaseModel):
     text = models.TextField(verbose_name='Текст')
     goal = models.ForeignKey(Goal, verbose_name='Цель', on_delete=models.CASCADE)
     user = models.ForeignKey(User, verbose_name='Автор', on_delete=models.CASCADE, related_name='comments')
+    # Копия goal.board_id, см. Goal.board
+    board = models.ForeignKey(
+        Board, verbose_name='Доска', on_delete=models.PROTECT, related_name='comments', editable=False
+    )
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['goal', 'created'], name='goalcomment_goal_created_idx'),
+            models.Index(fields=['board', 'created'], name='goalcomment_board_created_idx'),
+            models.Index(fields=['created', 'id'], name='goalcomment_created_id_idx'),
+            models.Index(fields=['updated', 'id'], name='goalcomment_updated_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs) -> None:
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'goal', 'goal_id'} & set(update_fields):
+            self.board_id = self.goal.board_id
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'board'}
+        super().save(*args, **kwargs)
+
+
+class ArchiveJobStatus(models.IntegerChoices):
+    pending = 1, 'Ожидает'
+    running = 2, 'Выполняется'
+    done = 3, 'Завершена'
+
+
+class ArchiveJob(BaseModel):
+    """
+    Фоновая архивация целей удалённой доски или категории (см. goals/archive.py)
+    """
+
+    # Объявлен на уровне модуля, чтобы на него могло ссылаться условие индекса в Meta
+    Status = ArchiveJobStatus
+
+    board = models.ForeignKey(Board, verbose_name='Доска', on_delete=models.PROTECT, related_name='archive_jobs')
+    category = models.ForeignKey(
+        GoalCategory, verbose_name='Категория', on_delete=models.PROTECT, null=True, blank=True, default=None
+    )
+    status = models.PositiveSmallIntegerField(verbose_name='Статус', choices=Status.choices, default=Status.pending)
+    total_goals = models.PositiveIntegerField(verbose_name='Всего целей', null=True, blank=True, default=None)
+    archived_goals = models.PositiveIntegerField(verbose_name='Заархивировано целей', default=0)
+    # Водяные знаки: задача продолжает с места остановки после рестарта воркера
+    last_goal_id = models.BigIntegerField(default=0)
+    last_category_id = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Архивация'
+        verbose_name_plural = 'Архивации'
+        indexes = [
+            # Воркер выбирает только незавершённые задачи
+            models.Index(fields=['id'], condition=~Q(status=ArchiveJobStatus.done), name='archivejob_unfinished_idx'),
+        ]
@@ -0,0 +1,214 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any
+
+from django.db.models import Model, Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация по текущему порядку queryset'а.
+    Курсор хранит значения всех полей сортировки последней строки страницы,
+    к сортировке всегда добавляется id, поэтому позиция однозначна,
+    а страница N стоит столько же, сколько первая (нет OFFSET и COUNT)
+    """
+
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_limit = 20
+    max_limit = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view: Any = None) -> list[Model]:
+        queryset, position, reverse = self.get_page_queryset(queryset, request)
+        return self.set_page(list(queryset), position, reverse)
+
+    async def apaginate_queryset(self, queryset: QuerySet, request: Request, view: Any = None) -> list[Model]:
+        queryset, position, reverse = self.get_page_queryset(queryset, request)
+        return self.set_page([obj async for obj in queryset], position, reverse)
+
+    def get_page_queryset(self, queryset: QuerySet, request: Request) -> tuple[QuerySet, list | None, bool]:
+        """
+        Запрос страницы (на одну строку больше limit - чтобы узнать, есть ли следующая)
+        """
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.ordering = self.get_ordering(queryset)
+        position, reverse = self.decode_cursor(request)
+
+        ordering = [self._invert(field) for field in self.ordering] if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(ordering, position))
+        return queryset[: self.limit + 1], position, reverse
+
+    def set_page(self, results: list[Model], position: list | None, reverse: bool) -> list[Model]:
+        has_more = len(results) > self.limit
+        results = results[: self.limit]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data: Any) -> Response:
+        return Response({'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_limit(self, request: Request) -> int:
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+    @staticmethod
+    def get_ordering(queryset: QuerySet) -> list[str]:
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        ordering = [field for field in ordering if isinstance(field, str)]
+        if not ordering:
+            ordering = ['id']
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            # Направление id совпадает с первым полем, чтобы (created DESC, id DESC)
+            # читался обратным проходом по индексу (created, id)
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return ordering
+
+    @staticmethod
+    def _invert(field: str) -> str:
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def get_position_filter(ordering: list[str], position: list) -> Q:
+        """
+        (f1, f2, ..., fn) > (v1, v2, ..., vn) с учётом направления каждого поля
+        """
+        position_filter = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{name}__{lookup}': position[index]})
+            for previous_field, value in zip(ordering[:index], position[:index]):
+                condition &= Q(**{previous_field.lstrip('-'): value})
+            position_filter |= condition
+        return position_filter
+
+    def get_position(self, instance: Model) -> list:
+        position = []
+        for field in self.ordering:
+            value = instance
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def decode_cursor(self, request: Request) -> tuple[list | None, bool]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = payload['p'], bool(payload['r'])
+        except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position: list, reverse: bool) -> str:
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self) -> str | None:
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+
+class AsyncLimitOffsetPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination с apaginate_queryset для асинхронных списков (core.mixins.AsyncListModelMixin)
+    """
+
+    async def apaginate_queryset(self, queryset: QuerySet, request: Request, view: Any = None) -> list | None:
+        # То же, что LimitOffsetPagination.paginate_queryset, через async ORM
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.count = await queryset.acount()
+        self.offset = self.get_offset(request)
+        self.request = request
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return [obj async for obj in queryset[self.offset : self.offset + self.limit]]
+
+
+class LimitOffsetOrKeysetPagination(AsyncLimitOffsetPagination):
+    """
+    По умолчанию - LimitOffsetPagination, как ждёт текущий фронтенд.
+    Если в запросе есть параметр cursor (пустой - первая страница), включается KeysetPagination
+    """
+
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view: Any = None) -> list | None:
+        self.keyset = None
+        if self.keyset_pagination_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset: QuerySet, request: Request, view: Any = None) -> list | None:
+        self.keyset = None
+        if self.keyset_pagination_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_pagination_class()
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+        return await super().apaginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data: Any) -> Response:
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view: Any) -> list[dict]:
+        return super().get_schema_operation_parameters(view) + [
+            {
+                'name': self.keyset_pagination_class.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Keyset cursor; pass an empty value to start cursor pagination',
+                'schema': {'type': 'string'},
+            }
+        ]
@@ -1,43 +1,37 @@
-from typing import Any
-
 from requests import Request
 from rest_framework.generics import GenericAPIView
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 
-from goals.models import Board, BoardParticipant, GoalCategory, Goal, GoalComment
+from goals.membership import OWNER_ROLES, READ_ROLES, WRITE_ROLES, has_board_role
+from goals.models import ArchiveJob, Board, GoalCategory, Goal, GoalComment
 
 
 class BoardPermission(IsAuthenticated):
     def has_object_permission(self, request: Request, view: GenericAPIView, obj: Board) -> bool:
-        _filters: dict[str, Any] = {'user_id': request.user.id, 'board_id': obj.id}
-        if request.method not in SAFE_METHODS:
-            _filters['role'] = BoardParticipant.Role.owner
-
-        return BoardParticipant.objects.filter(**_filters).exists()
+        roles = READ_ROLES if request.method in SAFE_METHODS else OWNER_ROLES
+        return has_board_role(request, obj.id, roles)
 
 
 class GoalCategoryPermission(IsAuthenticated):
     def has_object_permission(self, request: Request, view: GenericAPIView, obj: GoalCategory) -> bool:
-        _filters: dict[str, Any] = {'user_id': request.user.id, 'board_id': obj.board_id}
-        if request.method not in SAFE_METHODS:
-            _filters['role'] = [BoardParticipant.Role.owner, BoardParticipant.Role.writer]
-
-        return BoardParticipant.objects.filter(**_filters).exists()
+        roles = READ_ROLES if request.method in SAFE_METHODS else WRITE_ROLES
+        return has_board_role(request, obj.board_id, roles)
 
 
 class GoalPermission(IsAuthenticated):
     def has_object_permission(self, request: Request, view: GenericAPIView, obj: Goal) -> bool:
-        _filters: dict[str, Any] = {'user_id': request.user.id, 'board_id': obj.category.board_id}
-        if request.method not in SAFE_METHODS:
-            _filters['role'] = [BoardParticipant.Role.owner, BoardParticipant.Role.writer]
-
-        return BoardParticipant.objects.filter(**_filters).exists()
+        roles = READ_ROLES if request.method in SAFE_METHODS else WRITE_ROLES
+        return has_board_role(request, obj.board_id, roles)
 
 
 class GoalCommentPermission(IsAuthenticated):
     def has_object_permission(self, request: Request, view: GenericAPIView, obj: GoalComment) -> bool:
-        _filters: dict[str, Any] = {'user_id': request.user.id, 'board_id': obj.goal.category.board_id}
         if request.method not in SAFE_METHODS:
             return obj.user == request.user
 
-        return BoardParticipant.objects.filter(**_filters).exists()
+        return has_board_role(request, obj.board_id)
+
+
+class ArchiveJobPermission(IsAuthenticated):
+    def has_object_permission(self, request: Request, view: GenericAPIView, obj: ArchiveJob) -> bool:
+        return has_board_role(request, obj.board_id)
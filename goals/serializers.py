@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Any
 
 
 from django.db import transaction
@@ -9,14 +10,18 @@ from rest_framework.request import Request
 
 from core.models import User
 from core.serializers import ProfileSerializer
-from goals.models import GoalCategory, Goal, GoalComment, Board, BoardParticipant
+from goals.membership import WRITE_ROLES, has_board_role, invalidate_board_roles
+from goals.models import ArchiveJob, GoalCategory, Goal, GoalComment, Board, BoardParticipant
+
+GOAL_BULK_OPERATIONS = ('create', 'update', 'archive')
+MAX_BULK_OPERATIONS = 500
 
 
 class BoardSerializer(serializers.ModelSerializer):
     class Meta:
         model = Board
         read_only_fields = ('id', 'created', 'updated', 'is_deleted')
-        fields = '__all__'
+        exclude = ('version', 'version_updated')
 
 
 class BoardParticipantSerializer(serializers.ModelSerializer):
@@ -40,13 +45,19 @@ class BoardWithParticipantsSerializer(BoardSerializer):
     def update(self, instance: Board, validated_data: dict) -> Board:
         request: Request = self.context['request']
         with transaction.atomic():
-            BoardParticipant.objects.filter(board=instance).exclude(user=request.user).delete()
+            old_participants = BoardParticipant.objects.filter(board=instance).exclude(user=request.user)
+            affected_user_ids = list(old_participants.values_list('user_id', flat=True))
+            old_participants.delete()
             new_participants = []
             for participants in validated_data.get('participants', []):
                 new_participants.append(
                     BoardParticipant(user=participants['user'], role=participants['role'], board=instance)
                 )
             BoardParticipant.objects.bulk_create(new_participants, ignore_conflicts=True)
+            affected_user_ids.extend(participant.user_id for participant in new_participants)
+
+            invalidate_board_roles(instance.id, affected_user_ids)
+            transaction.on_commit(lambda: invalidate_board_roles(instance.id, affected_user_ids))
 
             if title := validated_data.get('title'):
                 instance.title = title
@@ -61,17 +72,13 @@ class GoalCategoryCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = GoalCategory
         read_only_fields = ('id', 'created', 'updated', 'user')
-        fields = '__all__'
+        exclude = ('search_vector',)
 
 
     def validate_board(self, board: Board) -> Board:
         if board.is_deleted:
             raise ValidationError('Board is deleted')
-        if not BoardParticipant.objects.filter(
-            user_id=self.context['request'].user.id,
-            board_id=board.id,
-            role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
-        ).exists():
+        if not has_board_role(self.context['request'], board.id, WRITE_ROLES):
             raise PermissionDenied
         return board
 
@@ -86,17 +93,14 @@ class GoalCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Goal
         read_only_fields = ('id', 'created', 'updated', 'user')
-        fields = '__all__'
+        exclude = ('search_vector',)
+        extra_kwargs = {'category': {'queryset': GoalCategory.objects.select_related('board')}}
 
     def validate_category(self, value: GoalCategory) -> GoalCategory:
-        if value.is_deleted:
-
+        # Пока задача архивации доски не дошла до категорий, удалена только сама доска
+        if value.is_deleted or value.board.is_deleted:
             raise ValidationError('Category is deleted')
-        if not BoardParticipant.objects.filter(
-            user_id=self.context['request'].user.id,
-            board_id=value.board_id,
-            role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
-        ).exists():
+        if not has_board_role(self.context['request'], value.board_id, WRITE_ROLES):
             raise PermissionDenied
 
         return value
@@ -112,10 +116,43 @@ class GoalSerializer(GoalCreateSerializer):
     user = ProfileSerializer(read_only=True)
 
 
-    def validate_category(self, value: GoalCategory) -> GoalCategory:
-        if value.is_deleted:
-            raise ValidationError('Category is deleted')
+class PreloadedCategoryField(serializers.PrimaryKeyRelatedField):
+    """
+    Категория из словаря context['categories'], загруженного заранее одним запросом на весь пакет
+    """
+
+    def to_internal_value(self, data: Any) -> GoalCategory:
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        category = self.context['categories'].get(pk)
+        if category is None:
+            self.fail('does_not_exist', pk_value=data)
+        return category
+
 
+class GoalBulkItemSerializer(GoalCreateSerializer):
+    category = PreloadedCategoryField(queryset=GoalCategory.objects.all())
+
+
+class GoalBulkOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=GOAL_BULK_OPERATIONS)
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False)
+
+    def validate(self, attrs: dict) -> dict:
+        if attrs['op'] != 'create' and 'id' not in attrs:
+            raise ValidationError({'id': 'This field is required.'})
+        if attrs['op'] != 'archive' and 'data' not in attrs:
+            raise ValidationError({'data': 'This field is required.'})
+        return attrs
+
+
+class GoalBulkSerializer(serializers.Serializer):
+    operations = GoalBulkOperationSerializer(many=True, allow_empty=False, max_length=MAX_BULK_OPERATIONS)
 
 
 class GoalCommentCreateSerializer(serializers.ModelSerializer):
@@ -125,16 +162,14 @@ class GoalCommentCreateSerializer(serializers.ModelSerializer):
         model = GoalComment
         read_only_fields = ('id', 'created', 'updated', 'user')
         fields = '__all__'
+        extra_kwargs = {'goal': {'queryset': Goal.objects.select_related('category', 'board')}}
 
     def validate_goal(self, value: Goal) -> Goal:
-        if value.status == Goal.Status.archived:
+        # Цели удалённой категории или доски остаются неархивированными, пока идёт задача архивации
+        if value.status == Goal.Status.archived or value.category.is_deleted or value.board.is_deleted:
             raise ValidationError('not allowed in deleted goal')
 
-        if not BoardParticipant.objects.filter(
-            user_id=self.context['request'].user.id,
-            board_id=value.category.board_id,
-            role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
-        ).exists():
+        if not has_board_role(self.context['request'], value.board_id, WRITE_ROLES):
             raise PermissionDenied
 
         return value
@@ -151,3 +186,10 @@ class GoalCommentSerializer(GoalCommentCreateSerializer):
         if self.context['request'].user.id != value.user_id:
             raise PermissionDenied
         return value
+
+
+class ArchiveJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchiveJob
+        fields = ('id', 'board', 'category', 'status', 'total_goals', 'archived_goals', 'created', 'updated')
+        read_only_fields = fields
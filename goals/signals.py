@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import User
+from goals.membership import invalidate_board_role
+from goals.models import Board, BoardParticipant, Goal, GoalCategory, GoalComment, MembershipChange
+from goals.versions import bump_board_versions
+
+# Поля профиля, вложенного в ответы досок, категорий, целей и комментариев (ProfileSerializer)
+PROFILE_FIELDS = {'username', 'first_name', 'last_name', 'email'}
+
+
+@receiver([post_save, post_delete], sender=BoardParticipant)
+def reset_board_role(sender, instance: BoardParticipant, **kwargs) -> None:
+    # Сбрасываем сразу и ещё раз после коммита: иначе параллельный запрос
+    # успеет закешировать роль из ещё не закоммиченного состояния
+    invalidate_board_role(instance.user_id, instance.board_id)
+    transaction.on_commit(lambda: invalidate_board_role(instance.user_id, instance.board_id))
+
+
+@receiver(post_delete, sender=BoardParticipant)
+def remember_membership_change(sender, instance: BoardParticipant, **kwargs) -> None:
+    MembershipChange.objects.bulk_create(
+        [MembershipChange(user_id=instance.user_id, changed=timezone.now())],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['changed'],
+    )
+
+
+@receiver(post_save, sender=Board)
+def bump_board_version(sender, instance: Board, created: bool = False, **kwargs) -> None:
+    if not created:
+        bump_board_versions([instance.id])
+
+
+@receiver([post_save, post_delete], sender=BoardParticipant)
+@receiver([post_save, post_delete], sender=GoalComment)
+def bump_parent_board_version(sender, instance: BoardParticipant | GoalComment, **kwargs) -> None:
+    bump_board_versions([instance.board_id])
+
+
+@receiver([post_save, post_delete], sender=GoalCategory)
+@receiver([post_save, post_delete], sender=Goal)
+def bump_moved_board_version(sender, instance: GoalCategory | Goal, **kwargs) -> None:
+    # При переносе на другую доску меняются обе: старая (_loaded_board_id, см. from_db) и новая
+    bump_board_versions([instance.board_id, getattr(instance, '_loaded_board_id', None)])
+
+
+@receiver(post_save, sender=User)
+def bump_user_board_versions(
+    sender, instance: User, created: bool = False, update_fields: frozenset | None = None, **kwargs
+) -> None:
+    # Профиль входит в закешированные ответы всех досок, где пользователь участник или автор.
+    # Сохранение только last_login при входе ответы не меняет
+    if created or (update_fields is not None and not PROFILE_FIELDS & set(update_fields)):
+        return
+    bump_board_versions(
+        BoardParticipant.objects.filter(user_id=instance.id)
+        .values_list('board_id', flat=True)
+        .union(
+            GoalCategory.objects.filter(user_id=instance.id).values_list('board_id', flat=True),
+            Goal.objects.filter(user_id=instance.id).values_list('board_id', flat=True),
+            GoalComment.objects.filter(user_id=instance.id).values_list('board_id', flat=True),
+        )
+    )
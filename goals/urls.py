@@ -10,6 +10,7 @@ urlpatterns = [
     path('goal_category/<pk>', views.GoalCategoryView.as_view(), name='category'),
     #goal
     path('goal/create', views.GoalCreateView.as_view(), name='goal-create'),
+    path('goal/bulk', views.GoalBulkView.as_view(), name='goal-bulk'),
     path('goal/list', views.GoalListView.as_view(), name='goal-list'),
     path('goal/<pk>', views.GoalView.as_view(), name='goal'),
     #goal_comment
@@ -20,4 +21,6 @@ urlpatterns = [
     path('board/create', views.BoardCreateView.as_view(), name='board-create'),
     path('board/list', views.BoardListView.as_view(), name='board-list'),
     path('board/<pk>', views.BoardView.as_view(), name='board'),
+    #archive_job
+    path('archive_job/<pk>', views.ArchiveJobView.as_view(), name='archive-job'),
 ]
@@ -0,0 +1,17 @@
+from typing import Iterable
+
+from django.db.models import F
+from django.utils import timezone
+
+from goals.models import Board
+
+
+def bump_board_versions(board_ids: Iterable[int | None]) -> None:
+    """
+    Увеличить версию досок одним UPDATE.
+    Версия входит в ETag чтений (goals/conditional.py), поэтому её должна менять любая запись
+    в содержимое доски, в том числе массовые update/bulk_create, которые не вызывают сигналы
+    """
+    ids = {board_id for board_id in board_ids if board_id is not None}
+    if ids:
+        Board.objects.filter(id__in=ids).update(version=F('version') + 1, version_updated=timezone.now())
@@ -1,29 +1,58 @@
+from typing import Any
+
 from django.db import transaction
 
 from django.db.models import QuerySet
 
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import generics, permissions, filters
-from rest_framework.pagination import LimitOffsetPagination
-
-from goals.filters import GoalDateFilter
-
-from goals.models import GoalCategory, Goal, GoalComment, BoardParticipant, Board
-from goals.permissions import BoardPermission, GoalCategoryPermission, GoalPermission, GoalCommentPermission
+from rest_framework import generics, permissions, filters, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from core.mixins import AsyncListModelMixin, QueryBudgetMixin
+from goals.archive import archive_board, archive_category
+from goals.bulk import apply_goal_operations
+from goals.conditional import ConditionalGetMixin, VersionedResponseCacheMixin
+from goals.filters import FullTextSearchFilter, GoalDateFilter
+from goals.membership import NO_ROLE, remember_board_roles
+
+from goals.models import ArchiveJob, GoalCategory, Goal, GoalComment, BoardParticipant, Board
+from goals.pagination import AsyncLimitOffsetPagination, LimitOffsetOrKeysetPagination
+from goals.permissions import (
+    ArchiveJobPermission,
+    BoardPermission,
+    GoalCategoryPermission,
+    GoalPermission,
+    GoalCommentPermission,
+)
 
 from goals.serializers import (
     GoalCategoryCreateSerializer,
     GoalCategorySerializer,
     GoalCreateSerializer,
     GoalSerializer,
+    GoalBulkSerializer,
     GoalCommentCreateSerializer,
     GoalCommentSerializer,
 
     BoardSerializer,
     BoardWithParticipantsSerializer,
+    ArchiveJobSerializer,
 )
 
 
+def archive_job_response(request: Request, job: ArchiveJob) -> Response:
+    """
+    202 Accepted: объект уже скрыт, архивация его целей идёт фоновой задачей, статус - по Location
+    """
+    return Response(
+        ArchiveJobSerializer(job).data,
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Location': reverse('goals:archive-job', kwargs={'pk': job.pk}, request=request)},
+    )
+
+
 class BoardCreateView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = BoardSerializer
@@ -34,10 +63,11 @@ class BoardCreateView(generics.CreateAPIView):
             BoardParticipant.objects.create(user=self.request.user, board=board)
 
 
-class BoardListView(generics.ListAPIView):
+class BoardListView(QueryBudgetMixin, ConditionalGetMixin, AsyncListModelMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'GET': 5}
     serializer_class = BoardSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = AsyncLimitOffsetPagination
     filter_backends = [filters.OrderingFilter]
     ordering = ['title']
 
@@ -45,18 +75,33 @@ class BoardListView(generics.ListAPIView):
         return Board.objects.filter(participants__user=self.request.user).exclude(is_deleted=True)
 
 
-class BoardView(generics.RetrieveUpdateDestroyAPIView):
+class BoardView(QueryBudgetMixin, VersionedResponseCacheMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [BoardPermission]
+    query_budget = {'GET': 6}
     serializer_class = BoardWithParticipantsSerializer
 
     def get_queryset(self) -> QuerySet[Board]:
         return Board.objects.prefetch_related('participants__user').exclude(is_deleted=True)
 
-    def perform_destroy(self, instance: Board) -> None:
-        with transaction.atomic():
-            Board.objects.filter(id=instance.id).update(is_deleted=True)
-            instance.categories.update(is_deleted=True)
-            Goal.objects.filter(category__board=instance).update(status=Goal.Status.archived)
+    def get_board_states(self) -> list[tuple] | None:
+        # Чужая или несуществующая доска - без валидаторов и кеша, 403/404 как обычно.
+        # Любой участник вправе читать доску, поэтому ответ из кеша отдаётся без get_object
+        try:
+            board_id = int(self.kwargs['pk'])
+        except ValueError:
+            return None
+        rows = list(
+            BoardParticipant.objects.filter(user_id=self.request.user.id, board_id=board_id, board__is_deleted=False)
+            .values_list('board_id', 'board__version', 'role', 'board__is_deleted', 'board__version_updated')
+        )
+        if not rows:
+            remember_board_roles(self.request, {board_id: NO_ROLE})
+            return None
+        return self.split_board_rows(rows)
+
+    def destroy(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        job = archive_board(self.get_object())
+        return archive_job_response(request, job)
 
 
 class GoalCategoryCreateView(generics.CreateAPIView):
@@ -65,40 +110,40 @@ class GoalCategoryCreateView(generics.CreateAPIView):
     serializer_class = GoalCategoryCreateSerializer
 
 
-class GoalCategoryListView(generics.ListAPIView):
+class GoalCategoryListView(QueryBudgetMixin, VersionedResponseCacheMixin, AsyncListModelMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = GoalCategorySerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = AsyncLimitOffsetPagination
     filter_backends = [
 
         DjangoFilterBackend,
         filters.OrderingFilter,
-        filters.SearchFilter,
+        FullTextSearchFilter,
     ]
     filterset_fields = ['board']
 
     ordering_fields = ['title', 'created']
     ordering = ['title']
     search_fields = ['title']
+    query_budget = {'GET': 5}
 
     def get_queryset(self):
-
-        return GoalCategory.objects.filter(board__participants__user=self.request.user, is_deleted=False)
+        return GoalCategory.objects.select_related('user').filter(
+            board__participants__user=self.request.user, board__is_deleted=False, is_deleted=False
+        )
 
 
-class GoalCategoryView(generics.RetrieveUpdateDestroyAPIView):
+class GoalCategoryView(QueryBudgetMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [GoalCategoryPermission]
     serializer_class = GoalCategorySerializer
+    query_budget = {'GET': 4}
 
     def get_queryset(self):
-        return GoalCategory.objects.filter(is_deleted=False)
+        return GoalCategory.objects.select_related('user').filter(board__is_deleted=False, is_deleted=False)
 
-
-    def perform_destroy(self, instance: GoalCategory) -> None:
-        with transaction.atomic():
-            instance.is_deleted = True
-            instance.save(update_fields=('is_deleted',))
-            instance.goals.update(status=Goal.Status.archived)
+    def destroy(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        job = archive_category(self.get_object())
+        return archive_job_response(request, job)
 
 
 class GoalCreateView(generics.CreateAPIView):
@@ -108,33 +153,53 @@ class GoalCreateView(generics.CreateAPIView):
     serializer_class = GoalCreateSerializer
 
 
-class GoalListView(generics.ListAPIView):
+class GoalBulkView(QueryBudgetMixin, generics.GenericAPIView):
+    """
+    Пакет операций create / update / archive над целями одним запросом.
+    Ответ 200 и список результатов по каждой операции (status, id или errors)
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = GoalBulkSerializer
+    # Не зависит от размера пакета: аутентификация, цели, категории, роли, запись по наборам полей
+    query_budget = {'POST': 12}
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = apply_goal_operations(request, serializer.validated_data['operations'])
+        return Response({'results': results})
+
+
+class GoalListView(QueryBudgetMixin, ConditionalGetMixin, AsyncListModelMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = GoalSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = LimitOffsetOrKeysetPagination
     filter_backends = [
         DjangoFilterBackend,
         filters.OrderingFilter,
-        filters.SearchFilter,
+        FullTextSearchFilter,
     ]
     filterset_class = GoalDateFilter
     ordering_fields = ['title', 'created']
     ordering = ['title']
     search_fields = ['title', 'description']
+    query_budget = {'GET': 5}
 
     def get_queryset(self):
-        return Goal.objects.filter(
-            category__is_deleted=False, category__board__participants__user_id=self.request.user.id
+        return Goal.objects.select_related('user').filter(
+            board__participants__user_id=self.request.user.id, board__is_deleted=False, category__is_deleted=False
         ).exclude(status=Goal.Status.archived)
 
 
-class GoalView(generics.RetrieveUpdateDestroyAPIView):
+class GoalView(QueryBudgetMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [GoalPermission]
     serializer_class = GoalSerializer
+    query_budget = {'GET': 4}
 
     def get_queryset(self):
-        return Goal.objects.filter(
-            category__is_deleted=False, category__board__participants__user_id=self.request.user.id
+        return Goal.objects.select_related('user').filter(
+            board__participants__user_id=self.request.user.id, board__is_deleted=False, category__is_deleted=False
         ).exclude(status=Goal.Status.archived)
 
 
@@ -150,10 +215,10 @@ class GoalCommentCreateView(generics.CreateAPIView):
     serializer_class = GoalCommentCreateSerializer
 
 
-class GoalCommentListView(generics.ListAPIView):
+class GoalCommentListView(QueryBudgetMixin, ConditionalGetMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = GoalCommentSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = LimitOffsetOrKeysetPagination
     filter_backends = [
         DjangoFilterBackend,
         filters.OrderingFilter,
@@ -161,19 +226,39 @@ class GoalCommentListView(generics.ListAPIView):
     filterset_fields = ('goal',)
     ordering_fields = ['created', 'updated']
     ordering = ['-created']
+    query_budget = {'GET': 5}
 
     def get_queryset(self):
-
-        return GoalComment.objects.filter(goal__category__board__participants__user_id=self.request.user.id).exclude(
-            goal__status=Goal.Status.archived)
+        return (
+            GoalComment.objects.select_related('user')
+            .filter(
+                board__participants__user_id=self.request.user.id,
+                board__is_deleted=False,
+                goal__category__is_deleted=False,
+            )
+            .exclude(goal__status=Goal.Status.archived)
+        )
 
 
-class GoalCommentView(generics.RetrieveUpdateDestroyAPIView):
+class GoalCommentView(QueryBudgetMixin, generics.RetrieveUpdateDestroyAPIView):
 
     permission_classes = [GoalCommentPermission]
     serializer_class = GoalCommentSerializer
+    query_budget = {'GET': 4}
 
     def get_queryset(self):
-        return GoalComment.objects.filter(goal__category__board__participants__user_id=self.request.user.id).exclude(
-            goal__status=Goal.Status.archived
+        return (
+            GoalComment.objects.select_related('user')
+            .filter(
+                board__participants__user_id=self.request.user.id,
+                board__is_deleted=False,
+                goal__category__is_deleted=False,
+            )
+            .exclude(goal__status=Goal.Status.archived)
         )
+
+
+class ArchiveJobView(generics.RetrieveAPIView):
+    permission_classes = [ArchiveJobPermission]
+    serializer_class = ArchiveJobSerializer
+    queryset = ArchiveJob.objects.all()
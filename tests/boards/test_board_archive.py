@@ -0,0 +1,110 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from goals.archive import process_chunk, run_pending_jobs
+from goals.models import ArchiveJob, Board, Goal, GoalCategory, GoalComment
+
+
+@pytest.mark.django_db()
+class TestBoardArchive:
+    @pytest.fixture(autouse=True)
+    def setup(self, user, board_factory, category_factory, goal_factory):
+        self.board = board_factory.create(with_owner=user)
+        self.categories = category_factory.create_batch(size=2, board=self.board, user=user)
+        self.goals = goal_factory.create_batch(size=5, category=self.categories[0], user=user)
+
+    def test_delete_returns_before_archival(self, auth_client):
+        """
+        Удаление доски сразу прячет её цели, а архивация идёт фоновой задачей
+        """
+        response = auth_client.delete(reverse('goals:board', kwargs={'pk': self.board.id}))
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['status'] == ArchiveJob.Status.pending
+        assert response.data['board'] == self.board.id
+        assert not Goal.objects.filter(status=Goal.Status.archived).exists()
+        assert auth_client.get(reverse('goals:goal-list')).data == []
+        assert auth_client.get(reverse('goals:category-list')).data == []
+
+        job = auth_client.get(response['Location']).data
+        assert job == response.data
+
+    def test_job_processed_in_chunks(self, auth_client):
+        """
+        Задача архивирует цели порциями и сохраняет прогресс после каждой
+        """
+        auth_client.delete(reverse('goals:board', kwargs={'pk': self.board.id}))
+        job = ArchiveJob.objects.get(board=self.board)
+
+        job = process_chunk(job.id, chunk_size=2)
+        assert (job.total_goals, job.archived_goals, job.status) == (5, 2, ArchiveJob.Status.running)
+
+        assert run_pending_jobs(chunk_size=2) == 1
+        job.refresh_from_db()
+        assert job.status == ArchiveJob.Status.done
+        assert job.archived_goals == 5
+        assert not Goal.objects.exclude(status=Goal.Status.archived).exists()
+        assert not GoalCategory.objects.filter(is_deleted=False).exists()
+
+    def test_version_bumped_once_at_completion(self, auth_client):
+        """
+        Порции не поднимают версию доски, завершение поднимает один раз; цели получают новую дату обновления
+        """
+        auth_client.delete(reverse('goals:board', kwargs={'pk': self.board.id}))
+        job = ArchiveJob.objects.get(board=self.board)
+        version = Board.objects.get(id=self.board.id).version
+
+        process_chunk(job.id, chunk_size=2)
+        process_chunk(job.id, chunk_size=2)
+        assert Board.objects.get(id=self.board.id).version == version
+
+        run_pending_jobs(chunk_size=2)
+        assert Board.objects.get(id=self.board.id).version == version + 1
+        assert all(goal.updated > self.goals[-1].updated for goal in Goal.objects.all())
+
+    def test_category_archive(self, auth_client):
+        """
+        Удаление категории архивирует только её цели
+        """
+        response = auth_client.delete(reverse('goals:category', kwargs={'pk': self.categories[0].id}))
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['category'] == self.categories[0].id
+
+        run_pending_jobs()
+
+        assert Goal.objects.filter(status=Goal.Status.archived).count() == 5
+        assert GoalCategory.objects.get(id=self.categories[1].id).is_deleted is False
+
+    def test_no_writes_while_board_job_unfinished(self, auth_client):
+        """
+        Пока задача не дошла до категорий и целей, создать в них цель или комментарий уже нельзя
+        """
+        auth_client.delete(reverse('goals:board', kwargs={'pk': self.board.id}))
+        category = self.categories[1]
+        goal = self.goals[0]
+
+        response = auth_client.post(reverse('goals:goal-create'), {'title': 'Цель', 'category': category.id})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {'category': ['Category is deleted']}
+
+        response = auth_client.post(reverse('goals:comment-create'), {'text': 'Комментарий', 'goal': goal.id})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {'goal': ['not allowed in deleted goal']}
+
+        response = auth_client.post(
+            reverse('goals:goal-bulk'),
+            {'operations': [{'op': 'create', 'data': {'title': 'Цель', 'category': category.id}}]},
+            format='json',
+        )
+        assert response.data['results'][0]['status'] == status.HTTP_400_BAD_REQUEST
+        assert Goal.objects.count() == 5
+        assert not GoalComment.objects.exists()
+
+    def test_no_comments_while_category_job_unfinished(self, auth_client):
+        auth_client.delete(reverse('goals:category', kwargs={'pk': self.categories[0].id}))
+
+        response = auth_client.post(reverse('goals:comment-create'), {'text': 'Комментарий', 'goal': self.goals[0].id})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not GoalComment.objects.exists()
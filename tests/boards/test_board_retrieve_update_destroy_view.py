@@ -85,6 +85,6 @@ class TestBoardDestroyView:
         Владелец может удалить доску
         """
         response = auth_client.delete(self.url)
-        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert response.status_code == status.HTTP_202_ACCEPTED
         board.refresh_from_db()
         assert board.is_deleted is True
@@ -0,0 +1,72 @@
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+
+from bot.models import TgUser
+from bot.tg.client import TgClient, TgClientError
+from bot.tg.fake import FakeTelegramServer
+from bot.tg.schemas import InlineKeyboardButton, InlineKeyboardMarkup
+from core.models import User
+
+
+@pytest.fixture()
+def server():
+    server = FakeTelegramServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture()
+def tg_client(server) -> TgClient:
+    return TgClient(token=server.token, base_url=server.url, sleep=lambda _: None)
+
+
+class TestFakeTelegramServer:
+    def test_recorded_updates_served(self, server, tg_client):
+        """
+        Запись getUpdates отдаётся настоящему клиенту с новыми update_id
+        """
+        assert server.seed(str(settings.BASE_DIR / 'tg_get_respons.json')) == 1
+
+        response = tg_client.get_updates(offset=0, timeout=0)
+
+        assert [(update.update_id, update.message.chat.id, update.message.text) for update in response.result] == [
+            (1, 5157274025, '/start')
+        ]
+        assert tg_client.get_updates(offset=2, timeout=0).result == []
+
+    def test_messages_and_edits(self, server, tg_client):
+        button = InlineKeyboardButton(text='»', callback_data='goals:next:1')
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[[button]])
+
+        response = tg_client.send_message(chat_id=3, text='страница', reply_markup=keyboard)
+        tg_client.edit_message_text(chat_id=3, message_id=response.result.message_id, text='вторая')
+        tg_client.answer_callback_query('9')
+
+        assert server.client.messages_to(3) == ['страница']
+        assert server.client.edited == [(3, response.result.message_id, 'вторая')]
+        assert server.client.answered == ['9']
+
+    def test_wrong_token(self, server):
+        client = TgClient(token='wrong', base_url=server.url)
+
+        with pytest.raises(TgClientError) as error:
+            client.send_message(chat_id=1, text='текст')
+
+        assert error.value.error_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+class TestLoadTestCommand:
+    def test_scenario_runs_and_cleans_up(self):
+        out = StringIO()
+
+        call_command('loadtestbot', '--chats=3', '--rounds=2', '--workers=2', stdout=out)
+
+        report = out.getvalue()
+        assert '24 replies' in report
+        assert report.splitlines()[-1].startswith('all')
+        assert not User.objects.filter(username__startswith='loadtest-').exists()
+        assert not TgUser.objects.exists()
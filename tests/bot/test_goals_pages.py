@@ -0,0 +1,78 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from bot.handlers import GOALS_PAGE_SIZE, BotHandler
+from bot.states import MemoryStateStore
+from bot.tg.fake import FakeTgClient
+from bot.tg.schemas import CallbackQuery, Chat, Message, UpdateObj
+from goals.models import Goal
+
+
+@pytest.mark.django_db()
+class TestGoalsPages:
+    chat_id = 10
+
+    @pytest.fixture()
+    def goals(self, tg_user_factory, goal_factory, category_factory, board_factory):
+        tg_user = tg_user_factory.create(chat_id=self.chat_id)
+        category = category_factory.create(board=board_factory.create(with_owner=tg_user.user), user=tg_user.user)
+        goals = goal_factory.create_batch(size=GOALS_PAGE_SIZE * 2 + 3, user=tg_user.user, category=category)
+        goal_factory.create(user=tg_user.user, category=category, status=Goal.Status.archived)
+        return sorted(goals, key=lambda goal: goal.id)
+
+    @staticmethod
+    def callbacks(client: FakeTgClient, chat_id: int, message_id: int) -> list[str]:
+        markup = client.keyboards[chat_id, message_id]
+        return [button.callback_data for row in markup.inline_keyboard for button in row] if markup else []
+
+    def press(self, handler: BotHandler, message_id: int, data: str) -> None:
+        message = Message(message_id=message_id, chat=Chat(id=self.chat_id))
+        callback_query = CallbackQuery(id='1', message=message, data=data)
+        handler.handle_update(UpdateObj(update_id=1, callback_query=callback_query))
+
+    def test_goals_are_paged(self, goals):
+        """
+        /goals присылает первую страницу, кнопки правят то же сообщение вперёд и назад
+        """
+        client = FakeTgClient()
+        handler = BotHandler(client, MemoryStateStore())
+        handler.handle_message(Message(chat=Chat(id=self.chat_id), text='/goals'))
+
+        message_id = client.last_message_id(self.chat_id)
+        first_page = '\n'.join(f'{goal.id} {goal.title}' for goal in goals[:GOALS_PAGE_SIZE])
+        assert client.messages_to(self.chat_id) == [first_page]
+        assert self.callbacks(client, self.chat_id, message_id) == [f'goals:next:{goals[GOALS_PAGE_SIZE - 1].id}']
+
+        self.press(handler, message_id, f'goals:next:{goals[GOALS_PAGE_SIZE - 1].id}')
+        self.press(handler, message_id, f'goals:next:{goals[GOALS_PAGE_SIZE * 2 - 1].id}')
+
+        last_page = '\n'.join(f'{goal.id} {goal.title}' for goal in goals[GOALS_PAGE_SIZE * 2 :])
+        assert client.edited[-1] == (self.chat_id, message_id, last_page)
+        assert self.callbacks(client, self.chat_id, message_id) == [f'goals:prev:{goals[GOALS_PAGE_SIZE * 2].id}']
+
+        self.press(handler, message_id, f'goals:prev:{goals[GOALS_PAGE_SIZE * 2].id}')
+        assert self.callbacks(client, self.chat_id, message_id) == [
+            f'goals:prev:{goals[GOALS_PAGE_SIZE].id}',
+            f'goals:next:{goals[GOALS_PAGE_SIZE * 2 - 1].id}',
+        ]
+        assert len(client.sent) == 1
+        assert len(client.answered) == 3
+
+    def test_page_reads_one_query(self, goals):
+        handler = BotHandler(FakeTgClient(), MemoryStateStore())
+        handler.handle_message(Message(chat=Chat(id=self.chat_id), text='/goals'))
+
+        with CaptureQueriesContext(connection) as context:
+            self.press(handler, 1, f'goals:next:{goals[0].id}')
+
+        assert len(context.captured_queries) == 1
+        assert '"goals_goal"."description"' not in context.captured_queries[0]['sql']
+
+    def test_no_goals(self, tg_user_factory):
+        client = FakeTgClient()
+        tg_user_factory.create(chat_id=self.chat_id)
+        BotHandler(client, MemoryStateStore()).handle_message(Message(chat=Chat(id=self.chat_id), text='/goals'))
+
+        assert client.messages_to(self.chat_id) == ['Нет целей']
+        assert self.callbacks(client, self.chat_id, client.last_message_id(self.chat_id)) == []
@@ -0,0 +1,94 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from bot.handlers import BotHandler
+from bot.identity import ChatIdentity, IdentityCache, identity_cache
+from bot.models import TgUser
+from bot.states import MemoryStateStore
+from bot.tg.fake import FakeTgClient
+from bot.tg.schemas import Chat, Message
+
+
+class TestIdentityCache:
+    def test_least_recently_used_is_evicted(self):
+        cache = IdentityCache(maxsize=2)
+        cache.set(1, ChatIdentity(tg_user_id=1, user_id=1))
+        cache.set(2, ChatIdentity(tg_user_id=2, user_id=2))
+        cache.get(1)
+        cache.set(3, ChatIdentity(tg_user_id=3, user_id=3))
+
+        assert cache.get(2) is None
+        assert cache.get(1) is not None
+        assert len(cache) == 2
+
+    def test_entry_expires(self, fake_clock):
+        cache = IdentityCache(ttl=10, clock=fake_clock)
+        cache.set(1, ChatIdentity(tg_user_id=1, user_id=1))
+
+        fake_clock.now = 10
+        assert cache.get(1) is None
+        assert len(cache) == 0
+
+
+@pytest.mark.django_db()
+class TestHandlerIdentity:
+    @staticmethod
+    def identity_queries(context: CaptureQueriesContext) -> list[str]:
+        return [query['sql'] for query in context.captured_queries if TgUser._meta.db_table in query['sql']]
+
+    def test_known_chat_makes_no_identity_queries(self, tg_user_factory):
+        """
+        Повторные сообщения верифицированного чата не ходят в базу за TgUser и пользователем
+        """
+        tg_user = tg_user_factory.create(chat_id=5)
+        handler = BotHandler(FakeTgClient(), MemoryStateStore())
+        handler.handle_message(Message(chat=Chat(id=5), text='/goals'))
+
+        with CaptureQueriesContext(connection) as context:
+            for _ in range(3):
+                handler.handle_message(Message(chat=Chat(id=5), text='/goals'))
+
+        assert self.identity_queries(context) == []
+        assert identity_cache.get(5) == ChatIdentity(tg_user_id=tg_user.id, user_id=tg_user.user_id)
+
+    def test_unverified_chat_is_not_cached(self):
+        handler = BotHandler(FakeTgClient(), MemoryStateStore())
+        handler.handle_message(Message(chat=Chat(id=6), text='/goals'))
+
+        assert identity_cache.get(6) is None
+        assert TgUser.objects.get(chat_id=6).verification_code
+
+    def test_verified_chat_is_cached_after_linking(self, auth_client, user):
+        """
+        Чат, проходящий верификацию, не в кеше: первое сообщение после привязки аккаунта
+        читает её из базы и уже тогда кеширует
+        """
+        handler = BotHandler(FakeTgClient(), MemoryStateStore())
+        handler.handle_message(Message(chat=Chat(id=7), text='/goals'))
+        tg_user = TgUser.objects.get(chat_id=7)
+
+        response = auth_client.patch(reverse('bot:verify_bot'), data={'verification_code': tg_user.verification_code})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert identity_cache.get(7) is None
+        handler.handle_message(Message(chat=Chat(id=7), text='/goals'))
+        assert identity_cache.get(7) == ChatIdentity(tg_user_id=tg_user.id, user_id=user.id)
+
+    def test_deleted_user_is_forgotten(self, tg_user_factory):
+        """
+        После удаления пользователя чат снова проходит верификацию, а не пишет от имени удалённого
+        """
+        tg_user = tg_user_factory.create(chat_id=8)
+        handler = BotHandler(FakeTgClient(), MemoryStateStore())
+        handler.handle_message(Message(chat=Chat(id=8), text='/goals'))
+        assert identity_cache.get(8) is not None
+
+        tg_user.user.delete()
+
+        assert identity_cache.get(8) is None
+        handler.handle_message(Message(chat=Chat(id=8), text='/goals'))
+        assert TgUser.objects.get(chat_id=8).user_id is None
+        assert identity_cache.get(8) is None
@@ -0,0 +1,61 @@
+import urllib.request
+
+import pytest
+
+from bot.handlers import BotHandler
+from bot.metrics import HANDLER_LATENCY, HANDLER_QUERIES, Counter, Histogram, MetricsRegistry, registry, serve_metrics
+from bot.states import MemoryStateStore
+from bot.tg.fake import FakeTgClient
+from bot.tg.schemas import Chat, Message, UpdateObj
+
+
+class TestMetrics:
+    def test_histogram_text_format(self):
+        metrics = MetricsRegistry()
+        histogram = metrics.register(Histogram('latency_seconds', 'Latency', ('method',), buckets=(0.1, 1)))
+        counter = metrics.register(Counter('requests_total', 'Requests', ('status',)))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, method='get')
+        counter.inc(status=200)
+
+        assert metrics.render().splitlines() == [
+            '# HELP latency_seconds Latency',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{method="get",le="0.1"} 1',
+            'latency_seconds_bucket{method="get",le="1"} 2',
+            'latency_seconds_bucket{method="get",le="+Inf"} 3',
+            'latency_seconds_sum{method="get"} 5.55',
+            'latency_seconds_count{method="get"} 3',
+            '# HELP requests_total Requests',
+            '# TYPE requests_total counter',
+            'requests_total{status="200"} 1',
+        ]
+
+    def test_served_over_http(self):
+        server = serve_metrics(port=0)
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{server.server_port}/metrics') as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert '# TYPE bot_handler_seconds histogram' in body
+
+
+@pytest.mark.django_db()
+class TestHandlerMetrics:
+    def test_command_measured(self, tg_user_factory):
+        """
+        Время и число SQL-запросов считаются по команде, произвольный текст идёт одной меткой
+        """
+        tg_user_factory.create(chat_id=1)
+        handler = BotHandler(FakeTgClient(), MemoryStateStore())
+        before = HANDLER_QUERIES.count(command='/goals')
+
+        handler.handle_update(UpdateObj(update_id=1, message=Message(chat=Chat(id=1), text='/goals')))
+        handler.handle_update(UpdateObj(update_id=2, message=Message(chat=Chat(id=1), text='что-то')))
+
+        assert HANDLER_QUERIES.count(command='/goals') == before + 1
+        assert HANDLER_LATENCY.count(command='message') >= 1
+        assert 'bot_handler_queries_bucket{command="/goals",le="+Inf"}' in registry.render()
@@ -0,0 +1,223 @@
+import threading
+import time
+
+import pytest
+from django.db import DatabaseError, transaction
+from django.db.models import QuerySet
+
+from bot.models import TgOutboxMessage
+from bot.outbox import DbOutbox, Outbox, OutboxRelay, Priority, TokenBucket
+from bot.tg.client import TgClientError
+from bot.tg.fake import FakeTgClient
+from bot.tg.schemas import InlineKeyboardMarkup
+
+
+class FloodOnceClient(FakeTgClient):
+    def __init__(self) -> None:
+        super().__init__()
+        self.flooded = False
+
+    def send_message(self, chat_id: int, text: str):
+        if not self.flooded:
+            self.flooded = True
+            raise TgClientError('Too Many Requests', 429, retry_after=0.01)
+        return super().send_message(chat_id, text)
+
+
+class TestTokenBucket:
+    def test_refill(self):
+        bucket = TokenBucket(rate=2, capacity=1, now=0)
+        assert bucket.delay(0) == 0
+        bucket.take(0)
+        assert bucket.delay(0) == 0.5
+        assert bucket.delay(0.5) == 0
+
+
+class TestOutbox:
+    def test_consecutive_messages_coalesced(self):
+        """
+        Неотправленные сообщения в один чат склеиваются
+        """
+        client = FakeTgClient()
+        outbox = Outbox(client)
+        outbox.send_message(1, 'первое')
+        outbox.send_message(1, 'второе')
+        outbox.send_message(2, 'другой чат')
+
+        assert outbox.stats.as_dict()['depth'] == 2
+        outbox.start()
+        assert outbox.flush(timeout=5)
+        outbox.stop()
+
+        assert client.messages_to(1) == ['первое\n\nвторое']
+        assert outbox.stats.coalesced == 1
+        assert outbox.stats.sent == 2
+
+    def test_priority_and_chat_limit(self, fake_clock):
+        """
+        Ответы идут раньше рассылок, чат с исчерпанным лимитом не задерживает остальных
+        """
+        outbox = Outbox(FakeTgClient(), chat_rate=1, clock=fake_clock)
+        outbox.send_message(1, 'рассылка', priority=Priority.bulk)
+        outbox.send_message(2, 'ответ')
+
+        first, _ = outbox._take_next()
+        second, _ = outbox._take_next()
+        assert (first.chat_id, second.chat_id) == (2, 1)
+        outbox._release(2)
+        outbox._release(1)
+
+        outbox.send_message(1, 'ещё ответ')
+        outbox.send_message(3, 'ответ')
+        message, _ = outbox._take_next()
+        assert message.chat_id == 3
+        outbox._release(3)
+
+        message, wait = outbox._take_next()
+        assert message is None
+        assert wait == 1
+
+        fake_clock.now = 1
+        message, _ = outbox._take_next()
+        assert message.text == 'ещё ответ'
+
+    def test_sender_pool_keeps_chat_order(self):
+        """
+        Несколько потоков отправки, но сообщения одного чата уходят по одному и по порядку
+        """
+        sending: set[int] = set()
+        lock = threading.Lock()
+
+        class SlowClient(FakeTgClient):
+            def send_message(self, chat_id: int, text: str, reply_markup: InlineKeyboardMarkup | None = None):
+                with lock:
+                    assert chat_id not in sending
+                    sending.add(chat_id)
+                time.sleep(0.001)
+                with lock:
+                    sending.discard(chat_id)
+                return super().send_message(chat_id, text, reply_markup)
+
+        client = SlowClient()
+        outbox = Outbox(client, global_rate=1000, chat_rate=1000, chat_burst=1000, senders=4)
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+        for n in range(40):
+            # С клавиатурой сообщения не склеиваются
+            outbox.send_message(n % 4, str(n), reply_markup=keyboard)
+        outbox.start()
+        assert outbox.flush(timeout=5)
+        outbox.stop()
+
+        assert {chat_id: client.messages_to(chat_id) for chat_id in range(4)} == {
+            chat_id: [str(n) for n in range(chat_id, 40, 4)] for chat_id in range(4)
+        }
+        assert outbox.stats.failed == 0
+
+    def test_flood_limit_requeues(self):
+        """
+        429 не теряет сообщение: отправка ставится на паузу и повторяется
+        """
+        client = FloodOnceClient()
+        outbox = Outbox(client).start()
+        outbox.send_message(1, 'текст')
+
+        assert outbox.flush(timeout=5)
+        outbox.stop()
+
+        assert client.messages_to(1) == ['текст']
+        assert outbox.stats.throttled == 1
+        assert outbox.stats.failed == 0
+
+
+class TestOutboxEdits:
+    def test_repeated_edits_coalesced(self):
+        """
+        Несколько правок одного сообщения в очереди уходят одной последней
+        """
+        client = FakeTgClient()
+        outbox = Outbox(client)
+        outbox.edit_message_text(1, 5, 'вторая страница')
+        outbox.edit_message_text(1, 5, 'третья страница')
+        outbox.answer_callback_query('42')
+        outbox.start()
+        assert outbox.flush(timeout=5)
+        outbox.stop()
+
+        assert client.edited == [(1, 5, 'третья страница')]
+        assert client.answered == ['42']
+        assert outbox.stats.coalesced == 1
+
+
+@pytest.mark.django_db()
+class TestOutboxRelay:
+    @staticmethod
+    def deliver(relay: OutboxRelay) -> None:
+        relay.outbox.start()
+        assert relay.outbox.flush(timeout=5)
+        relay.outbox.stop()
+        relay.remove_delivered()
+
+    def test_committed_rows_delivered_in_order(self):
+        """
+        Отправляются только закоммиченные ответы, по порядку внутри чата; доставленные строки удаляются
+        """
+        outbox = DbOutbox()
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+        with transaction.atomic():
+            outbox.send_message(1, 'первое', reply_markup=keyboard)
+            outbox.send_message(1, 'второе')
+            outbox.edit_message_text(1, 5, 'правка')
+            outbox.answer_callback_query('42')
+        with pytest.raises(ValueError), transaction.atomic():
+            outbox.send_message(1, 'откачено')
+            raise ValueError
+        client = FakeTgClient()
+        relay = OutboxRelay(client)
+
+        assert relay.relay_once() == 4
+        self.deliver(relay)
+
+        assert client.messages_to(1) == ['первое', 'второе']
+        assert client.keyboards[1, 1] == keyboard
+        assert client.edited == [(1, 5, 'правка')]
+        assert client.answered == ['42']
+        assert not TgOutboxMessage.objects.exists()
+
+    def test_queued_rows_limited(self):
+        """
+        В памяти не больше max_queued строк, переданные повторно не берутся
+        """
+        for n in range(3):
+            DbOutbox().send_message(n, str(n), priority=Priority.bulk)
+        relay = OutboxRelay(FakeTgClient(), max_queued=2)
+
+        assert relay.relay_once() == 2
+        assert relay.relay_once() == 0
+        assert relay.outbox.stats.as_dict()['depth_by_priority']['bulk'] == 2
+
+        self.deliver(relay)
+        assert relay.relay_once() == 1
+
+    def test_failed_delete_retried(self, monkeypatch):
+        """
+        Если удаление доставленных упало, строки удаляются на следующем шаге, а не теряются
+        """
+        DbOutbox().send_message(1, 'первое')
+        relay = OutboxRelay(FakeTgClient())
+        relay.relay_once()
+        relay.outbox.start()
+        assert relay.outbox.flush(timeout=5)
+        relay.outbox.stop()
+
+        def fail(*args, **kwargs):
+            raise DatabaseError('connection lost')
+
+        with monkeypatch.context() as patch:
+            patch.setattr(QuerySet, 'delete', fail)
+            with pytest.raises(DatabaseError):
+                relay.remove_delivered()
+        assert TgOutboxMessage.objects.exists()
+
+        relay.remove_delivered()
+        assert not TgOutboxMessage.objects.exists()
+        assert relay.relay_once() == 0
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from bot.models import ReminderWatermark, TgOutboxMessage
+from bot.outbox import DbOutbox, Priority
+from bot.reminders import Reminder, collect_reminders, render_reminders
+from goals.models import Goal
+
+
+@pytest.mark.django_db()
+class TestReminders:
+    chat_id = 30
+
+    @pytest.fixture()
+    def create_goal(self, tg_user_factory, category_factory, board_factory, goal_factory):
+        tg_user = tg_user_factory.create(chat_id=self.chat_id)
+        category = category_factory.create(board=board_factory.create(with_owner=tg_user.user), user=tg_user.user)
+
+        def _create(title: str, days: int, **kwargs) -> Goal:
+            due_date = timezone.localdate() + timedelta(days=days)
+            return goal_factory.create(user=tg_user.user, category=category, title=title, due_date=due_date, **kwargs)
+
+        return _create
+
+    @staticmethod
+    def queued() -> list[tuple[int, str]]:
+        return list(TgOutboxMessage.objects.order_by('id').values_list('chat_id', 'text'))
+
+    def test_one_message_per_chat(self, create_goal, goal_factory):
+        """
+        Скорые и просроченные цели чата приходят одним сообщением, лишнее не попадает
+        """
+        create_goal('Завтра', 1)
+        create_goal('Вчера', -1)
+        create_goal('Через неделю', 7)
+        create_goal('Сделано', 1, status=Goal.Status.done)
+        goal_factory.create(title='Без телеграма', due_date=timezone.localdate())
+
+        call_command('send_reminders', stdout=StringIO())
+
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        yesterday = timezone.localdate() - timedelta(days=1)
+        assert self.queued() == [
+            (
+                self.chat_id,
+                f'Скоро срок:\nЗавтра - до {tomorrow:%d.%m.%Y}\n\nПросрочено:\nВчера - до {yesterday:%d.%m.%Y}',
+            )
+        ]
+        assert TgOutboxMessage.objects.get().priority == Priority.bulk
+
+    def test_deleted_category_skipped(self, create_goal):
+        """
+        Цели удалённой категории, до которых ещё не дошла архивация, не напоминаются
+        """
+        goal = create_goal('Завтра', 1)
+        goal.category.is_deleted = True
+        goal.category.save(update_fields=['is_deleted'])
+
+        call_command('send_reminders', stdout=StringIO())
+
+        assert self.queued() == []
+
+    def test_watermark_prevents_repeats(self, create_goal):
+        create_goal('Завтра', 1)
+        call_command('send_reminders', stdout=StringIO())
+        call_command('send_reminders', stdout=StringIO())
+
+        assert len(self.queued()) == 1
+        assert ReminderWatermark.objects.get(kind='due_soon').due_date == timezone.localdate() + timedelta(days=1)
+
+    def test_failed_run_keeps_watermark(self, create_goal, monkeypatch):
+        """
+        Если сообщения не сохранились, водяные знаки не сдвигаются и следующий запуск напомнит то же
+        """
+        create_goal('Завтра', 1)
+
+        def broken(*args, **kwargs):
+            raise RuntimeError('database is down')
+
+        with monkeypatch.context() as patch:
+            patch.setattr(DbOutbox, 'send_messages', broken)
+            with pytest.raises(RuntimeError):
+                call_command('send_reminders', stdout=StringIO())
+        assert not ReminderWatermark.objects.exists()
+
+        call_command('send_reminders', stdout=StringIO())
+        assert len(self.queued()) == 1
+
+    def test_goal_added_after_run(self, create_goal):
+        """
+        Цель со сроком в уже пройденном окне, созданная после запуска, не теряется
+        """
+        today = timezone.localdate()
+        collect_reminders(today, days=1)
+        create_goal('Новая', 0)
+
+        reminders = collect_reminders(today, days=1)
+
+        assert [(reminder.kind, reminder.title) for reminder in reminders] == [('due_soon', 'Новая')]
+
+    def test_next_day_window(self, create_goal):
+        """
+        На следующий день читается только новое окно: вчерашняя скорая цель становится просроченной
+        """
+        today = timezone.localdate()
+        create_goal('Сегодня', 0)
+        collect_reminders(today, days=1)
+
+        with CaptureQueriesContext(connection) as context:
+            reminders = collect_reminders(today + timedelta(days=1), days=1, now=timezone.now() + timedelta(days=1))
+
+        assert [(reminder.kind, reminder.title) for reminder in reminders] == [('overdue', 'Сегодня')]
+        assert len(context.captured_queries) == 10
+
+    def test_long_list_split(self):
+        """
+        Сообщение режется по строкам под лимит Telegram
+        """
+        due_date = timezone.localdate()
+        reminders = [Reminder(1, 'due_soon', 'ц' * 200, due_date) for _ in range(30)]
+
+        messages = render_reminders(reminders)[1]
+
+        assert len(messages) == 2
+        assert all(len(text) <= 4096 for text in messages)
+        assert sum(text.count('ц' * 200) for text in messages) == 30
@@ -0,0 +1,228 @@
+import asyncio
+import gc
+import threading
+
+import pytest
+
+from bot.handlers import BotHandler
+from bot.models import TgUpdate, TgUpdateOffset, TgUser
+from bot.runtime import CATCH_UP_LIMIT, BotRuntime, store_received
+from bot.tg.fake import FakeTgClient
+from bot.tg.schemas import UpdateObj
+
+
+async def process(runtime: BotRuntime) -> None:
+    await runtime.poll_once()
+    await runtime.wait_pending()
+    # Потоки runtime держат соединения с базой, пока живы
+    runtime._executor.shutdown(wait=True)
+    runtime._poller.shutdown(wait=True)
+
+
+@pytest.fixture(autouse=True)
+def close_thread_connections():
+    yield
+    # Соединение завершившегося потока закрывает только сборщик мусора: у DatabaseWrapper есть циклы ссылок.
+    # Иначе оно переживает тест и мешает удалить тестовую базу
+    gc.collect()
+
+
+class TestBotRuntime:
+    def test_slow_chat_does_not_block_others(self):
+        """
+        Пока обработка одного чата ждёт, другой чат обрабатывается
+        """
+        client = FakeTgClient()
+        other_chat_done = threading.Event()
+        handled: list[tuple[int, str]] = []
+
+        def handler(update: UpdateObj) -> None:
+            if update.message.chat.id == 1:
+                assert other_chat_done.wait(timeout=5)
+            else:
+                other_chat_done.set()
+            handled.append((update.message.chat.id, update.message.text))
+
+        client.push_message(1, 'медленно')
+        client.push_message(2, 'быстро')
+        asyncio.run(process(BotRuntime(client, handler, workers=2, poll_timeout=0)))
+
+        assert handled == [(2, 'быстро'), (1, 'медленно')]
+
+    def test_chat_updates_stay_in_order(self):
+        """
+        Обновления одного чата обрабатываются по порядку и не параллельно
+        """
+        client = FakeTgClient()
+        active: set[int] = set()
+        handled: dict[int, list[str]] = {1: [], 2: []}
+
+        def handler(update: UpdateObj) -> None:
+            chat_id = update.message.chat.id
+            assert chat_id not in active
+            active.add(chat_id)
+            threading.Event().wait(0.001)
+            handled[chat_id].append(update.message.text)
+            active.discard(chat_id)
+
+        for n in range(20):
+            client.push_message(1 + n % 2, str(n))
+        runtime = BotRuntime(client, handler, workers=4, poll_timeout=0)
+        asyncio.run(process(runtime))
+
+        assert handled == {1: [str(n) for n in range(0, 20, 2)], 2: [str(n) for n in range(1, 20, 2)]}
+        assert runtime.offset == 21
+
+    def test_handler_error_does_not_stop_chat(self):
+        client = FakeTgClient()
+        handled = []
+
+        def handler(update: UpdateObj) -> None:
+            if update.message.text == 'ошибка':
+                raise ValueError
+            handled.append(update.message.text)
+
+        client.push_message(1, 'ошибка')
+        client.push_message(1, 'дальше')
+        asyncio.run(process(BotRuntime(client, handler, poll_timeout=0)))
+
+        assert handled == ['дальше']
+
+    def test_catch_up_then_long_polling(self):
+        """
+        Накопившиеся обновления выбираются полными пачками, неполная пачка переключает на long polling
+        """
+        client = FakeTgClient()
+        for n in range(CATCH_UP_LIMIT + 50):
+            client.push_message(n, str(n))
+        runtime = BotRuntime(client, lambda update: None, poll_timeout=0)
+
+        async def poll(runtime: BotRuntime) -> list[tuple[int, bool]]:
+            return [(await runtime.poll_once(), runtime.catching_up) for _ in range(2)]
+
+        assert asyncio.run(poll(runtime)) == [(CATCH_UP_LIMIT, True), (50, False)]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestBotHandlerWithFakeTransport:
+    def test_unverified_chats_get_codes(self):
+        """
+        Неверифицированные чаты получают коды, обработчики работают в потоках с ORM
+        """
+        client = FakeTgClient()
+        handler = BotHandler(client)
+        for chat_id in (10, 20, 30):
+            client.push_message(chat_id, '/start')
+
+        asyncio.run(process(BotRuntime(client, handler.handle_update, workers=3, poll_timeout=0)))
+
+        for chat_id in (10, 20, 30):
+            code = TgUser.objects.get(chat_id=chat_id).verification_code
+            assert client.messages_to(chat_id) == [f'Ваш проверочный код:\n {code}']
+
+
+@pytest.mark.django_db(transaction=True)
+class TestDurableOffset:
+    @staticmethod
+    async def restart(runtime: BotRuntime) -> None:
+        for update in await asyncio.get_running_loop().run_in_executor(runtime._poller, runtime.restore):
+            runtime.dispatch(update)
+        await process(runtime)
+
+    def test_restart_continues_after_handled(self):
+        """
+        После падения: подтверждённое и обработанное не повторяется, полученное, но не обработанное не теряется
+        """
+        client = FakeTgClient()
+        for text in ('обработано до падения', 'получено до падения', 'новое'):
+            client.push_message(1, text)
+        store_received(client.get_updates(offset=2, timeout=0, limit=1).result, 3)
+        handled = []
+
+        runtime = BotRuntime(client, lambda update: handled.append(update.message.text), poll_timeout=0, durable=True)
+        asyncio.run(self.restart(runtime))
+
+        assert handled == ['получено до падения', 'новое']
+        assert TgUpdateOffset.load() == 4
+        assert not TgUpdate.objects.exists()
+
+    def test_failed_update_rolled_back_and_removed(self):
+        """
+        Изменения упавшего обработчика откатываются, а само обновление не повторяется
+        """
+        client = FakeTgClient()
+        client.push_message(1, '/start')
+
+        def handler(update: UpdateObj) -> None:
+            TgUser.objects.create(chat_id=update.message.chat.id)
+            raise ValueError
+
+        asyncio.run(process(BotRuntime(client, handler, poll_timeout=0, durable=True)))
+
+        assert not TgUser.objects.exists()
+        assert not TgUpdate.objects.exists()
+
+    def test_slow_chat_does_not_hold_back_polling(self):
+        """
+        Пока один чат занят, getUpdates подтверждает полученное и идёт дальше: остальные чаты получают
+        и больше CATCH_UP_LIMIT новых обновлений, а занятое обновление переживает падение
+        """
+        client = FakeTgClient()
+        client.push_message(1, 'медленно')
+        release = threading.Event()
+        others = []
+
+        def handler(update: UpdateObj) -> None:
+            if update.message.chat.id == 1:
+                assert release.wait(timeout=5)
+            else:
+                others.append(update.message.text)
+
+        async def crash(runtime: BotRuntime) -> None:
+            await runtime.poll_once()
+            for n in range(CATCH_UP_LIMIT + 50):
+                client.push_message(2 + n % 10, str(n))
+            while await runtime.poll_once():
+                await runtime.wait_pending(1)
+
+        first = BotRuntime(client, handler, workers=2, poll_timeout=0, durable=True)
+        try:
+            asyncio.run(crash(first))
+            assert len(others) == CATCH_UP_LIMIT + 50
+            assert list(TgUpdate.objects.values_list('update_id', flat=True)) == [1]
+
+            handled = []
+            restarted = BotRuntime(client, lambda update: handled.append(update.message.text), durable=True)
+            asyncio.run(self.restart(restarted))
+        finally:
+            release.set()
+            # Поток медленного чата держит соединение с базой, пока не завершится
+            first._executor.shutdown(wait=True)
+            first._poller.shutdown(wait=True)
+
+        assert handled == ['медленно']
+
+    def test_failed_removal_does_not_stall_chat(self, monkeypatch):
+        """
+        Если не удалось даже убрать упавшее обновление из журнала, очередь чата идёт дальше
+        """
+        client = FakeTgClient()
+        client.push_message(1, 'ошибка')
+        client.push_message(1, 'дальше')
+        handled = []
+
+        def handler(update: UpdateObj) -> None:
+            if update.message.text == 'ошибка':
+                monkeypatch.setattr(TgUpdate.objects, 'filter', broken)
+                raise ValueError
+            handled.append(update.message.text)
+
+        def broken(*args, **kwargs):
+            raise RuntimeError('database is down')
+
+        runtime = BotRuntime(client, handler, poll_timeout=0, durable=True)
+        asyncio.run(process(runtime))
+
+        assert handled == ['дальше']
+        assert runtime.pending == 0
+        assert runtime.offset == 3
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from bot.handlers import BotHandler
+from bot.models import TgChatState
+from bot.states import DbStateStore, MemoryStateStore
+from bot.tg.fake import FakeTgClient
+from bot.tg.schemas import Chat, Message
+from goals.models import Goal
+
+
+@pytest.mark.django_db()
+class TestStateStores:
+    @pytest.fixture(params=[MemoryStateStore, DbStateStore])
+    def store(self, request):
+        return request.param(ttl=60)
+
+    def test_states_are_per_chat(self, store):
+        store.set(1, {'state': 'creating'})
+        store.set(2, {'state': 'getting goal title'})
+
+        assert store.get(1) == {'state': 'creating'}
+        assert store.get(2) == {'state': 'getting goal title'}
+        assert store.get(3) == {}
+
+        store.delete(1)
+        assert store.get(1) == {}
+
+    def test_expired_state_is_not_read(self, store):
+        """
+        Брошенный диалог истекает по TTL и удаляется purge_expired
+        """
+        store.ttl = -1
+        store.set(1, {'state': 'creating'})
+
+        assert store.get(1) == {}
+        assert store.purge_expired() == 1
+
+    def test_db_state_survives_new_store(self):
+        DbStateStore(ttl=60).set(1, {'state': 'creating'})
+
+        assert DbStateStore().get(1) == {'state': 'creating'}
+        assert TgChatState.objects.get(chat_id=1).expires_at > timezone.now() + timedelta(seconds=50)
+
+
+@pytest.mark.django_db()
+class TestConcurrentConversations:
+    def test_two_chats_create_goals_at_once(self, user_factory, tg_user_factory, board_factory, category_factory):
+        """
+        Два пользователя проходят /create одновременно и не портят состояние друг друга
+        """
+        client = FakeTgClient()
+        users = user_factory.create_batch(size=2)
+        categories = []
+        for chat_id, user in zip((101, 102), users):
+            tg_user_factory.create(chat_id=chat_id, user=user)
+            categories.append(category_factory.create(board=board_factory.create(with_owner=user), user=user))
+
+        def send(chat_id: int, text: str) -> None:
+            # Новый обработчик на каждое сообщение - как разные воркеры с общим DbStateStore
+            BotHandler(client, DbStateStore()).handle_message(Message(chat=Chat(id=chat_id), text=text))
+
+        send(101, '/create')
+        send(102, '/create')
+        send(101, str(categories[0].id))
+        send(102, str(categories[1].id))
+        send(102, 'Цель второго')
+        send(101, 'Цель первого')
+
+        assert Goal.objects.get(title='Цель первого').category_id == categories[0].id
+        assert Goal.objects.get(title='Цель второго').category_id == categories[1].id
+        assert not TgChatState.objects.exists()
@@ -0,0 +1,155 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from bot.metrics import TG_API_LATENCY, TG_API_REQUESTS
+from bot.tg.client import TgClient, TgClientError
+
+
+def refused(message: str) -> requests.ConnectionError:
+    """
+    Так requests сообщает об отказе в соединении и ошибке DNS: запрос не ушёл
+    """
+    return requests.ConnectionError(MaxRetryError(None, '/bot/sendMessage', NewConnectionError(None, message)))
+
+
+class StubTelegram(BaseHTTPRequestHandler):
+    """
+    Локальная заглушка Bot API: отдаёт заранее заданные ответы по очереди
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self) -> None:
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server.requests.append((self.path, body, self.client_address[1]))
+        status, payload = server.responses.pop(0) if server.responses else (200, server.default)
+        content = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture()
+def telegram():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubTelegram)
+    server.requests = []
+    server.responses = []
+    server.default = {'ok': True, 'result': {'chat': {'id': 1}, 'text': 'ok'}}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture()
+def sleeps() -> list:
+    return []
+
+
+@pytest.fixture()
+def tg_client(telegram, sleeps) -> TgClient:
+    return TgClient(token='token', base_url=f'http://127.0.0.1:{telegram.server_port}', sleep=sleeps.append)
+
+
+class TestTgClient:
+    def test_post_json_over_one_connection(self, telegram, tg_client):
+        """
+        Сообщения уходят POST'ом с JSON по одному keep-alive соединению
+        """
+        for n in range(3):
+            tg_client.send_message(chat_id=1, text=f'текст {n}')
+
+        assert [path for path, _, _ in telegram.requests] == ['/bottoken/sendMessage'] * 3
+        assert telegram.requests[0][1] == {'chat_id': 1, 'text': 'текст 0'}
+        assert len({port for _, _, port in telegram.requests}) == 1
+
+    def test_retry_after_honored(self, telegram, tg_client, sleeps):
+        telegram.responses = [
+            (429, {'ok': False, 'error_code': 429, 'description': 'Too Many', 'parameters': {'retry_after': 3}}),
+            (502, {'ok': False}),
+        ]
+
+        response = tg_client.send_message(chat_id=1, text='текст')
+
+        assert response.ok
+        assert sleeps == [3, tg_client.backoff * 2]
+        assert len(telegram.requests) == 3
+
+    def test_gives_up_after_retries(self, telegram, tg_client, sleeps):
+        telegram.responses = [(500, {'ok': False, 'description': 'Internal'})] * (tg_client.max_retries + 1)
+
+        with pytest.raises(TgClientError) as error:
+            tg_client.send_message(chat_id=1, text='текст')
+
+        assert error.value.error_code == 500
+        assert len(sleeps) == tg_client.max_retries
+
+    def test_client_error_not_retried(self, telegram, tg_client, sleeps):
+        telegram.responses = [(400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: chat not found'})]
+
+        with pytest.raises(TgClientError, match='chat not found'):
+            tg_client.send_message(chat_id=1, text='текст')
+
+        assert sleeps == []
+
+    def test_get_updates(self, telegram, tg_client):
+        telegram.responses = [(200, {'ok': True, 'result': [{'update_id': 5, 'message': {'chat': {'id': 1}}}]})]
+
+        response = tg_client.get_updates(offset=5, timeout=0)
+
+        assert response.result[0].update_id == 5
+        assert telegram.requests[0][1] == {'offset': 5, 'timeout': 0}
+
+    def test_requests_measured(self, telegram, tg_client):
+        """
+        Каждая попытка попадает в метрики с методом и HTTP-статусом
+        """
+        telegram.responses = [(502, {'ok': False, 'description': 'Bad Gateway'})]
+        before = TG_API_LATENCY.count(method='sendMessage')
+
+        tg_client.send_message(chat_id=1, text='текст')
+
+        assert TG_API_LATENCY.count(method='sendMessage') == before + 2
+        assert TG_API_REQUESTS.value(method='sendMessage', status=502) >= 1
+        assert TG_API_REQUESTS.value(method='sendMessage', status=200) >= 1
+
+    @pytest.mark.parametrize(
+        ('method', 'error', 'attempts'),
+        [
+            ('sendMessage', requests.ReadTimeout, 1),
+            ('sendMessage', requests.ConnectionError, 1),
+            ('sendMessage', requests.ConnectTimeout, TgClient.max_retries + 1),
+            ('sendMessage', refused, TgClient.max_retries + 1),
+            ('getUpdates', requests.ReadTimeout, TgClient.max_retries + 1),
+        ],
+    )
+    def test_network_errors(self, tg_client, monkeypatch, method, error, attempts):
+        """
+        Сетевые ошибки становятся TgClientError; неидемпотентный метод повторяется, только если запрос не ушёл
+        """
+        calls = []
+
+        def post(*args, **kwargs):
+            calls.append(args)
+            raise error('boom')
+
+        monkeypatch.setattr(tg_client.session, 'post', post)
+        before = TG_API_REQUESTS.value(method=method, status='error')
+
+        with pytest.raises(TgClientError, match='boom'):
+            tg_client._request(method, {})
+
+        assert len(calls) == attempts
+        assert TG_API_REQUESTS.value(method=method, status='error') == before + attempts
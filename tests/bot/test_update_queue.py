@@ -0,0 +1,136 @@
+import threading
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from bot.handlers import BotHandler
+from bot.models import TgOutboxMessage, TgUpdate, TgUpdateOffset
+from bot.outbox import DbOutbox, OutboxRelay
+from bot.tg.fake import FakeTgClient
+from bot.tg.schemas import Chat, InlineKeyboardMarkup, Message, UpdateObj
+from bot.update_queue import claimable_updates, ingest_updates, process_batch
+
+
+def text(update: UpdateObj) -> tuple[int, str]:
+    return update.message.chat.id, update.message.text
+
+
+@pytest.mark.django_db()
+class TestUpdateQueue:
+    def test_ingest(self):
+        """
+        Принятые обновления пишутся в очередь вместе с offset, повторно полученные не дублируются
+        """
+        client = FakeTgClient()
+        client.push_message(1, 'первое')
+        client.push_update(UpdateObj(update_id=0, edited_message=Message(chat=Chat(id=1), text='правка')))
+        client.push_message(2, 'второе')
+
+        assert ingest_updates(client, 0, timeout=0, accepts=BotHandler.handles) == (4, 3)
+        assert ingest_updates(client, 0, timeout=0, accepts=BotHandler.handles) == (4, 3)
+
+        assert list(TgUpdate.objects.order_by('update_id').values_list('update_id', 'chat_id')) == [(1, 1), (3, 2)]
+        assert UpdateObj.parse_obj(TgUpdate.objects.get(update_id=3).payload).message.text == 'второе'
+        assert TgUpdateOffset.load() == 4
+
+    def test_chats_processed_in_order(self):
+        """
+        Захватывается только голова очереди чата; обработанное удаляется, ошибка не останавливает очередь
+        """
+        client = FakeTgClient()
+        for n in range(6):
+            client.push_message(1 + n % 2, str(n))
+        ingest_updates(client, 0, timeout=0)
+        handled = []
+
+        def handler(update: UpdateObj) -> None:
+            handled.append(text(update))
+            if update.message.text == '0':
+                raise ValueError
+
+        assert list(claimable_updates().values_list('update_id', flat=True)) == [1, 2]
+        while process_batch(handler, batch_size=10):
+            pass
+
+        assert handled == [(1, '0'), (2, '1'), (1, '2'), (2, '3'), (1, '4'), (2, '5')]
+        assert not TgUpdate.objects.exists()
+
+    def test_replies_committed_with_claim(self, monkeypatch):
+        """
+        Ответы пишутся в транзакции захвата: откаченный захват не оставляет ответов,
+        а ответы чата отправляются в порядке обработки
+        """
+        client = FakeTgClient()
+        for n in range(4):
+            client.push_message(1 + n % 2, str(n))
+        ingest_updates(client, 0, timeout=0)
+        outbox = DbOutbox()
+        # С клавиатурой ответы не склеиваются
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+
+        def handler(update: UpdateObj) -> None:
+            outbox.send_message(update.message.chat.id, f'ответ {update.message.text}', reply_markup=keyboard)
+
+        def broken(*args, **kwargs):
+            raise RuntimeError('database is down')
+
+        with monkeypatch.context() as patch:
+            patch.setattr(TgUpdate.objects, 'filter', broken)
+            with pytest.raises(RuntimeError):
+                process_batch(handler)
+        assert not TgOutboxMessage.objects.exists()
+        assert TgUpdate.objects.count() == 4
+
+        while process_batch(handler, batch_size=1):
+            pass
+        relay = OutboxRelay(FakeTgClient(), chat_rate=1000, chat_burst=1000)
+        relay.relay_once()
+        relay.outbox.start()
+        assert relay.outbox.flush(timeout=5)
+        relay.outbox.stop()
+
+        sent = relay.outbox.tg_client
+        assert (sent.messages_to(1), sent.messages_to(2)) == (['ответ 0', 'ответ 2'], ['ответ 1', 'ответ 3'])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_busy_chat_skipped_by_other_worker():
+    """
+    Пока один воркер обрабатывает чат, другой берёт следующий чат, а не следующее обновление того же чата
+    """
+    client = FakeTgClient()
+    for chat_id, message in ((1, 'медленно'), (1, 'потом'), (2, 'другой чат')):
+        client.push_message(chat_id, message)
+    ingest_updates(client, 0, timeout=0)
+    started, release = threading.Event(), threading.Event()
+    slow_handled = []
+
+    def slow(update: UpdateObj) -> None:
+        started.set()
+        assert release.wait(timeout=5)
+        slow_handled.append(text(update))
+
+    def first_worker() -> None:
+        try:
+            process_batch(slow, batch_size=1)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=first_worker)
+    thread.start()
+    assert started.wait(timeout=5)
+    fast_handled = []
+
+    process_batch(lambda update: fast_handled.append(text(update)))
+    release.set()
+    thread.join()
+    process_batch(lambda update: fast_handled.append(text(update)))
+
+    assert slow_handled == [(1, 'медленно')]
+    assert fast_handled == [(2, 'другой чат'), (1, 'потом')]
+
+
+def test_workers_need_shared_states():
+    with pytest.raises(CommandError):
+        call_command('runbot', '--mode=worker', '--state-store=memory')
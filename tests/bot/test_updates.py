@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from bot.handlers import BotHandler
+from bot.metrics import UPDATES_SKIPPED
+from bot.runtime import BotRuntime
+from bot.states import MemoryStateStore
+from bot.tg.fake import FakeTgClient
+from bot.tg.schemas import CallbackQuery, Chat, GetUpdatesResponse, Message, UpdateObj
+from goals.models import Goal
+
+
+class TestUpdateParsing:
+    def test_all_update_kinds_parsed(self):
+        """
+        Любой вид обновления разбирается, неразборчивое остаётся с одним update_id
+        """
+        response = GetUpdatesResponse(
+            ok=True,
+            result=[
+                {'update_id': 1, 'message': {'message_id': 1, 'chat': {'id': 5}, 'text': '/goals'}},
+                {'update_id': 2, 'edited_message': {'message_id': 1, 'chat': {'id': 5}, 'text': '/create'}},
+                {'update_id': 3, 'my_chat_member': {'chat': {'id': 5}, 'new_chat_member': {'status': 'kicked'}}},
+                {'update_id': 4, 'channel_post': {'chat': {'id': -100}, 'text': 'пост'}},
+                {'update_id': 5, 'message': {'text': 'без чата'}},
+            ],
+        )
+
+        assert [update.update_id for update in response.result] == [1, 2, 3, 4, 5]
+        assert [update.chat_id for update in response.result] == [5, 5, 5, None, None]
+        assert [BotHandler.handles(update) for update in response.result] == [True, False, False, False, False]
+
+    def test_runtime_skips_unhandled_updates(self):
+        client = FakeTgClient()
+        handled = []
+        client.push_update(UpdateObj(update_id=0, edited_message=Message(chat=Chat(id=1), text='правка')))
+        client.push_message(1, 'сообщение')
+        skipped = UPDATES_SKIPPED.value(kind='edited_message')
+
+        async def process(runtime: BotRuntime) -> None:
+            await runtime.poll_once()
+            await runtime.wait_pending()
+
+        runtime = BotRuntime(client, handled.append, poll_timeout=0, accepts=BotHandler.handles)
+        asyncio.run(process(runtime))
+
+        assert [update.message.text for update in handled] == ['сообщение']
+        assert runtime.offset == 3
+        assert UPDATES_SKIPPED.value(kind='edited_message') == skipped + 1
+
+
+@pytest.mark.django_db()
+class TestCategoryKeyboard:
+    chat_id = 20
+
+    @pytest.fixture()
+    def category(self, tg_user_factory, category_factory, board_factory):
+        tg_user = tg_user_factory.create(chat_id=self.chat_id)
+        return category_factory.create(board=board_factory.create(with_owner=tg_user.user), user=tg_user.user)
+
+    def press(self, handler: BotHandler, message_id: int, data: str) -> None:
+        message = Message(message_id=message_id, chat=Chat(id=self.chat_id))
+        handler.handle_update(UpdateObj(update_id=1, callback_query=CallbackQuery(id='1', message=message, data=data)))
+
+    def test_create_goal_with_button(self, category):
+        """
+        /create присылает кнопки категорий, нажатие заменяет их вопросом о названии
+        """
+        client = FakeTgClient()
+        handler = BotHandler(client, MemoryStateStore())
+        handler.handle_message(Message(chat=Chat(id=self.chat_id), text='/create'))
+
+        message_id = client.last_message_id(self.chat_id)
+        buttons = client.keyboards[self.chat_id, message_id].inline_keyboard
+        assert [[button.callback_data for button in row] for row in buttons] == [[f'category:{category.id}']]
+
+        self.press(handler, message_id, f'category:{category.id}')
+        handler.handle_message(Message(chat=Chat(id=self.chat_id), text='Цель с кнопки'))
+
+        assert client.edited == [(self.chat_id, message_id, 'Название цели')]
+        assert client.keyboards[self.chat_id, message_id] is None
+        assert Goal.objects.get(title='Цель с кнопки').category_id == category.id
+        assert client.messages_to(self.chat_id)[-1] == 'Цель Цель с кнопки создана!'
+
+    def test_stale_button(self, category):
+        client = FakeTgClient()
+        handler = BotHandler(client, MemoryStateStore())
+        handler.handle_message(Message(chat=Chat(id=self.chat_id), text='/create'))
+        handler.handle_message(Message(chat=Chat(id=self.chat_id), text='/cancel'))
+
+        self.press(handler, client.last_message_id(self.chat_id), f'category:{category.id}')
+
+        assert client.edited[-1][2] == 'Выбор категории устарел, начните заново: /create'
+        assert not Goal.objects.exists()
@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from bot.handlers import BotHandler, process_update
+from bot.models import TgOutboxMessage, TgUser, TgWebhookUpdate
+from bot.outbox import DbOutbox
+from bot.states import MemoryStateStore
+from bot.views import WEBHOOK_PRUNE_EVERY
+
+
+def messages_to(chat_id: int) -> list[str]:
+    return list(TgOutboxMessage.objects.filter(chat_id=chat_id).order_by('id').values_list('text', flat=True))
+
+
+@pytest.mark.django_db()
+class TestTelegramWebhookView:
+    url = reverse('bot:webhook')
+    secret = 'webhook-secret'
+
+    @pytest.fixture(autouse=True)
+    def setup(self, settings, monkeypatch):
+        settings.BOT_WEBHOOK_SECRET = self.secret
+        self.handler = BotHandler(DbOutbox(), MemoryStateStore())
+        monkeypatch.setattr('bot.views.get_bot_handler', lambda: self.handler)
+
+    def _post(self, client, update_id: int, secret: str | None = None):
+        return client.post(
+            self.url,
+            {'update_id': update_id, 'message': {'chat': {'id': 7}, 'text': '/start'}},
+            format='json',
+            HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN=secret or self.secret,
+        )
+
+    def test_update_processed(self, client):
+        response = self._post(client, 1)
+
+        assert response.status_code == status.HTTP_200_OK
+        code = TgUser.objects.get(chat_id=7).verification_code
+        assert messages_to(7) == [f'Ваш проверочный код:\n {code}']
+
+    def test_duplicate_update_ignored(self, client):
+        """
+        Повторная доставка того же update_id не обрабатывается
+        """
+        self._post(client, 1)
+        response = self._post(client, 1)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(messages_to(7)) == 1
+
+    def test_failed_update_redelivered(self, client, monkeypatch):
+        """
+        Ошибка обработки откатывает отметку и уже записанный ответ: повторная доставка обрабатывается
+        """
+
+        def fail_after_reply(handler, update):
+            process_update(handler, update)
+            raise ZeroDivisionError
+
+        monkeypatch.setattr('bot.views.process_update', fail_after_reply)
+        with pytest.raises(ZeroDivisionError):
+            self._post(client, 1)
+        assert not TgWebhookUpdate.objects.exists()
+        assert not TgOutboxMessage.objects.exists()
+
+        monkeypatch.undo()
+        monkeypatch.setattr('bot.views.get_bot_handler', lambda: self.handler)
+        assert self._post(client, 1).status_code == status.HTTP_200_OK
+        assert len(messages_to(7)) == 1
+
+    def test_old_marks_pruned(self, client):
+        TgWebhookUpdate.objects.create(update_id=1, received_at=timezone.now() - timedelta(days=2))
+
+        self._post(client, WEBHOOK_PRUNE_EVERY)
+
+        assert list(TgWebhookUpdate.objects.values_list('update_id', flat=True)) == [WEBHOOK_PRUNE_EVERY]
+
+    def test_wrong_secret(self, client):
+        response = self._post(client, 1, secret='wrong')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert not TgUser.objects.exists()
+
+    def test_disabled_without_secret(self, client, settings):
+        settings.BOT_WEBHOOK_SECRET = ''
+
+        assert self._post(client, 1).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_unsupported_update_acknowledged(self, client):
+        response = client.post(
+            self.url, {'update_id': 2}, format='json', HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN=self.secret
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_unhandled_update_kind_skipped(self, client):
+        response = client.post(
+            self.url,
+            {'update_id': 5, 'edited_message': {'chat': {'id': 7}, 'text': '/start'}},
+            format='json',
+            HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN=self.secret,
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert not TgOutboxMessage.objects.exists()
+        assert not TgUser.objects.exists()
@@ -1,7 +1,19 @@
+from datetime import timedelta
+
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 
+from bot.handlers import BotHandler
+from bot.models import TgOutboxMessage, TgUser
+from bot.serializer import TgUserSerializer
+from bot.states import MemoryStateStore
+from bot.tg.fake import FakeTgClient
+from bot.tg.schemas import Chat, Message
+
 
 @pytest.mark.django_db()
 class TestVerifyBotView:
@@ -31,3 +43,84 @@ class TestVerifyBotView:
         assert response.status_code == status.HTTP_400_BAD_REQUEST
         assert response.json() == {'verification_code': ['User has already verified.']}
 
+
+    def test_expired_verification_code(self, auth_client, tg_user_factory, settings):
+        tg_user = tg_user_factory.create(user=None)
+        tg_user.update_verification_code()
+        settings.BOT_VERIFICATION_CODE_TTL = -1
+
+        response = auth_client.patch(self.url, data={'verification_code': tg_user.verification_code})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {'verification_code': ['Invalid verification code.']}
+
+    def test_code_is_single_use(self, auth_client, user, tg_user_factory):
+        tg_user = tg_user_factory.create(user=None)
+        tg_user.update_verification_code()
+        code = tg_user.verification_code
+
+        response = auth_client.patch(self.url, data={'verification_code': code})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert list(TgOutboxMessage.objects.values_list('chat_id', 'text')) == [(tg_user.chat_id, 'Bot verificated')]
+        tg_user.refresh_from_db()
+        assert tg_user.user_id == user.id
+        assert tg_user.verification_code_hash is None
+        assert code not in str(TgUser.objects.values().get(pk=tg_user.pk))
+
+    def test_concurrent_verification(self, auth_client, user_factory, tg_user_factory, monkeypatch):
+        """
+        Код, использованный параллельным запросом между проверкой и записью, не перепривязывает чат
+        """
+        tg_user = tg_user_factory.create(user=None)
+        tg_user.update_verification_code()
+        other = user_factory.create()
+        validate = TgUserSerializer.validate_verification_code
+
+        def validate_and_race(serializer, code: str) -> str:
+            code = validate(serializer, code)
+            TgUser.objects.filter(pk=tg_user.pk).update(user=other, verification_code_hash=None)
+            return code
+
+        monkeypatch.setattr(TgUserSerializer, 'validate_verification_code', validate_and_race)
+
+        response = auth_client.patch(self.url, data={'verification_code': tg_user.verification_code})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {'verification_code': ['Invalid verification code.']}
+        tg_user.refresh_from_db()
+        assert tg_user.user_id == other.id
+        assert not TgOutboxMessage.objects.exists()
+
+
+@pytest.mark.django_db()
+class TestVerificationCodeMessages:
+    def test_code_reused_without_writes(self):
+        """
+        Повторные сообщения непривязанного чата получают тот же код и не пишут в базу
+        """
+        client = FakeTgClient()
+        handler = BotHandler(client, MemoryStateStore())
+        handler.handle_message(Message(chat=Chat(id=3), text='/start'))
+
+        with CaptureQueriesContext(connection) as context:
+            for _ in range(5):
+                handler.handle_message(Message(chat=Chat(id=3), text='spam'))
+
+        assert all(query['sql'].startswith('SELECT') for query in context.captured_queries)
+        assert len(set(client.messages_to(3))) == 1
+        assert TgUser.objects.get(chat_id=3).verification_code in client.messages_to(3)[0]
+
+    def test_expired_code_replaced(self, settings):
+        client = FakeTgClient()
+        handler = BotHandler(client, MemoryStateStore())
+        handler.handle_message(Message(chat=Chat(id=3), text='/start'))
+        TgUser.objects.filter(chat_id=3).update(verification_code_issued_at=timezone.now() - timedelta(days=1))
+        expired_code = TgUser.objects.get(chat_id=3).verification_code
+
+        handler.handle_message(Message(chat=Chat(id=3), text='/start'))
+
+        tg_user = TgUser.objects.get(chat_id=3)
+        assert tg_user.verification_code != expired_code
+        assert tg_user.has_valid_verification_code()
+        assert client.messages_to(3)[-1] == f'Ваш проверочный код:\n {tg_user.verification_code}'
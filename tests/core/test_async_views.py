@@ -0,0 +1,77 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+
+from core.mixins import QueryBudgetExceeded
+from core.views import ProfileView
+from goals.views import BoardListView, GoalCategoryListView, GoalListView
+
+
+def call(method, *args, **kwargs):
+    """
+    Запрос AsyncClient из синхронного теста: view выполняется ASGI-обработчиком в цикле событий
+    """
+
+    async def request():
+        return await method(*args, **kwargs)
+
+    return async_to_sync(request)()
+
+
+@pytest.mark.parametrize('view', [BoardListView, GoalCategoryListView, GoalListView, ProfileView])
+def test_views_are_async(view):
+    assert view.view_is_async
+
+
+@pytest.mark.django_db()
+class TestAsyncViewsOverAsgi:
+    @pytest.fixture()
+    def async_client(self, user) -> AsyncClient:
+        client = AsyncClient()
+        client.force_login(user)
+        return client
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user, board_participant_factory, category_factory, goal_factory):
+        participant = board_participant_factory.create(user=user)
+        self.goal = goal_factory.create(category=category_factory.create(board=participant.board, user=user))
+
+    def test_lists(self, async_client):
+        """
+        Списки через ASGI-обработчик отдают те же данные и валидаторы, что и через WSGI
+        """
+        response = call(async_client.get, reverse('goals:goal-list'), {'cursor': ''})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [goal['id'] for goal in response.json()['results']] == [self.goal.id]
+        assert response.headers['ETag']
+
+        etag = response.headers['ETag']
+        url = reverse('goals:goal-list')
+        not_modified = call(async_client.get, url, {'cursor': ''}, headers={'If-None-Match': etag})
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+
+        for url_name in ('goals:board-list', 'goals:category-list'):
+            response = call(async_client.get, reverse(url_name), {'limit': 10})
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json()['count'] == 1
+
+    def test_profile(self, async_client):
+        response = call(
+            async_client.patch, reverse('core:profile'), {'first_name': 'Асинхронный'}, content_type='application/json'
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        response = call(async_client.get, reverse('core:profile'))
+        assert response.json()['first_name'] == 'Асинхронный'
+
+    def test_query_budget_counted(self, async_client, monkeypatch):
+        """
+        Запросы async ORM идут в другом потоке, но попадают в бюджет view
+        """
+        monkeypatch.setattr(GoalListView, 'query_budget', {'GET': 1})
+
+        with pytest.raises(QueryBudgetExceeded):
+            call(async_client.get, reverse('goals:goal-list'))
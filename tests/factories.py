@@ -4,7 +4,7 @@ from pytest_factoryboy import register
 
 from bot.models import TgUser
 from core.models import User
-from goals.models import Board, BoardParticipant, GoalCategory
+from goals.models import Board, BoardParticipant, Goal, GoalCategory, GoalComment
 
 
 @register
@@ -15,6 +15,7 @@ class UserFactory(factory.django.DjangoModelFactory):
 
     username = factory.Faker('user_name')
     password = factory.Faker('password')
+    email = factory.Sequence(lambda n: f'user{n}@example.com')
 
     class Meta:
         model = User
@@ -74,6 +75,32 @@ class CategoryFactory(DatesFactory):
         model = GoalCategory
 
 
+@register()
+class GoalFactory(DatesFactory):
+    """
+    Фабрика целей
+    """
+    category = factory.SubFactory(CategoryFactory)
+    user = factory.SubFactory(UserFactory)
+    title = factory.Faker('sentence')
+
+    class Meta:
+        model = Goal
+
+
+@register()
+class GoalCommentFactory(DatesFactory):
+    """
+    Фабрика комментариев
+    """
+    goal = factory.SubFactory(GoalFactory)
+    user = factory.SubFactory(UserFactory)
+    text = factory.Faker('sentence')
+
+    class Meta:
+        model = GoalComment
+
+
 @register
 class TgUserFactory(factory.django.DjangoModelFactory):
     """
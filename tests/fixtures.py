@@ -1,11 +1,46 @@
 from typing import Callable
 
 import pytest
+from django.core.cache import caches
 from rest_framework.test import APIClient
 
+from bot.identity import identity_cache
 from tests.factories import BoardParticipantFactory
 
 
+class FakeClock:
+    """
+    Ручные часы для кода, принимающего clock: время двигает сам тест через now
+    """
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture()
+def fake_clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache() -> None:
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_identity_cache() -> None:
+    identity_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def strict_query_budget(settings) -> None:
+    settings.QUERY_BUDGET_RAISE = True
+
+
 @pytest.fixture
 def board_create_data(faker) -> Callable:
     def _wrapper(**kwargs) -> dict:
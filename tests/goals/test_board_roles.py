@@ -0,0 +1,71 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from goals.membership import READ_ROLES, WRITE_ROLES, get_board_role, has_board_role
+from goals.models import BoardParticipant
+
+
+def _role_queries(context: CaptureQueriesContext) -> list[dict]:
+    return [query for query in context.captured_queries if 'goals_boardparticipant' in query['sql']]
+
+
+@pytest.mark.django_db()
+class TestBoardRoles:
+    def test_role_resolved_once_per_request(self, rf, board_participant):
+        """
+        Повторная проверка в рамках одного запроса не ходит в базу
+        """
+        request = rf.get('/')
+        request.user = board_participant.user
+
+        with CaptureQueriesContext(connection) as context:
+            assert has_board_role(request, board_participant.board_id, WRITE_ROLES)
+            assert has_board_role(request, board_participant.board_id, READ_ROLES)
+
+        assert len(_role_queries(context)) == 1
+
+    def test_other_user_role_not_mixed_up(self, rf, board_participant, board_participant_factory):
+        """
+        Роль другого участника, проверенная в том же запросе, не подменяет роль автора запроса
+        """
+        reader = board_participant_factory.create(board=board_participant.board, role=BoardParticipant.Role.reader)
+        request = rf.get('/')
+        request.user = board_participant.user
+
+        assert get_board_role(request, reader.board_id, user_id=reader.user_id) == BoardParticipant.Role.reader
+        assert get_board_role(request, reader.board_id) == BoardParticipant.Role.owner
+
+    def test_role_shared_between_requests(self, rf, board_participant):
+        """
+        Роль берётся из общего кеша в следующем запросе
+        """
+        first, second = rf.get('/'), rf.get('/')
+        first.user = second.user = board_participant.user
+        get_board_role(first, board_participant.board_id)
+
+        with CaptureQueriesContext(connection) as context:
+            assert get_board_role(second, board_participant.board_id) == BoardParticipant.Role.owner
+
+        assert not _role_queries(context)
+
+    def test_cache_invalidated_on_participant_delete(self, rf, board_participant):
+        """
+        После удаления участника роль перестаёт действовать
+        """
+        user, board_id = board_participant.user, board_participant.board_id
+        get_board_role(None, board_id, user_id=user.id)
+
+        board_participant.delete()
+
+        assert get_board_role(None, board_id, user_id=user.id) is None
+
+    def test_cache_invalidated_on_participant_create(self, user, board):
+        """
+        Отрицательный результат не мешает стать участником доски
+        """
+        assert get_board_role(None, board.id, user_id=user.id) is None
+
+        BoardParticipant.objects.create(user=user, board=board, role=BoardParticipant.Role.reader)
+
+        assert get_board_role(None, board.id, user_id=user.id) == BoardParticipant.Role.reader
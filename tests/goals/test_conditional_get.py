@@ -0,0 +1,158 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from rest_framework import status
+
+from goals.archive import archive_board
+from goals.models import Board, BoardParticipant, MembershipChange
+
+
+@pytest.mark.django_db()
+class TestConditionalGet:
+    @pytest.fixture(autouse=True)
+    def setup(self, user, board_factory, category_factory, goal_factory):
+        self.board = board_factory.create(with_owner=user)
+        self.category = category_factory.create(board=self.board, user=user)
+        self.goal = goal_factory.create(category=self.category, user=user)
+
+    @pytest.mark.parametrize(
+        'url_name', ['goals:goal-list', 'goals:category-list', 'goals:comment-list', 'goals:board-list']
+    )
+    def test_not_modified_skips_list_query(self, auth_client, url_name):
+        """
+        Повтор с If-None-Match отдаёт 304 без запроса списка
+        """
+        url = reverse(url_name)
+        response = auth_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+        with CaptureQueriesContext(connection) as context:
+            cached = auth_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+        assert cached['ETag'] == response['ETag']
+        assert not cached.content
+        # Сессия, пользователь и версии досок
+        assert len(context.captured_queries) == 3
+
+    def test_write_changes_etag(self, auth_client, goal_factory):
+        """
+        Новая цель на доске меняет ETag списка
+        """
+        url = reverse('goals:goal-list')
+        etag = auth_client.get(url)['ETag']
+
+        goal_factory.create(category=self.category)
+
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+        assert len(response.data) == 2
+
+    def test_etag_depends_on_query_params(self, auth_client):
+        url = reverse('goals:goal-list')
+        etag = auth_client.get(url)['ETag']
+
+        response = auth_client.get(url, {'search': 'цель'}, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_if_modified_since(self, auth_client):
+        Board.objects.update(version_updated=timezone.now() - timedelta(hours=1))
+        url = reverse('goals:category-list')
+        last_modified = auth_client.get(url)['Last-Modified']
+
+        response = auth_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        response = auth_client.get(url, HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2001 00:00:00 GMT')
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_no_last_modified_within_change_second(self, auth_client, monkeypatch):
+        """
+        Пока идёт секунда последнего изменения, Last-Modified нет: следующая запись в ту же секунду его не сменила бы
+        """
+        updated = Board.objects.get(id=self.board.id).version_updated
+        monkeypatch.setattr('goals.conditional.timezone', SimpleNamespace(now=lambda: updated))
+
+        response = auth_client.get(reverse('goals:goal-list'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'ETag' in response
+        assert 'Last-Modified' not in response
+
+    @pytest.mark.parametrize('change', ['leave', 'delete'])
+    def test_lost_board_changes_last_modified(self, auth_client, user, board_factory, change):
+        """
+        Выход из доски и её удаление меняют Last-Modified, хотя оставшиеся доски не менялись
+        """
+        other = board_factory.create(with_owner=user)
+        Board.objects.update(version_updated=timezone.now() - timedelta(hours=1))
+        url = reverse('goals:board-list')
+        last_modified = auth_client.get(url)['Last-Modified']
+
+        if change == 'leave':
+            BoardParticipant.objects.filter(user=user, board=other).delete()
+            MembershipChange.objects.update(changed=timezone.now() - timedelta(minutes=30))
+        else:
+            archive_board(other)
+            Board.objects.filter(id=other.id).update(version_updated=timezone.now() - timedelta(minutes=30))
+
+        response = auth_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 1
+        assert parse_http_date(response['Last-Modified']) > parse_http_date(last_modified)
+
+    def test_left_board_changes_etag(self, auth_client, user, board_factory):
+        """
+        Выход из доски меняет ETag, хотя версии оставшихся досок не меняются
+        """
+        other = board_factory.create(with_owner=user)
+        url = reverse('goals:board-list')
+        etag = auth_client.get(url)['ETag']
+
+        BoardParticipant.objects.filter(user=user, board=other).delete()
+
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_board_role_change_changes_etag(self, auth_client, user, board_participant_factory):
+        """
+        Смена участников меняет ETag доски
+        """
+        url = reverse('goals:board', kwargs={'pk': self.board.id})
+        etag = auth_client.get(url)['ETag']
+
+        board_participant_factory.create(board=self.board, role=BoardParticipant.Role.reader)
+
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['participants']) == 2
+
+    def test_foreign_board_has_no_validators(self, auth_client, board_factory):
+        board = board_factory.create()
+
+        response = auth_client.get(reverse('goals:board', kwargs={'pk': board.id}), HTTP_IF_NONE_MATCH='*')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert 'ETag' not in response
+
+    def test_bulk_operations_bump_version(self, auth_client):
+        """
+        Массовые операции без сигналов тоже поднимают версию доски
+        """
+        version = Board.objects.get(id=self.board.id).version
+
+        auth_client.post(
+            reverse('goals:goal-bulk'),
+            {'operations': [{'op': 'archive', 'id': self.goal.id}]},
+            format='json',
+        )
+
+        assert Board.objects.get(id=self.board.id).version > version
@@ -0,0 +1,32 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from goals.management.commands.explain_querysets import LIST_VIEWS
+
+
+@pytest.mark.django_db()
+class TestExplainQuerysets:
+    def test_plans_for_every_list_view(self, user, board_participant_factory, goal_factory):
+        """
+        Команда выводит план для каждого списка
+        """
+        participant = board_participant_factory.create(user=user)
+        goal_factory.create(category__board=participant.board)
+        out = StringIO()
+
+        call_command('explain_querysets', user.username, stdout=out)
+
+        for name in LIST_VIEWS:
+            assert f'== {name} ({user.username})' in out.getvalue()
+        assert 'Buffers' in out.getvalue() or 'actual time' in out.getvalue()
+
+    def test_fail_on_seq_scan(self, user, board_participant_factory):
+        """
+        На пустых таблицах план - последовательный скан, с порогом 0 это ошибка
+        """
+        board_participant_factory.create(user=user)
+
+        with pytest.raises(CommandError):
+            call_command('explain_querysets', user.username, '--min-rows=-1', '--fail-on-seq-scan', stdout=StringIO())
@@ -0,0 +1,74 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from goals.models import BoardParticipant, Goal, GoalComment
+
+
+@pytest.mark.django_db()
+class TestGoalBoard:
+    @pytest.fixture(autouse=True)
+    def setup(self, user, board_factory, category_factory, goal_factory, goal_comment_factory):
+        self.board, self.other_board = board_factory.create_batch(size=2, with_owner=user)
+        self.category = category_factory.create(board=self.board, user=user)
+        self.goal = goal_factory.create(category=self.category, user=user)
+        self.comment = goal_comment_factory.create(goal=self.goal, user=user)
+
+    def test_board_copied_on_create(self):
+        """
+        Цель и комментарий получают доску категории
+        """
+        assert self.goal.board_id == self.board.id
+        assert self.comment.board_id == self.board.id
+
+    def test_category_moved_to_another_board(self):
+        """
+        При переносе категории доска обновляется у целей и комментариев
+        """
+        self.category.board = self.other_board
+        self.category.save()
+
+        assert Goal.objects.get(id=self.goal.id).board_id == self.other_board.id
+        assert GoalComment.objects.get(id=self.comment.id).board_id == self.other_board.id
+
+    @pytest.mark.parametrize('field', ['category', 'category_id'])
+    def test_save_with_update_fields_moves_board(self, user, category_factory, field):
+        """
+        save(update_fields=...) с категорией - по имени поля или столбца - тоже обновляет доску
+        """
+        self.goal.category = category_factory.create(board=self.other_board, user=user)
+        self.goal.save(update_fields=[field])
+
+        assert Goal.objects.get(id=self.goal.id).board_id == self.other_board.id
+        assert GoalComment.objects.get(id=self.comment.id).board_id == self.other_board.id
+
+    @pytest.mark.parametrize('field', ['goal', 'goal_id'])
+    def test_comment_save_with_update_fields_moves_board(self, user, category_factory, goal_factory, field):
+        category = category_factory.create(board=self.other_board, user=user)
+        self.comment.goal = goal_factory.create(category=category, user=user)
+        self.comment.save(update_fields=[field])
+
+        assert GoalComment.objects.get(id=self.comment.id).board_id == self.other_board.id
+
+    def test_goal_moved_to_another_category(self, auth_client, user, category_factory):
+        """
+        При переносе цели в категорию другой доски доска обновляется у цели и комментариев
+        """
+        category = category_factory.create(board=self.other_board, user=user)
+
+        response = auth_client.patch(reverse('goals:goal', kwargs={'pk': self.goal.id}), {'category': category.id})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['board'] == self.other_board.id
+        assert GoalComment.objects.get(id=self.comment.id).board_id == self.other_board.id
+
+    def test_goal_cannot_move_to_read_only_board(self, auth_client, user, category_factory):
+        """
+        Нельзя перенести цель на доску, где пользователь только читатель
+        """
+        BoardParticipant.objects.filter(user=user, board=self.other_board).update(role=BoardParticipant.Role.reader)
+        category = category_factory.create(board=self.other_board, user=user)
+
+        response = auth_client.patch(reverse('goals:goal', kwargs={'pk': self.goal.id}), {'category': category.id})
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
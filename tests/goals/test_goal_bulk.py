@@ -0,0 +1,163 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from goals.models import BoardParticipant, Goal, GoalComment
+
+
+@pytest.mark.django_db()
+class TestGoalBulkView:
+    url = reverse('goals:goal-bulk')
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user, board_factory, category_factory, goal_factory):
+        self.board, self.other_board = board_factory.create_batch(size=2, with_owner=user)
+        self.category = category_factory.create(board=self.board, user=user)
+        self.other_category = category_factory.create(board=self.other_board, user=user)
+        self.goal = goal_factory.create(category=self.category, user=user)
+
+    def _post(self, client, operations: list[dict]):
+        return client.post(self.url, {'operations': operations}, format='json')
+
+    def test_create_update_archive(self, auth_client, user, goal_factory, goal_comment_factory):
+        """
+        Создание, частичное обновление с переносом на другую доску и архивация в одном пакете
+        """
+        archived = goal_factory.create(category=self.category, user=user)
+        comment = goal_comment_factory.create(goal=self.goal, user=user)
+
+        response = self._post(
+            auth_client,
+            [
+                {'op': 'create', 'data': {'title': 'Новая цель', 'category': self.category.id}},
+                {'op': 'update', 'id': self.goal.id, 'data': {'title': 'Другое', 'category': self.other_category.id}},
+                {'op': 'archive', 'id': archived.id},
+            ],
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        results = response.data['results']
+        assert [result['status'] for result in results] == [201, 200, 200]
+
+        created = Goal.objects.get(id=results[0]['id'])
+        assert (created.title, created.user_id, created.board_id) == ('Новая цель', user.id, self.board.id)
+        self.goal.refresh_from_db()
+        assert (self.goal.title, self.goal.board_id) == ('Другое', self.other_board.id)
+        assert GoalComment.objects.get(id=comment.id).board_id == self.other_board.id
+        assert Goal.objects.get(id=archived.id).status == Goal.Status.archived
+
+    def test_errors_reported_per_item(self, auth_client, user, goal_factory):
+        """
+        Ошибочные операции получают свой статус, остальные выполняются
+        """
+        BoardParticipant.objects.filter(user=user, board=self.other_board).update(role=BoardParticipant.Role.reader)
+        foreign = goal_factory.create()
+
+        response = self._post(
+            auth_client,
+            [
+                {'op': 'create', 'data': {'category': self.category.id}},
+                {'op': 'create', 'data': {'title': 'Чужая', 'category': self.other_category.id}},
+                {'op': 'archive', 'id': foreign.id},
+                {'op': 'update', 'id': self.goal.id, 'data': {'title': 'Ок'}},
+                {'op': 'archive', 'id': self.goal.id},
+            ],
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        results = response.data['results']
+        assert [result['status'] for result in results] == [400, 403, 404, 200, 400]
+        assert 'title' in results[0]['errors']
+        assert Goal.objects.filter(board=self.other_board).count() == 0
+        assert Goal.objects.get(id=foreign.id).status != Goal.Status.archived
+        self.goal.refresh_from_db()
+        assert (self.goal.title, self.goal.status) == ('Ок', Goal.Status.to_do)
+
+    def test_queries_do_not_depend_on_batch_size(self, auth_client, goal_factory):
+        """
+        Число запросов не зависит от числа операций в пакете
+        """
+
+        def count(operations: list[dict]) -> int:
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = self._post(auth_client, operations)
+            assert response.status_code == status.HTTP_200_OK
+            return len(context.captured_queries)
+
+        goals = goal_factory.create_batch(size=20, category=self.category)
+        single = count(
+            [
+                {'op': 'create', 'data': {'title': 'Цель', 'category': self.category.id}},
+                {'op': 'update', 'id': self.goal.id, 'data': {'priority': Goal.Priority.high}},
+            ]
+        )
+        many = count(
+            [{'op': 'create', 'data': {'title': f'Цель {n}', 'category': self.category.id}} for n in range(20)]
+            + [{'op': 'update', 'id': goal.id, 'data': {'priority': Goal.Priority.high}} for goal in goals]
+        )
+
+        assert many == single
+
+    def test_malformed_batch(self, auth_client):
+        """
+        Неверная структура пакета отклоняется целиком
+        """
+        response = self._post(auth_client, [{'op': 'update', 'data': {'title': 'Без id'}}])
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Goal.objects.count() == 1
+
+    def test_goals_locked_and_written_by_one_update(self, auth_client, user, goal_factory):
+        """
+        Цели читаются FOR UPDATE и пишутся одним UPDATE; поля, которые операция не меняла, сохраняют значения
+        """
+        other = goal_factory.create(category=self.category, user=user, title='Прежний', priority=Goal.Priority.low)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self._post(
+                auth_client,
+                [
+                    {'op': 'update', 'id': self.goal.id, 'data': {'title': 'Только заголовок'}},
+                    {'op': 'update', 'id': other.id, 'data': {'priority': Goal.Priority.high}},
+                ],
+            )
+
+        assert response.status_code == status.HTTP_200_OK
+        sqls = [query['sql'] for query in context.captured_queries]
+        assert any('FOR UPDATE OF' in sql for sql in sqls)
+        assert len([sql for sql in sqls if sql.startswith('UPDATE "goals_goal"')]) == 1
+        other.refresh_from_db()
+        assert (other.title, other.priority) == ('Прежний', Goal.Priority.high)
+        assert Goal.objects.get(id=self.goal.id).title == 'Только заголовок'
+
+    def test_queries_do_not_depend_on_field_sets(self, auth_client, goal_factory):
+        """
+        Операции с разными наборами полей не добавляют запросов
+        """
+
+        def count(operations: list[dict]) -> int:
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = self._post(auth_client, operations)
+            assert response.status_code == status.HTTP_200_OK
+            return len(context.captured_queries)
+
+        goals = goal_factory.create_batch(size=6, category=self.category)
+        single = count([{'op': 'update', 'id': self.goal.id, 'data': {'title': 'Цель'}}])
+        field_sets = [
+            {'title': 'Заголовок'},
+            {'priority': Goal.Priority.high},
+            {'status': Goal.Status.done},
+            {'title': 'Оба', 'priority': Goal.Priority.low},
+            {'description': 'Описание', 'status': Goal.Status.in_progress},
+        ]
+        many = count(
+            [{'op': 'update', 'id': goal.id, 'data': data} for goal, data in zip(goals, field_sets)]
+            + [{'op': 'archive', 'id': goals[-1].id}]
+        )
+
+        assert many == single
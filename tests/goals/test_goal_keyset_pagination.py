@@ -0,0 +1,66 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from goals.models import Goal
+
+
+@pytest.mark.django_db()
+class TestGoalKeysetPagination:
+    url = reverse('goals:goal-list')
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user, board_participant_factory, category_factory, goal_factory):
+        participant = board_participant_factory.create(user=user)
+        category = category_factory.create(board=participant.board, user=user)
+        # Одинаковые названия проверяют, что id разрешает равенство ключа сортировки
+        self.goals = goal_factory.create_batch(size=5, category=category, title='same') + goal_factory.create_batch(
+            size=2, category=category, title='another'
+        )
+
+    def _walk(self, client, url: str) -> list[int]:
+        ids = []
+        while url:
+            response = client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            ids.extend(goal['id'] for goal in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_offset_pagination_by_default(self, auth_client):
+        """
+        Без параметра cursor сохраняется limit/offset пагинация
+        """
+        response = auth_client.get(self.url, {'limit': 2})
+
+        assert response.data['count'] == len(self.goals)
+
+    @pytest.mark.parametrize(
+        ('ordering', 'expected_ordering'),
+        [('title', ('title', 'id')), ('created', ('created', 'id')), ('-created', ('-created', '-id'))],
+    )
+    def test_cursor_pages_cover_all_goals(self, auth_client, ordering, expected_ordering):
+        """
+        Курсор проходит все цели без повторов в порядке сортировки
+        """
+        ids = self._walk(auth_client, f'{self.url}?cursor=&limit=2&ordering={ordering}')
+
+        assert ids == list(Goal.objects.order_by(*expected_ordering).values_list('id', flat=True))
+
+    def test_previous_page(self, auth_client):
+        """
+        Ссылка previous возвращает предыдущую страницу
+        """
+        first = auth_client.get(self.url, {'cursor': '', 'limit': 3}).data
+        second = auth_client.get(first['next']).data
+        back = auth_client.get(second['previous']).data
+
+        assert back['results'] == first['results']
+
+    def test_invalid_cursor(self, auth_client):
+        """
+        Испорченный курсор даёт 404
+        """
+        response = auth_client.get(self.url, {'cursor': 'broken'})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,54 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+
+@pytest.mark.django_db()
+class TestGoalSearch:
+    url = reverse('goals:goal-list')
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user, board_participant_factory, category_factory, goal_factory):
+        participant = board_participant_factory.create(user=user)
+        self.category = category_factory.create(board=participant.board, user=user, title='Рабочие задачи')
+        self.report = goal_factory.create(category=self.category, title='Подготовить отчёт', description='квартальный')
+        self.shop = goal_factory.create(category=self.category, title='Магазин', description='не забыть молоко')
+        self.other = goal_factory.create(category=self.category, title='Купить молоко', description=None)
+
+    def _search(self, client, term: str, url: str | None = None) -> list[int]:
+        response = client.get(url or self.url, {'search': term})
+        assert response.status_code == status.HTTP_200_OK
+        return [item['id'] for item in response.data]
+
+    def test_prefix_search(self, auth_client):
+        """
+        Начало слова находит цели по названию и описанию
+        """
+        assert set(self._search(auth_client, 'кварт')) == {self.report.id}
+
+    def test_partial_word_falls_back_to_trigram(self, auth_client):
+        """
+        Часть слова из середины названия находится через триграммы
+        """
+        assert self._search(auth_client, 'олоко') == [self.other.id]
+
+    def test_results_ordered_by_relevance(self, auth_client):
+        """
+        Без ordering более релевантные цели идут первыми
+        """
+        assert self._search(auth_client, 'молоко') == [self.other.id, self.shop.id]
+
+    def test_vector_follows_updates(self, auth_client):
+        """
+        Поисковый вектор обновляется при изменении названия
+        """
+        self.other.title = 'Купить хлеб'
+        self.other.save()
+
+        assert self._search(auth_client, 'хлеб') == [self.other.id]
+
+    def test_category_search(self, auth_client):
+        """
+        Поиск категорий использует тот же механизм
+        """
+        assert self._search(auth_client, 'рабоч', reverse('goals:category-list')) == [self.category.id]
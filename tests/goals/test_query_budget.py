@@ -0,0 +1,48 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+
+@pytest.mark.django_db()
+class TestListQueryCount:
+    @pytest.fixture(autouse=True)
+    def setup(self, user, board_participant_factory, category_factory):
+        participant = board_participant_factory.create(user=user)
+        self.category = category_factory.create(board=participant.board, user=user)
+
+    def _count_queries(self, client, url: str) -> int:
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        return len(context.captured_queries)
+
+    @pytest.mark.parametrize('url_name', ['goals:goal-list', 'goals:category-list', 'goals:comment-list'])
+    def test_queries_do_not_depend_on_page_size(
+        self, auth_client, user, url_name, goal_factory, goal_comment_factory, category_factory
+    ):
+        """
+        Число запросов списка не зависит от количества строк на странице
+        """
+        url = reverse(url_name)
+        goal = goal_factory.create(category=self.category)
+        goal_comment_factory.create(goal=goal)
+        single = self._count_queries(auth_client, url)
+
+        category_factory.create_batch(size=5, board=self.category.board)
+        goals = goal_factory.create_batch(size=5, category=self.category)
+        for goal in goals:
+            goal_comment_factory.create(goal=goal)
+
+        assert self._count_queries(auth_client, url) == single
+
+    def test_goal_detail_within_budget(self, auth_client, goal_factory):
+        """
+        Детальный просмотр цели укладывается в бюджет запросов
+        """
+        goal = goal_factory.create(category=self.category)
+
+        response = auth_client.get(reverse('goals:goal', kwargs={'pk': goal.pk}))
+
+        assert response.status_code == status.HTTP_200_OK
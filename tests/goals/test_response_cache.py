@@ -0,0 +1,123 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from goals.models import Board, BoardParticipant
+
+
+@pytest.mark.django_db()
+class TestVersionedResponseCache:
+    @pytest.fixture(autouse=True)
+    def setup(self, user, board_factory, category_factory):
+        self.board = board_factory.create(with_owner=user)
+        self.category = category_factory.create(board=self.board, user=user)
+
+    @staticmethod
+    def _get(client, url: str):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        return response, len(context.captured_queries)
+
+    @pytest.mark.parametrize('url_name', ['goals:category-list', 'goals:board'])
+    def test_second_read_from_cache(self, auth_client, url_name):
+        """
+        Повторное чтение без изменений не выполняет запрос данных
+        """
+        url = reverse(url_name, kwargs={'pk': self.board.id} if url_name == 'goals:board' else None)
+        first, _ = self._get(auth_client, url)
+
+        second, queries = self._get(auth_client, url)
+
+        assert second.data == first.data
+        # Сессия, пользователь и версии досок
+        assert queries == 3
+
+    def test_write_invalidates(self, auth_client, user, category_factory):
+        """
+        Новая категория поднимает версию доски и ответ пересчитывается
+        """
+        url = reverse('goals:category-list')
+        self._get(auth_client, url)
+
+        category_factory.create(board=self.board, user=user)
+
+        response, queries = self._get(auth_client, url)
+        assert len(response.data) == 2
+        assert queries > 3
+
+    def test_profile_change_invalidates(self, auth_client, user):
+        """
+        Профиль автора вложен в ответ: его смена поднимает версии досок пользователя
+        """
+        url = reverse('goals:category-list')
+        etag = auth_client.get(url)['ETag']
+
+        response = auth_client.patch(reverse('core:profile'), {'first_name': 'Новое имя'}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data[0]['user']['first_name'] == 'Новое имя'
+
+    def test_login_keeps_cache(self, user):
+        version = Board.objects.get(id=self.board.id).version
+
+        user.save(update_fields=['last_login'])
+
+        assert Board.objects.get(id=self.board.id).version == version
+
+    def test_shared_between_users_with_same_role(self, client, auth_client, user_factory):
+        """
+        Участники доски с одной ролью читают одну запись кеша
+        """
+        url = reverse('goals:board', kwargs={'pk': self.board.id})
+        other = user_factory.create()
+        BoardParticipant.objects.create(board=self.board, user=other, role=BoardParticipant.Role.owner)
+        self._get(auth_client, url)
+
+        client.force_login(other)
+        _, queries = self._get(client, url)
+
+        assert queries == 3
+
+    def test_role_is_part_of_key(self, client, auth_client, user_factory):
+        url = reverse('goals:board', kwargs={'pk': self.board.id})
+        reader = user_factory.create()
+        BoardParticipant.objects.create(board=self.board, user=reader, role=BoardParticipant.Role.reader)
+        self._get(auth_client, url)
+
+        client.force_login(reader)
+        _, queries = self._get(client, url)
+
+        assert queries > 3
+
+    def test_filtered_by_board_ignores_other_boards(self, auth_client, user, board_factory, category_factory):
+        """
+        Запись в другую доску пользователя не сбрасывает ответ с ?board=
+        """
+        other_board = board_factory.create(with_owner=user)
+        url = reverse('goals:category-list') + f'?board={self.board.id}'
+        self._get(auth_client, url)
+
+        category_factory.create(board=other_board, user=user)
+
+        _, queries = self._get(auth_client, url)
+        assert queries == 3
+
+    def test_filtered_by_board_shared_between_members(self, client, auth_client, user_factory, board_factory):
+        """
+        С ?board= запись делят участники доски, даже если остальные их доски разные
+        """
+        other = user_factory.create()
+        BoardParticipant.objects.create(board=self.board, user=other, role=BoardParticipant.Role.owner)
+        board_factory.create(with_owner=other)
+        url = reverse('goals:category-list') + f'?board={self.board.id}'
+        self._get(auth_client, url)
+
+        client.force_login(other)
+        _, queries = self._get(client, url)
+
+        assert queries == 3
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Strangers apps
     'rest_framework',
     'social_django',
@@ -105,6 +106,29 @@ DATABASES = {
 # }
 
 
+# Cache
+# Роли участников досок кешируются между процессами: api, бот и archive_worker инвалидируют их друг для друга,
+# поэтому в docker-compose кеш - общий Redis (CACHE_BACKEND=django.core.cache.backends.redis.RedisCache).
+# Локальная память по умолчанию - только для тестов и одного процесса разработки: там инвалидация
+# видна лишь своему процессу, и снятая роль в других процессах живёт до ROLE_CACHE_TIMEOUT
+
+CACHES = {
+    'default': {
+        'BACKEND': env.str('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env.str('CACHE_LOCATION', default=''),
+    },
+    # Готовые ответы чтений по версиям досок (goals/conditional.py): объёмнее ролей,
+    # поэтому отдельный алиас и своя база Redis, которую можно вынести на свой сервер или ограничить по памяти.
+    # Устаревшие записи сбрасывает смена версии доски, а не удаление ключей, поэтому и с локальной памятью
+    # процесс не отдаст старый ответ - он лишь дублирует записи других процессов uvicorn
+    'responses': {
+        'BACKEND': env.str('RESPONSE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env.str('RESPONSE_CACHE_LOCATION', default='responses'),
+        'TIMEOUT': env.int('RESPONSE_CACHE_TIMEOUT', default=60 * 60),
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -169,5 +193,23 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
 }
 
+# Конфигурация PostgreSQL full-text search для поиска целей и категорий.
+# Триггеры search_vector создаются с ней в миграции goals/0010, где значение зафиксировано литералом:
+# смена значения требует новой миграции, пересоздающей триггеры и пересчитывающей search_vector
+SEARCH_CONFIG = 'russian'
+
+# Превышение query_budget у view: False - предупреждение в лог, True - исключение (включается в тестах)
+QUERY_BUDGET_RAISE = env.bool('QUERY_BUDGET_RAISE', default=False)
+
 BOT_TOKEN = env.str('BOT_TOKEN')
+# Адрес Bot API; для тестов и нагрузочных прогонов - локальная заглушка
+TG_API_URL = env.str('TG_API_URL', default='https://api.telegram.org')
+# Секрет заголовка X-Telegram-Bot-Api-Secret-Token; пустой - webhook выключен, работает только runbot
+BOT_WEBHOOK_SECRET = env.str('BOT_WEBHOOK_SECRET', default='')
+# Хранилище состояний диалогов бота: db - переживает рестарт и общее для нескольких воркеров, memory - один процесс
+BOT_STATE_STORE = env.str('BOT_STATE_STORE', default='db')
+BOT_STATE_TTL = env.int('BOT_STATE_TTL', default=60 * 60)
+# Сколько секунд действует проверочный код; до истечения бот повторяет тот же код
+BOT_VERIFICATION_CODE_TTL = env.int('BOT_VERIFICATION_CODE_TTL', default=60 * 15)
+
 TOKEN_LENGTH = 8